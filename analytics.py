@@ -0,0 +1,439 @@
+"""
+Call analytics maintained incrementally from call changes.
+
+CallStatsAggregator keeps the all-time dashboard counters (sentiment, tag
+buckets, duration sum/count) in memory. It is hydrated once from the full
+`calls` history and then updated on every insert, update and delete, so
+/api/call-stats never scans the table.
+
+RollupStore keeps the same changes pre-aggregated into hour/day/week
+buckets so /api/analytics/timeseries reads a handful of buckets instead of
+the calls table.
+
+hydrate_all() fills both from a single scan of the history.
+"""
+import abc
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Columns the aggregators need from a `calls` row
+STATS_COLUMNS = "id, sentiment, duration, tags, created_at, speaker_count"
+
+SENTIMENTS = ("positive", "negative", "neutral")
+TAG_BUCKETS = {
+    "Support": ("support", "help"),
+    "Billing": ("billing", "payment", "invoice"),
+    "Technical": ("technical", "technical issue", "error", "bug"),
+}
+
+
+def sentiment_of(row: Dict[str, Any]) -> str:
+    sentiment = (row.get("sentiment") or "neutral").lower()
+    return sentiment if sentiment in SENTIMENTS else "neutral"
+
+
+def tag_buckets(tags: Optional[Iterable[str]]) -> List[str]:
+    """Dashboard buckets a call's tags fall into (a call may count in several)."""
+    if not tags:
+        return []
+    tags_lower = {str(tag).lower() for tag in tags}
+    return [bucket for bucket, names in TAG_BUCKETS.items() if any(n in tags_lower for n in names)]
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {
+        "sentiment": {s: 0 for s in SENTIMENTS},
+        "avg_duration": 0,
+        "tag_counts": {bucket: 0 for bucket in TAG_BUCKETS},
+    }
+
+
+class IncrementalAggregate(abc.ABC):
+    """
+    Base for aggregates hydrated once from history and then kept current
+    through apply_change(). Subclasses implement _clear() and _apply().
+
+    apply_change() may be called from worker threads (the upload pipeline
+    runs in a threadpool), so updates are guarded by a lock. Changes that
+    arrive while hydrating are buffered per call and replayed onto the
+    scanned result, so a busy table never forces the scan to start over
+    (see _replay).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.seeded = False
+        self.version = 0
+        self._hydrating = False
+        self._clear()
+
+    @abc.abstractmethod
+    def _clear(self):
+        """Reset to the empty aggregate."""
+
+    @abc.abstractmethod
+    def _apply(self, row: Dict[str, Any], sign: int):
+        """Add (sign=1) or remove (sign=-1) one call row."""
+
+    def apply_change(self, kind: str, new_row: Optional[Dict[str, Any]] = None,
+                     old_row: Optional[Dict[str, Any]] = None):
+        """kind is "insert", "update" or "delete" (rows as stored in `calls`)."""
+        with self._lock:
+            if self._hydrating:
+                self._buffer(kind, new_row, old_row)
+            if not (self.ready or self.seeded):
+                return
+            if kind == "insert" and new_row:
+                self._apply(new_row, 1)
+            elif kind == "delete" and old_row:
+                self._apply(old_row, -1)
+            elif kind == "update" and new_row and old_row:
+                self._apply(old_row, -1)
+                self._apply({**old_row, **new_row}, 1)
+            else:
+                return
+            self.version += 1
+
+    # --- Hydration ---
+
+    def _buffer(self, kind: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]):
+        """
+        Record a change made during the scan as, per call: the row the scan
+        counted (known now if the scan had already passed the call, else
+        taken from the page that contains it) and the row as it is now.
+        Updates without old_row are ignored, as in apply_change().
+        """
+        if kind == "insert" and new_row:
+            call_id, before, after = new_row.get("id"), None, new_row
+        elif kind == "delete" and old_row:
+            call_id, before, after = old_row.get("id"), old_row, None
+        elif kind == "update" and new_row and old_row:
+            call_id, before = new_row.get("id", old_row.get("id")), old_row
+            pending = self._pending.get(call_id)
+            after = {**(pending["after"] if pending and pending["after"] else old_row), **new_row}
+        else:
+            return
+        if call_id is None:
+            return
+        pending = self._pending.get(call_id)
+        if pending is None:
+            passed = call_id <= self._scanned_id
+            pending = self._pending[call_id] = {"counted": before if passed else None, "known": passed}
+        pending["after"] = after
+
+    def _begin_hydrate(self):
+        fresh = type(self).__new__(type(self))
+        fresh._clear()
+        with self._lock:
+            self._hydrating = True
+            self._fresh = fresh
+            self._scanned_id = 0
+            # call id -> {"counted": row the scan counted, "known": bool, "after": current row}
+            self._pending: Dict[Any, Dict[str, Any]] = {}
+
+    def _hydrate_page(self, rows: List[Dict[str, Any]]):
+        with self._lock:
+            for row in rows:
+                self._fresh._apply(row, 1)
+                pending = self._pending.get(row["id"])
+                if pending is not None and not pending["known"]:
+                    pending["counted"], pending["known"] = row, True
+            if rows:
+                self._scanned_id = max(self._scanned_id, rows[-1]["id"])
+
+    def _replay(self):
+        """Swap what the scan counted for each changed call with its current row."""
+        for pending in self._pending.values():
+            if pending["counted"]:
+                self._fresh._apply(pending["counted"], -1)
+            if pending["after"]:
+                self._fresh._apply(pending["after"], 1)
+
+    def _finish_hydrate(self, ok: bool = True):
+        with self._lock:
+            if ok:
+                self._replay()
+                self._adopt(self._fresh)
+                self.ready = True
+                self.version += 1
+            self._hydrating = False
+            self._fresh, self._pending = None, {}
+
+    def hydrate(self, fetch_page: Callable[[int, int], List[Dict[str, Any]]], page_size: int = 1000) -> int:
+        """
+        Rebuild from the full history.
+        fetch_page(after_id, limit) returns rows with id > after_id ordered by id.
+        Returns the number of rows read.
+        """
+        return hydrate_all([self], fetch_page, page_size)
+
+    def _adopt(self, fresh: "IncrementalAggregate"):
+        for name, value in vars(fresh).items():
+            if not name.startswith("_"):
+                setattr(self, name, value)
+
+
+def hydrate_all(aggregates: Iterable[IncrementalAggregate],
+                fetch_page: Callable[[int, int], List[Dict[str, Any]]], page_size: int = 1000) -> int:
+    """Hydrate several aggregates from one scan of the history (see IncrementalAggregate.hydrate)."""
+    aggregates = list(aggregates)
+    for aggregate in aggregates:
+        aggregate._begin_hydrate()
+    try:
+        rows_read, after_id = 0, 0
+        while True:
+            rows = fetch_page(after_id, page_size)
+            for aggregate in aggregates:
+                aggregate._hydrate_page(rows)
+            rows_read += len(rows)
+            if len(rows) < page_size:
+                break
+            after_id = rows[-1]["id"]
+    except Exception:
+        for aggregate in aggregates:
+            aggregate._finish_hydrate(ok=False)
+        raise
+    for aggregate in aggregates:
+        aggregate._finish_hydrate()
+    return rows_read
+
+
+class CallStatsAggregator(IncrementalAggregate):
+    """All-time dashboard counters, updated in O(1) per change."""
+
+    def _clear(self):
+        self.total = 0
+        self.sentiment = {s: 0 for s in SENTIMENTS}
+        self.tag_counts = {bucket: 0 for bucket in TAG_BUCKETS}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+
+    def _apply(self, row: Dict[str, Any], sign: int):
+        self.total += sign
+        self.sentiment[sentiment_of(row)] += sign
+        for bucket in tag_buckets(row.get("tags")):
+            self.tag_counts[bucket] += sign
+        duration = row.get("duration")
+        if duration is not None:
+            self.duration_sum += sign * duration
+            self.duration_count += sign
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Stats in the /api/call-stats shape."""
+        with self._lock:
+            return {
+                "sentiment": dict(self.sentiment),
+                "avg_duration": round(self.duration_sum / self.duration_count, 2) if self.duration_count > 0 else 0,
+                "tag_counts": dict(self.tag_counts),
+                "total_calls": self.total,
+            }
+
+    def to_record(self) -> Dict[str, Any]:
+        """Raw counters for the optional persisted table."""
+        with self._lock:
+            return {
+                "total": self.total,
+                "sentiment": dict(self.sentiment),
+                "tag_counts": dict(self.tag_counts),
+                "duration_sum": self.duration_sum,
+                "duration_count": self.duration_count,
+            }
+
+    def load_record(self, record: Dict[str, Any]):
+        """Seed counters from the persisted table (used until hydration finishes)."""
+        with self._lock:
+            if self.ready:
+                return
+            self.total = record.get("total", 0)
+            self.sentiment.update(record.get("sentiment") or {})
+            self.tag_counts.update(record.get("tag_counts") or {})
+            self.duration_sum = record.get("duration_sum", 0.0)
+            self.duration_count = record.get("duration_count", 0)
+            self.seeded = True
+
+
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+# Dimensions every bucket is split by; "all" is the ungrouped total
+GROUP_BY = ("all", "sentiment", "tag", "speaker_count")
+
+
+def parse_timestamp(value: Any) -> datetime:
+    """Parse a Supabase timestamp (ISO 8601) into an aware UTC datetime."""
+    if isinstance(value, datetime):
+        dt = value
+    elif value:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    else:
+        dt = datetime.now(timezone.utc)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def bucket_start(dt: datetime, granularity: str) -> datetime:
+    """Floor a UTC datetime to its bucket (weeks start on Monday)."""
+    if granularity == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def group_values(row: Dict[str, Any], group_by: str) -> List[str]:
+    if group_by == "sentiment":
+        return [sentiment_of(row)]
+    if group_by == "tag":
+        return sorted({str(t).strip().lower() for t in row.get("tags") or [] if str(t).strip()})
+    if group_by == "speaker_count":
+        return [str(row.get("speaker_count") or 0)]
+    return ["all"]
+
+
+def new_counter() -> Dict[str, float]:
+    return {"calls": 0, "duration_sum": 0.0, "duration_count": 0,
+            "positive": 0, "negative": 0, "neutral": 0}
+
+
+def counter_view(counter: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "calls": counter["calls"],
+        "avg_duration": round(counter["duration_sum"] / counter["duration_count"], 2) if counter["duration_count"] > 0 else 0,
+        "sentiment": {s: counter[s] for s in SENTIMENTS},
+    }
+
+
+RollupKey = Tuple[str, datetime, str, str]  # (granularity, bucket_start, group_by, group_value)
+
+
+def rollup_key(record: Dict[str, Any]) -> RollupKey:
+    return (record["granularity"], parse_timestamp(record["bucket_start"]),
+            record["group_by"], record["group_value"])
+
+
+class RollupStore(IncrementalAggregate):
+    """
+    Pre-aggregated time buckets (hour/day/week x group dimension).
+
+    Each call adds to one bucket per granularity and per group value, so a
+    change is O(granularities x groups) and a timeseries query is
+    O(buckets in range). Buckets touched since the last flush are tracked in
+    `dirty` for the optional persisted rollup table.
+
+    The store also remembers what it last loaded from or wrote to that
+    table. After a hydration only the buckets that differ from it are
+    dirty, including buckets that no longer exist in the history: those are
+    written back as zero.
+    """
+
+    def __init__(self):
+        self._persisted: Dict[RollupKey, Tuple[float, ...]] = {}
+        super().__init__()
+
+    def _clear(self):
+        # (granularity, group_by) -> bucket_start -> group_value -> counter
+        self.buckets: Dict[Tuple[str, str], Dict[datetime, Dict[str, Dict[str, float]]]] = {}
+        self.dirty = set()
+
+    def _counter(self, key: RollupKey) -> Dict[str, float]:
+        granularity, start, group_by, value = key
+        groups = self.buckets.setdefault((granularity, group_by), {}).setdefault(start, {})
+        counter = groups.get(value)
+        if counter is None:
+            counter = groups[value] = new_counter()
+        return counter
+
+    def _apply(self, row: Dict[str, Any], sign: int):
+        created = parse_timestamp(row.get("created_at"))
+        sentiment = sentiment_of(row)
+        duration = row.get("duration")
+        for granularity in GRANULARITIES:
+            start = bucket_start(created, granularity)
+            for group_by in GROUP_BY:
+                for value in group_values(row, group_by):
+                    key = (granularity, start, group_by, value)
+                    counter = self._counter(key)
+                    counter["calls"] += sign
+                    counter[sentiment] += sign
+                    if duration is not None:
+                        counter["duration_sum"] += sign * duration
+                        counter["duration_count"] += sign
+                    self.dirty.add(key)
+
+    def timeseries(self, start: datetime, end: datetime, granularity: str = "day",
+                   group_by: str = "all") -> List[Dict[str, Any]]:
+        """Buckets from start to end (inclusive), empty buckets included."""
+        step = GRANULARITIES[granularity]
+        with self._lock:
+            buckets = self.buckets.get((granularity, group_by), {})
+            series = []
+            bucket = bucket_start(start, granularity)
+            while bucket <= end:
+                groups = buckets.get(bucket, {})
+                series.append({
+                    "bucket": bucket.isoformat(),
+                    "groups": {value: counter_view(c) for value, c in sorted(groups.items()) if c["calls"]},
+                })
+                # Buckets are in UTC, so fixed steps never cross a DST change
+                bucket = bucket + step
+            return series
+
+    def _counters(self) -> Iterable[Tuple[RollupKey, Dict[str, float]]]:
+        for (granularity, group_by), by_start in self.buckets.items():
+            for start, groups in by_start.items():
+                for value, counter in groups.items():
+                    yield (granularity, start, group_by, value), counter
+
+    def _adopt(self, fresh: "IncrementalAggregate"):
+        super()._adopt(fresh)
+        zero = tuple(new_counter().values())
+        current = {key: tuple(counter.values()) for key, counter in self._counters()}
+        self.dirty = {key for key, values in current.items() if self._persisted.get(key, zero) != values}
+        self.dirty.update(key for key, values in self._persisted.items() if key not in current and values != zero)
+
+    def take_dirty(self) -> List[Dict[str, Any]]:
+        """Rows for the buckets changed since the last call (for persisting)."""
+        with self._lock:
+            keys, self.dirty = self.dirty, set()
+            records = []
+            for key in keys:
+                counter = self._counter(key)
+                self._persisted[key] = tuple(counter.values())
+                records.append(self._record(key, counter))
+            return records
+
+    def restore_dirty(self, records: Iterable[Dict[str, Any]]):
+        """Mark taken buckets dirty again after a failed write."""
+        with self._lock:
+            for record in records:
+                key = rollup_key(record)
+                self.dirty.add(key)
+                self._persisted.pop(key, None)
+
+    @staticmethod
+    def _record(key: RollupKey, counter: Dict[str, float]) -> Dict[str, Any]:
+        granularity, start, group_by, value = key
+        return {"granularity": granularity, "bucket_start": start.isoformat(),
+                "group_by": group_by, "group_value": value, **counter}
+
+    def load_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Seed buckets from the persisted rollup table."""
+        loaded = 0
+        with self._lock:
+            if self.ready:
+                return 0
+            for record in records:
+                key = rollup_key(record)
+                counter = self._counter(key)
+                for field in counter:
+                    counter[field] = record.get(field) or 0
+                self._persisted[key] = tuple(counter.values())
+                loaded += 1
+            self.seeded = loaded > 0
+        return loaded
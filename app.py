@@ -3,13 +3,16 @@ import io
 import sys
 import json
 import time
+# Process start, for the startup timings reported by /api/debug/startup
+PROCESS_STARTED = time.perf_counter()
+import base64
 import asyncio
 import threading
-import smtplib
 import uuid  # Added for webhook channel IDs
+import hashlib
+import httpx
 import aiofiles  # For async file operations
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from collections import Counter, OrderedDict
 from typing import List, Optional, Dict, Any
 
 from fastapi import FastAPI, Request, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
@@ -20,46 +23,128 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import Response
 from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 
 from dotenv import load_dotenv
 
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-from google.auth.transport.requests import Request as GoogleRequest
 from datetime import datetime
-from groq import Groq
 from werkzeug.utils import secure_filename
 
 # Import Pydantic models
 from fastapi_models import LoginRequest, TranslateRequest, DeleteCallRequest, DiarizationUpdateRequest, VapiCallRequest, UserSettings
+from notifications import NotificationManager, create_backend as create_notification_backend
+from email_outbox import EmailOutbox
+from email_templates import EmailRenderer, EMAIL_TEMPLATE_DIR
+from analytics import (
+    CallStatsAggregator, RollupStore, STATS_COLUMNS, GRANULARITIES, GROUP_BY, hydrate_all, parse_timestamp,
+)
+from search_index import CallSearchIndex, SEARCH_COLUMNS, summary_excerpt
+from vector_index import VectorIndex, VECTOR_COLUMNS, create_embedder
+from response_cache import ResponseCache, etag_matches
+from http_responses import FastJSONResponse, CompressionMiddleware, byte_range_response, is_byte_range
+from audio_processing import (
+    AudioPreprocessor, SPEECH_BITRATE, WAVEFORM_MIME_TYPE,
+    mime_type_for, speech_filename, waveform_filename, waveform_for_file,
+)
+from transcription import ShardedTranscriber, create_transcriber, is_failed
+from lazy_clients import LazyClient, WarmClientsMiddleware, warm_all as warm_clients, clients_stats
+from health import DependencyMonitor, TrackedExecutor, saturated, trace_calls, threadpool_usage
+import metrics
+from metrics import stage, RETRIES, FALLBACKS
+from vapi_events import (
+    VapiEvent, VapiEventRouter, CallLaneDispatcher, RECORDING_READY,
+    parse_vapi_payload, idempotency_key as vapi_idempotency_key,
+)
 
 load_dotenv()
 
 
 # --- Groq LLM Setup (Meta Llama) ---
-groq_client = None
+# Latency and errors of every external service, from real traffic (see health.py)
+dependencies = DependencyMonitor(("supabase", "assemblyai", "groq", "drive", "smtp"))
+
+# Heavy clients are created on first use or warmed after startup (see lazy_clients.py)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-if GROQ_API_KEY and GROQ_API_KEY != "your_groq_api_key_here":
-    groq_client = Groq(api_key=GROQ_API_KEY)
+
+def groq_configured():
+    return bool(GROQ_API_KEY) and GROQ_API_KEY != "your_groq_api_key_here"
+
+def create_groq_client():
+    if not groq_configured():
+        print("[GROQ] Warning: GROQ_API_KEY not set. Using fallback analysis.")
+        return None
+    from groq import Groq
+    client = Groq(api_key=GROQ_API_KEY)
     print("[GROQ] Initialized with Meta Llama model")
-else:
-    print("[GROQ] Warning: GROQ_API_KEY not set. Using fallback analysis.")
+    return trace_calls(client, dependencies.recorder("groq"), terminal=("create",), attributes=("chat", "completions"))
+
+groq_client = LazyClient("groq", create_groq_client, groq_configured)
 
 # --- App Configuration ---
-app = FastAPI(title="VoxAnalyze")
+app = FastAPI(title="VoxAnalyze", default_response_class=FastJSONResponse)
 
 # Session Middleware (replaces Flask's secret_key session)
 SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "voxanalyze-secret-key-change-in-prod")
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 
+# gzip/brotli for large buffered responses (the SSE stream is never buffered; see http_responses.py)
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+# Requests wait off the event loop for the clients to be built (health checks and static files don't)
+app.add_middleware(WarmClientsMiddleware, exempt=("/healthz", "/readyz", "/static"))
+
+# Seconds from process start to each startup phase (see /api/debug/startup)
+startup_timing = {}
+# asyncio.to_thread runs here; installed as the loop's default executor so /readyz can see its load
+default_executor = TrackedExecutor(thread_name_prefix="to-thread")
+
 @app.on_event("startup")
 async def startup_event():
     # Move all blocking syncs to a background task so server accepts requests IMMEDIATELY
     global app_loop
     app_loop = asyncio.get_running_loop()
+    app_loop.set_default_executor(default_executor)
+    startup_timing["imported"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+    await notification_manager.start()
+    email_outbox.start()
+    asyncio.create_task(run_startup_phases())
+
+def warm_startup():
+    """Build the heavy clients and load the Drive libraries off the event loop."""
+    warm_clients()
+    import googleapiclient.discovery  # noqa: F401  (first Drive call would otherwise pay for it)
+    import googleapiclient.http  # noqa: F401
+
+async def run_startup_phases():
+    """
+    Phase 1 (import + startup_event) only serves pages and health checks.
+    Phase 2 warms clients in a thread (requests wait for it in
+    WarmClientsMiddleware, so no handler builds one on the event loop);
+    phase 3 starts the syncs and loops that need them.
+    """
+    try:
+        await asyncio.to_thread(warm_startup)
+    except Exception as e:
+        print(f"[STARTUP] Warm-up error: {e}")
+    startup_timing["warm"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+    print(f"[STARTUP] Clients warm {startup_timing['warm']:.2f}s after process start")
     asyncio.create_task(run_startup_tasks())
+    asyncio.create_task(analytics_loop())
+    asyncio.create_task(asyncio.to_thread(sync_search_index))
+    asyncio.create_task(asyncio.to_thread(sync_vector_index))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Give queued webhook events a chance to reach the database
+    await call_lane_dispatcher.drain(timeout=10)
+    await notification_manager.stop()
+    await asyncio.to_thread(email_outbox.stop)
+    # Flush counters changed since the last periodic persist
+    await asyncio.to_thread(persist_call_stats)
+    await asyncio.to_thread(persist_rollups)
+    if _media_client is not None:
+        await _media_client.aclose()
 
 async def run_startup_tasks():
     print("[STARTUP] Background tasks starting (DB Sync, Drive Sync, Webhook)...")
@@ -76,73 +161,86 @@ async def run_startup_tasks():
         print("[STARTUP] Background tasks complete! System ready.")
     except Exception as e:
         print(f"[STARTUP] Background task error: {e}")
+    # Ready even when a sync failed: the app serves what it has and the loops retry
+    startup_timing["ready"] = round(time.perf_counter() - PROCESS_STARTED, 3)
 
 drive_page_token = None
 app_loop = None
 # Track which Drive files we've already seen/processed
 seen_ids = set()
 
-def create_notification_event(step, message, status="active", file_id=None):
-    """Helper to create standard notification payload."""
+def create_notification_event(step, message, status="active", file_id=None, job=None):
+    """
+    Helper to create standard notification payload.
+    `job` (the file being processed) scopes the event to the job:<name> topic
+    and lets a lagging client's pending steps for that job be coalesced.
+    """
     payload = {"step": step, "message": message, "status": status}
     if file_id: payload["file_id"] = file_id
-    return json.dumps(payload)
+    if job: payload["job"] = job
+    return payload
 
 
 async def process_drive_file(file_path, filename, drive_file_id, notification_manager):
     """
     Async version of audio processing with notifications for Drive uploads.
     """
+    prepared = None
     try:
         print(f"[PROCESS] Starting async processing for {filename}")
         
         # 1. Start Notification
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("drive_import", f"Importing {filename} from Google Drive...", "active"))
+            await notification_manager.broadcast(create_notification_event("drive_import", f"Importing {filename} from Google Drive...", "active", job=filename))
+
+        # Compact speech copy for transcription and storage
+        prepared = await run_in_threadpool(audio_preprocessor.prepare, file_path)
 
         # 2. Transcription
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("transcribe", f"Transcribing audio file: {filename}", "active"))
+            await notification_manager.broadcast(create_notification_event("transcribe", f"Transcribing audio file: {filename}", "active", job=filename))
             
         # Run blocking transcribe in threadpool
         transcript, duration_seconds, diarization_data, speaker_count, detected_lang = await run_in_threadpool(
-            transcribe_audio, file_path
+            transcribe_prepared, prepared
         )
         
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("transcribe", f"Transcription complete! Duration: {int(duration_seconds)}s, Speakers: {speaker_count}", "complete"))
+            skipped = f", {prepared.seconds_trimmed:.0f}s of silence skipped" if prepared.seconds_trimmed else ""
+            await notification_manager.broadcast(create_notification_event("transcribe", f"Transcription complete! Duration: {int(duration_seconds)}s, Speakers: {speaker_count}{skipped}", "complete", job=filename))
 
         # 3. Analysis
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("analyze", "Analyzing transcript with AI...", "active"))
+            await notification_manager.broadcast(create_notification_event("analyze", "Analyzing transcript with AI...", "active", job=filename))
             
         sentiment, tags, summary, speakers = await run_in_threadpool(
             analyze_transcript, transcript, diarization_data=diarization_data
         )
 
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("analyze", f"Analysis complete! Sentiment: {sentiment}", "complete"))
+            await notification_manager.broadcast(create_notification_event("analyze", f"Analysis complete! Sentiment: {sentiment}", "complete", job=filename))
 
         # 4. Upload to Supabase Storage
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("upload", "Uploading audio to Supabase storage...", "active"))
+            await notification_manager.broadcast(create_notification_event("upload", "Uploading audio to Supabase storage...", "active", job=filename))
         
         # Upload audio file to Supabase storage bucket
-        audio_url = await run_in_threadpool(upload_audio_to_supabase, file_path, filename)
+        audio_url = await run_in_threadpool(store_prepared_audio, prepared, filename)
         
         # Fallback to Google Drive URL if Supabase upload fails
         if not audio_url and drive_file_id:
             audio_url = f"https://drive.google.com/uc?export=download&id={drive_file_id}"
             print(f"[STORAGE] Using Google Drive URL as fallback")
+            FALLBACKS.inc(kind="drive_audio_url")
             if notification_manager:
-                await notification_manager.broadcast(create_notification_event("upload", "Using Google Drive URL as backup", "complete"))
+                await notification_manager.broadcast(create_notification_event("upload", "Using Google Drive URL as backup", "complete", job=filename))
         else:
             if notification_manager:
-                await notification_manager.broadcast(create_notification_event("upload", "Successfully uploaded to Supabase storage!", "complete"))
+                await notification_manager.broadcast(create_notification_event("upload", "Successfully uploaded to Supabase storage!", "complete", job=filename))
 
         # 5. Save Logic (Reused from process_audio_file logic but adapted)
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("save", "Saving to database...", "active"))
+            await notification_manager.broadcast(create_notification_event("save", "Saving to database...", "active", job=filename))
 
         # Patch diarization (copied logic)
         if speakers and diarization_data:
@@ -183,34 +281,31 @@ async def process_drive_file(file_path, filename, drive_file_id, notification_ma
             if exists.data:
                 print(f"[DB] Skipping save: {filename} already exists.")
                 if notification_manager:
-                    await notification_manager.broadcast(create_notification_event("save", "File already processed", "complete"))
-                    await notification_manager.broadcast(create_notification_event("done", f"{filename} already exists in database", "success"))
+                    await notification_manager.broadcast(create_notification_event("save", "File already processed", "complete", job=filename))
+                    await notification_manager.broadcast(create_notification_event("done", f"{filename} already exists in database", "success", job=filename))
                 return
 
-            # Send Email
-            try:
-                email_sent = await run_in_threadpool(send_email_notification, filename, sentiment, tags, summary)
-                data["email_sent"] = email_sent
-            except Exception:
-                pass
-
-            await run_in_threadpool(lambda: supabase.table('calls').insert(data).execute())
+            inserted = await run_in_threadpool(insert_call_row, data)
+            await run_in_threadpool(emit_call_change, "insert", inserted.data[0] if inserted.data else data)
+            queue_email_notification(inserted.data[0] if inserted.data else data)
             print(f"[DB] Saved results for {filename}")
             
             # Send save completion notification
             if notification_manager:
-                await notification_manager.broadcast(create_notification_event("save", "Successfully saved to database!", "complete"))
+                await notification_manager.broadcast(create_notification_event("save", "Successfully saved to database!", "complete", job=filename))
 
         # Final success notification
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("done", f"✅ {filename} processed successfully!", "success"))
+            await notification_manager.broadcast(create_notification_event("done", f"✅ {filename} processed successfully!", "success", job=filename))
             
     except Exception as e:
         print(f"[PROCESS] Error in async drive processing: {e}")
         if notification_manager:
-            await notification_manager.broadcast(create_notification_event("error", f"Error processing {filename}: {str(e)}", "error"))
+            await notification_manager.broadcast(create_notification_event("error", f"Error processing {filename}: {str(e)}", "error", job=filename))
     finally:
         # Cleanup temp file
+        if prepared:
+            prepared.cleanup()
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
@@ -255,6 +350,17 @@ templates = Jinja2Templates(directory="templates")
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Recordings are transcoded to 16 kHz mono Opus before upload and transcription
+# (see audio_processing.py); the original is stored too only when KEEP_ORIGINAL_AUDIO=true
+audio_preprocessor = AudioPreprocessor(
+    workers=int(os.environ.get("AUDIO_TRANSCODE_WORKERS", "0")) or None,
+    bitrate=os.environ.get("AUDIO_SPEECH_BITRATE", SPEECH_BITRATE),
+    enabled=os.environ.get("AUDIO_TRANSCODE", "true").lower() != "false",
+    trim_silence=os.environ.get("AUDIO_TRIM_SILENCE", "true").lower() != "false",
+    min_silence=float(os.environ.get("AUDIO_MIN_SILENCE_SECONDS", "1.0")),
+)
+KEEP_ORIGINAL_AUDIO = os.environ.get("KEEP_ORIGINAL_AUDIO", "false").lower() == "true"
+
 # Google Drive Config
 # You can override this by setting GOOGLE_DRIVE_FOLDER_ID in your .env file
 FOLDER_ID = os.environ.get("GOOGLE_DRIVE_FOLDER_ID", "1tUVWuJhjfsSC1BpfgMScflHefr1_vKYy")
@@ -262,184 +368,325 @@ FOLDER_ID = os.environ.get("GOOGLE_DRIVE_FOLDER_ID", "1tUVWuJhjfsSC1BpfgMScflHef
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
 # --- Supabase Setup ---
-from supabase import create_client, Client
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = None
 
-if not url or not key:
-    print("Warning: SUPABASE_URL or SUPABASE_KEY not found.")
-else:
+def create_supabase_client():
+    """A new Supabase client (the shared one is `supabase`; admin checks sign in on their own)."""
+    from supabase import create_client
+    return create_client(url, key)
+
+def supabase_configured():
+    return bool(url and key)
+
+def create_shared_supabase_client():
+    if not supabase_configured():
+        print("Warning: SUPABASE_URL or SUPABASE_KEY not found.")
+        return None
+    # Queries are timed at execute(), storage calls at upload / download / list / remove
+    return trace_calls(create_supabase_client(), dependencies.recorder("supabase"),
+                       terminal=("execute", "upload", "download", "list", "remove"), attributes=("storage",))
+
+supabase = LazyClient("supabase", create_shared_supabase_client, supabase_configured)
+
+# --- Call Change Tracking ---
+# Every write to `calls` is reported here so in-memory aggregates stay
+# current without re-reading the table. Listeners must be thread-safe:
+# the upload pipeline writes from threadpool workers, and async handlers
+# emit from the threadpool too, since the index listeners block (FTS5
+# writes, embedding inference).
+call_change_listeners = []
+
+def on_call_change(listener):
+    call_change_listeners.append(listener)
+    return listener
+
+def emit_call_change(kind, new_row=None, old_row=None):
+    """kind: "insert", "update" or "delete"; rows as stored in `calls`."""
+    for listener in call_change_listeners:
+        try:
+            listener(kind, new_row, old_row)
+        except Exception as e:
+            print(f"[CALL-CHANGE] Listener error ({kind}): {e}")
+
+call_stats = CallStatsAggregator()
+on_call_change(call_stats.apply_change)
+call_rollups = RollupStore()
+on_call_change(call_rollups.apply_change)
+# Local full-text index for /api/calls search and filters (see search_index.py)
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", "search_index.db")
+search_index = CallSearchIndex(SEARCH_INDEX_PATH)
+on_call_change(search_index.apply_change)
+# Embedding stage: inserted and re-analysed calls are embedded (summary + tags)
+# right after they are written, for /api/calls/{id}/similar (see vector_index.py)
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vector_index")
+vector_index = VectorIndex(
+    VECTOR_INDEX_DIR,
+    create_embedder(os.environ.get("EMBEDDING_PROVIDER", "auto"), os.environ.get("EMBEDDING_MODEL") or None),
+    nprobe=int(os.environ.get("VECTOR_NPROBE", "8")),
+)
+on_call_change(vector_index.apply_change)
+# Cached read endpoints (ETag / If-None-Match); writes invalidate by tag (see response_cache.py)
+response_cache = ResponseCache(ttl=float(os.environ.get("RESPONSE_CACHE_TTL", "30")))
+
+@on_call_change
+def invalidate_cached_calls(kind, new_row=None, old_row=None):
+    call_id = (new_row or old_row or {}).get("id")
+    response_cache.invalidate("calls", *([f"call:{call_id}"] if call_id is not None else []))
+
+# Fields pushed in call.* events: what a dashboard table row shows (CALL_LIST_FIELDS in main.js)
+CALL_EVENT_FIELDS = ("id", "filename", "sentiment", "tags", "summary_excerpt",
+                     "duration", "created_at", "speaker_count", "email_sent")
+
+def call_event_row(row):
+    if "summary" in row:
+        row = {**row, "summary_excerpt": summary_excerpt(row["summary"])}
+    return {k: row[k] for k in CALL_EVENT_FIELDS if k in row}
+
+def call_change_events(kind, new_row=None, old_row=None):
+    """(event type, payload) pairs pushed to dashboards for one call change."""
+    events = []
+    if kind == "insert" and new_row:
+        events.append(("call.created", {"call": call_event_row(new_row)}))
+    elif kind == "update" and new_row:
+        delta = call_event_row(new_row)
+        if old_row:
+            before = call_event_row(old_row)
+            delta = {k: v for k, v in delta.items() if k == "id" or before.get(k) != v}
+        if len(delta) > 1:  # e.g. a diarization edit changes nothing the table shows
+            events.append(("call.updated", {"call": delta}))
+    elif kind == "delete" and old_row:
+        events.append(("call.deleted", {"call": {"id": old_row["id"]}}))
+    if events and (call_stats.ready or call_stats.seeded):
+        # call_stats was updated by its own listener, registered before this one
+        events.append(("stats.changed", {"stats": call_stats.snapshot()}))
+    return events
+
+def broadcast_from_any_thread(message, **kwargs):
+    """Schedule notification_manager.broadcast() from the event loop or a worker thread."""
+    if app_loop is None: return
+    coro = notification_manager.broadcast(message, **kwargs)
     try:
-        supabase = create_client(url, key)
+        on_loop = asyncio.get_running_loop() is app_loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        app_loop.create_task(coro)
+    else:
+        asyncio.run_coroutine_threadsafe(coro, app_loop)
+
+@on_call_change
+def push_call_change(kind, new_row=None, old_row=None):
+    """Typed SSE events so open dashboards apply the change without re-fetching."""
+    for event, payload in call_change_events(kind, new_row, old_row):
+        # Stats snapshots supersede each other; a slow client only needs the latest
+        broadcast_from_any_thread({"type": event, **payload}, event=event,
+                                  coalesce_key="stats" if event == "stats.changed" else None)
+
+# Optional table holding the last counters so restarts serve stats before hydration finishes
+CALL_STATS_TABLE = os.environ.get("CALL_STATS_TABLE")
+CALL_STATS_PERSIST_SECONDS = float(os.environ.get("CALL_STATS_PERSIST_SECONDS", "60"))
+# Optional hour/day/week rollup table; restarts serve it until the startup scan
+# reconciles it (only buckets that changed while the process was down are rewritten)
+ROLLUP_TABLE = os.environ.get("ROLLUP_TABLE")
+ROLLUP_CONFLICT_COLUMNS = "granularity,bucket_start,group_by,group_value"
+
+def fetch_calls_after(after_id, limit, columns=STATS_COLUMNS):
+    """Keyset page over the full `calls` history (id > after_id, ascending)."""
+    res = supabase.table('calls').select(columns).gt('id', after_id).order('id').limit(limit).execute()
+    return res.data or []
+
+def load_persisted_call_stats():
+    if not (supabase and CALL_STATS_TABLE): return
+    try:
+        res = supabase.table(CALL_STATS_TABLE).select("stats").eq('id', 1).execute()
+        if res.data:
+            call_stats.load_record(res.data[0]["stats"])
+            print("[STATS] Loaded persisted call stats")
     except Exception as e:
-        print(f"Supabase Init Error: {e}")
+        print(f"[STATS] Could not load persisted stats: {e}")
 
-# --- Email Notification Setup ---
-EMAIL_RECIPIENT = "basileldo2@gmail.com"
-
-def send_email_notification(filename, sentiment, tags, summary):
-    """Send email notification after transcription is complete."""
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 587
-    sender_email = os.environ.get("SMTP_EMAIL")
-    sender_password = os.environ.get("SMTP_PASSWORD")
-    
-    if not sender_email or not sender_password:
-        print("[EMAIL] Warning: SMTP_EMAIL or SMTP_PASSWORD not set in .env")
-        return False
-    
+def persist_call_stats():
+    if not (supabase and CALL_STATS_TABLE and call_stats.ready): return
     try:
-        # Parse summary JSON if it's a string
-        summary_data = None
-        summary_text = ""
-        
-        if isinstance(summary, str):
-            try:
-                summary_data = json.loads(summary)
-                # Get overview as the main summary
-                summary_text = summary_data.get('overview', summary)
-            except:
-                summary_text = summary
-        elif isinstance(summary, dict):
-            summary_data = summary
-            summary_text = summary_data.get('overview', str(summary))
-        else:
-            summary_text = str(summary)
-        
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = f"📞 [VoxAnalyze] New Call Analyzed: {filename}"
-        msg["From"] = sender_email
-        msg["To"] = EMAIL_RECIPIENT
-        
-        tags_str = ", ".join(tags) if tags else "None"
-        
-        # Build plain text version
-        text = f"""
-============================================================
-NEW CALL ANALYSIS COMPLETE
-============================================================
-
-File: {filename}
-Sentiment: {sentiment}
-Tags: {tags_str}
-
-SUMMARY:
-------------------------------------------------------------
-{summary_text}
-
-============================================================
-VoxAnalyze - AI-Powered Call Analysis Dashboard
-============================================================
-"""
-        
-        # Build HTML version
-        sentiment_class = sentiment.lower() if sentiment else 'neutral'
-        sentiment_colors = {
-            'positive': {'bg': '#d1fae5', 'text': '#065f46'},
-            'negative': {'bg': '#fee2e2', 'text': '#991b1b'},
-            'neutral': {'bg': '#e2e8f0', 'text': '#475569'}
-        }
-        sentiment_color = sentiment_colors.get(sentiment_class, sentiment_colors['neutral'])
-        
-        html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #f8fafc; padding: 20px; margin: 0; }}
-        .container {{ max-width: 650px; margin: 0 auto; background: white; border-radius: 16px; overflow: hidden; box-shadow: 0 10px 25px rgba(0,0,0,0.1); }}
-        .header {{ background: linear-gradient(135deg, #6366f1 0%, #4f46e5 100%); color: white; padding: 32px 24px; text-align: center; }}
-        .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
-        .header p {{ margin: 8px 0 0 0; opacity: 0.9; font-size: 14px; }}
-        .content {{ padding: 32px 24px; }}
-        .meta-row {{ display: flex; flex-wrap: wrap; gap: 12px; margin-bottom: 24px; padding-bottom: 24px; border-bottom: 2px solid #f1f5f9; }}
-        .meta-item {{ flex: 1; min-width: 200px; }}
-        .meta-label {{ font-size: 12px; font-weight: 600; color: #64748b; text-transform: uppercase; letter-spacing: 0.5px; margin-bottom: 4px; }}
-        .meta-value {{ font-size: 15px; color: #0f172a; font-weight: 500; }}
-        .stat {{ display: inline-block; padding: 6px 14px; border-radius: 20px; font-weight: 600; font-size: 14px; }}
-        .tags {{ display: flex; flex-wrap: wrap; gap: 6px; }}
-        .tag {{ background: #f1f5f9; color: #475569; padding: 4px 12px; border-radius: 12px; font-size: 13px; font-weight: 500; }}
-        .summary-box {{ background: #f8fafc; padding: 20px; border-radius: 12px; line-height: 1.8; color: #334155; font-size: 15px; margin-top: 24px; border-left: 4px solid #6366f1; }}
-        .footer {{ text-align: center; padding: 24px; background: #f8fafc; color: #94a3b8; font-size: 13px; border-top: 1px solid #e2e8f0; }}
-        .footer strong {{ color: #64748b; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📞 New Call Analyzed</h1>
-            <p>Call analysis summary</p>
-        </div>
-        <div class="content">
-            <div class="meta-row">
-                <div class="meta-item">
-                    <div class="meta-label">File Name</div>
-                    <div class="meta-value">{filename}</div>
-                </div>
-                <div class="meta-item">
-                    <div class="meta-label">Sentiment</div>
-                    <div class="meta-value">
-                        <span class="stat" style="background: {sentiment_color['bg']}; color: {sentiment_color['text']};">{sentiment}</span>
-                    </div>
-                </div>
-            </div>
-"""
-        
-        # Tags section
-        if tags:
-            html += f"""
-            <div class="meta-row">
-                <div class="meta-item" style="flex: 1 1 100%;">
-                    <div class="meta-label">Tags</div>
-                    <div class="tags">
-"""
-            for tag in tags:
-                html += f'                        <span class="tag">{tag}</span>\n'
-            html += """                    </div>
-                </div>
-            </div>
-"""
-        
-        # Summary section
-        html += f"""
-            <div class="summary-box">
-                <strong style="color: #1e293b; font-size: 16px; display: block; margin-bottom: 12px;">Summary</strong>
-                {summary_text}
-            </div>
-        </div>
-        <div class="footer">
-            <strong>VoxAnalyze</strong> - AI-Powered Call Analysis Dashboard
-        </div>
-    </div>
-</body>
-</html>"""
-        
-        part1 = MIMEText(text, "plain")
-        part2 = MIMEText(html, "html")
-        msg.attach(part1)
-        msg.attach(part2)
-        
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, EMAIL_RECIPIENT, msg.as_string())
-        
-        print(f"[EMAIL] Notification sent to {EMAIL_RECIPIENT}")
-        return True
-        
+        supabase.table(CALL_STATS_TABLE).upsert({
+            "id": 1,
+            "stats": call_stats.to_record(),
+            "updated_at": datetime.now().isoformat(),
+        }).execute()
+    except Exception as e:
+        print(f"[STATS] Could not persist stats: {e}")
+
+def load_persisted_rollups():
+    """Seed rollups from the table; returns True if it had rows."""
+    if not (supabase and ROLLUP_TABLE): return False
+    try:
+        loaded, offset, page = 0, 0, 1000
+        while True:
+            res = supabase.table(ROLLUP_TABLE).select("*").range(offset, offset + page - 1).execute()
+            rows = res.data or []
+            loaded += call_rollups.load_records(rows)
+            if len(rows) < page: break
+            offset += page
+        print(f"[ROLLUPS] Loaded {loaded} persisted rollup buckets")
+        return loaded > 0
     except Exception as e:
-        print(f"[EMAIL] Error sending notification: {e}")
+        print(f"[ROLLUPS] Could not load persisted rollups: {e}")
         return False
 
+def write_rollup_records(records):
+    for i in range(0, len(records), 500):
+        supabase.table(ROLLUP_TABLE).upsert(records[i:i + 500], on_conflict=ROLLUP_CONFLICT_COLUMNS).execute()
+
+def persist_rollups():
+    if not (supabase and ROLLUP_TABLE): return
+    records = call_rollups.take_dirty()
+    if not records: return
+    try:
+        write_rollup_records(records)
+        print(f"[ROLLUPS] Wrote {len(records)} bucket(s) to {ROLLUP_TABLE}")
+    except Exception as e:
+        call_rollups.restore_dirty(records)
+        print(f"[ROLLUPS] Could not persist {len(records)} bucket(s): {e}")
+
+def backfill_rollups():
+    """
+    Rebuild every rollup bucket from the full calls history and bring the
+    table in line: changed buckets are rewritten and buckets that no
+    longer exist in the history are zeroed.
+    """
+    t_start = time.time()
+    rows = call_rollups.hydrate(fetch_calls_after)
+    print(f"[ROLLUPS] Rebuilt rollups from {rows} calls in {time.time() - t_start:.2f}s")
+    persist_rollups()
+    return rows
+
+def fetch_call_versions():
+    """{id: updated_at} for every call, reading only those two columns."""
+    versions, after_id, page = {}, 0, 5000
+    while True:
+        rows = fetch_calls_after(after_id, page, columns="id, updated_at")
+        versions.update((r["id"], r.get("updated_at")) for r in rows)
+        if len(rows) < page:
+            return versions
+        after_id = rows[-1]["id"]
+
+def fetch_calls_by_ids(ids, columns=SEARCH_COLUMNS + ", updated_at"):
+    return supabase.table('calls').select(columns).in_('id', ids).execute().data or []
+
+def sync_search_index():
+    if not (supabase and search_index.available): return
+    try:
+        t_start = time.time()
+        indexed, removed = search_index.sync(
+            lambda after_id, limit: fetch_calls_after(after_id, limit, columns=SEARCH_COLUMNS + ", updated_at"),
+            fetch_call_versions,
+            fetch_calls_by_ids,
+        )
+        print(f"[SEARCH] Index synced: {indexed} indexed, {removed} removed in {time.time() - t_start:.2f}s")
+    except Exception as e:
+        print(f"[SEARCH] Index sync failed: {e}")
+
+def sync_vector_index():
+    if not vector_index.available: return
+    # Loading the embedding model may mean a download; this runs in its own
+    # task so it never holds up the DB / Drive syncs (or /readyz)
+    vector_index.warm()
+    if not supabase: return
+    try:
+        t_start = time.time()
+        embedded, removed = vector_index.sync(
+            fetch_call_versions,
+            lambda ids: fetch_calls_by_ids(ids, columns=VECTOR_COLUMNS),
+        )
+        print(f"[VECTORS] Index synced: {embedded} embedded, {removed} removed in {time.time() - t_start:.2f}s")
+    except Exception as e:
+        print(f"[VECTORS] Index sync failed: {e}")
+
+async def analytics_loop():
+    """
+    Hydrate call stats and rollups from one scan of the full history, then
+    persist them periodically. The persisted copies only serve the window
+    before the scan finishes; the scan also reconciles the rollup table
+    with writes it missed (unflushed buckets, a crash).
+    """
+    if not supabase: return
+    await asyncio.to_thread(load_persisted_call_stats)
+    await asyncio.to_thread(load_persisted_rollups)
+    try:
+        t_start = time.time()
+        rows = await asyncio.to_thread(hydrate_all, (call_stats, call_rollups), fetch_calls_after)
+        print(f"[STATS] Hydrated call stats and rollups from {rows} calls in {time.time() - t_start:.2f}s")
+    except Exception as e:
+        print(f"[STATS] Hydration failed: {e}")
+        return
+    persisted_version = None
+    while True:
+        if call_stats.version != persisted_version:
+            persisted_version = call_stats.version
+            await asyncio.to_thread(persist_call_stats)
+        await asyncio.to_thread(persist_rollups)
+        await asyncio.sleep(CALL_STATS_PERSIST_SECONDS)
+
+# --- Email Notification Setup ---
+# Comma-separated; EMAIL_RECIPIENT (single address) is still honoured
+EMAIL_RECIPIENTS = [r.strip() for r in os.environ.get(
+    "EMAIL_RECIPIENTS", os.environ.get("EMAIL_RECIPIENT", "basileldo2@gmail.com")).split(",") if r.strip()]
+
+# Notification emails are rendered from templates/email (see email_templates.py)
+email_renderer = EmailRenderer(EMAIL_TEMPLATE_DIR, locale=os.environ.get("EMAIL_LOCALE", "en"))
+on_call_change(email_renderer.apply_change)
+
+def mark_emails_sent(call_ids):
+    """Outbox callback: record delivered notifications on their calls."""
+    if not supabase: return
+    supabase.table('calls').update({"email_sent": True}).in_("id", call_ids).execute()
+    for call_id in call_ids:
+        emit_call_change("update", {"id": call_id, "email_sent": True})
+
+# Notification emails are queued after the call is saved and sent by the
+# outbox's own thread over a reused SMTP connection (see email_outbox.py)
+email_outbox = EmailOutbox(
+    os.environ.get("EMAIL_OUTBOX_PATH", "email_outbox.db"),
+    render=email_renderer.render,
+    sender=os.environ.get("SMTP_EMAIL"),
+    password=os.environ.get("SMTP_PASSWORD"),
+    recipients=EMAIL_RECIPIENTS,
+    smtp_host=os.environ.get("SMTP_SERVER", "smtp.gmail.com"),
+    smtp_port=int(os.environ.get("SMTP_PORT", "587")),
+    digest_size=int(os.environ.get("EMAIL_DIGEST_SIZE", "1")),
+    digest_seconds=float(os.environ.get("EMAIL_DIGEST_SECONDS", "0")),
+    max_attempts=int(os.environ.get("EMAIL_MAX_ATTEMPTS", "8")),
+    record_latency=lambda seconds, ok, error: record_email_send(seconds, ok, error),
+    separate_recipients=os.environ.get("EMAIL_SEPARATE_RECIPIENTS", "false").lower() == "true",
+    on_sent=mark_emails_sent,
+)
+if not email_outbox.enabled:
+    print("[EMAIL] Warning: SMTP_EMAIL or SMTP_PASSWORD not set in .env")
+
+def record_email_send(seconds, ok, error):
+    dependencies.record("smtp", seconds, ok, error)
+    metrics.observe_stage("email", seconds)
+    if not ok:
+        RETRIES.inc(operation="email")
+
+def queue_email_notification(row):
+    """Queue the notification for a just-inserted `calls` row; never blocks on SMTP."""
+    try:
+        email_outbox.enqueue({key: row.get(key) for key in ("id", "filename", "sentiment", "tags", "summary")})
+    except Exception as e:
+        print(f"[EMAIL] Could not queue notification for {row.get('filename')}: {e}")
+
 # --- Supabase Storage Helper Functions ---
 
-def upload_audio_to_supabase(file_path, filename):
+def upload_audio_to_supabase(file_path, filename, content_type=None):
     """
     Upload an audio file to Supabase Storage.
     
     Args:
         file_path: Path to the local audio file
         filename: Name to use for the file in storage
+        content_type: MIME type to store (default: from file_path's extension)
     
     Returns:
         public_url: Public URL of the uploaded file, or None if failed
@@ -462,7 +709,7 @@ def upload_audio_to_supabase(file_path, filename):
         response = supabase.storage.from_(bucket_name).upload(
             path=filename,
             file=file_content,
-            file_options={"content-type": "audio/wav", "upsert": "true"}
+            file_options={"content-type": content_type or mime_type_for(file_path), "upsert": "true"}
         )
         
         # Get public URL
@@ -477,9 +724,52 @@ def upload_audio_to_supabase(file_path, filename):
         traceback.print_exc()
         return None
 
+@stage("upload")
+def store_prepared_audio(prepared, filename):
+    """
+    Upload a preprocessed recording (see audio_processing.py) to Supabase Storage.
+
+    The compact copy is stored under its speech name (call.wav -> call.ogg);
+    with KEEP_ORIGINAL_AUDIO the untouched upload is also kept under originals/.
+
+    Returns:
+        public_url: Public URL of the stored (compact) file, or None if failed
+    """
+    public_url = upload_audio_to_supabase(prepared.path, prepared.storage_name(filename), prepared.mime_type)
+    if public_url and KEEP_ORIGINAL_AUDIO and prepared.transcoded:
+        upload_audio_to_supabase(prepared.original_path, f"originals/{filename}", prepared.original_mime_type)
+    if public_url and prepared.waveform:
+        upload_waveform_to_supabase(filename, prepared.waveform)
+    return public_url
+
+def upload_waveform_to_supabase(filename, waveform):
+    """Store waveform peaks (audio_processing.encode_peaks) next to the call's audio. Best effort."""
+    if not supabase:
+        return False
+    try:
+        supabase.storage.from_("audio-files").upload(
+            path=waveform_filename(filename),
+            file=waveform,
+            file_options={"content-type": WAVEFORM_MIME_TYPE, "upsert": "true"}
+        )
+        return True
+    except Exception as e:
+        print(f"[SUPABASE STORAGE] Waveform upload failed for {filename}: {e}")
+        return False
+
+def download_waveform_from_supabase(filename):
+    """Stored waveform peaks for `filename`, or None if there are none."""
+    if not supabase:
+        return None
+    try:
+        return supabase.storage.from_("audio-files").download(waveform_filename(filename))
+    except Exception:
+        return None
+
 def check_file_exists_in_supabase(filename):
     """
-    Check if a file already exists in Supabase Storage.
+    Check if a file already exists in Supabase Storage, as uploaded or as
+    its transcoded speech copy.
     
     Args:
         filename: Name of the file to check
@@ -497,10 +787,11 @@ def check_file_exists_in_supabase(filename):
         files = supabase.storage.from_(bucket_name).list()
         
         # Check if file exists
+        candidates = (filename, speech_filename(filename))
         for file in files:
-            if file['name'] == filename:
-                public_url = supabase.storage.from_(bucket_name).get_public_url(filename)
-                print(f"[SUPABASE STORAGE] File {filename} already exists: {public_url}")
+            if file['name'] in candidates:
+                public_url = supabase.storage.from_(bucket_name).get_public_url(file['name'])
+                print(f"[SUPABASE STORAGE] File {file['name']} already exists: {public_url}")
                 return public_url
         
         return None
@@ -687,6 +978,7 @@ def analyze_transcript_fallback(text):
     summary = ". ".join(sentences[:2]).strip() + "." if len(sentences) > 0 else text
     return sentiment, tags, summary
 
+@stage("analyze")
 def analyze_transcript(text, diarization_data=None):
     if not text: return "Neutral", [], "No text to summarize", {}
     
@@ -721,112 +1013,96 @@ def analyze_transcript(text, diarization_data=None):
             return result
         
     print("[ANALYSIS] Using fallback keyword analysis")
+    FALLBACKS.inc(kind="keyword_analysis")
     sentiment, tags, summary = analyze_transcript_fallback(text)
     return sentiment, tags, summary, {}
 
-import requests
-
 # ... (Previous imports remaining unchanged) ...
 
 # --- AssemblyAI Setup ---
 # aai.settings.api_key = os.environ.get("ASSEMBLYAI_API_KEY") # Removed SDK setup
 
-def transcribe_audio(file_path, language_code=None, speakers_expected=None):
-    api_key = os.environ.get("ASSEMBLYAI_API_KEY")
-    if not api_key:
-        return "Error: AssemblyAI API Key missing", 0, [], 0
+# Which engine transcribes: "assemblyai" (default), "faster-whisper" (local CPU,
+# for offline backfills) or "fake" (deterministic, for benchmarks); see transcription.py
+transcriber = create_transcriber(
+    os.environ.get("TRANSCRIPTION_BACKEND", "assemblyai"),
+    model_name=os.environ.get("WHISPER_MODEL") or None,
+    workers=int(os.environ.get("TRANSCRIBE_WORKERS", "2")),
+)
 
-    headers = {'authorization': api_key}
+transcriber.on_stage = metrics.observe_stage
 
-    try:
-        print(f"Uploading {file_path} to AssemblyAI...")
-        def read_file(filename, chunk_size=5242880):
-            with open(filename, 'rb') as _file:
-                while True:
-                    data = _file.read(chunk_size)
-                    if not data: break
-                    yield data
-
-        upload_response = requests.post('https://api.assemblyai.com/v2/upload', headers=headers, data=read_file(file_path))
-        upload_response.raise_for_status()
-        upload_url = upload_response.json()['upload_url']
-
-        print("Requesting transcription...")
-        json_data = {
-            "audio_url": upload_url, 
-            "speaker_labels": True
-        }
-        
-        # If language is provided, use it, else use detection
-        if language_code and language_code != 'auto':
-            json_data["language_code"] = language_code
-        else:
-            json_data["language_detection"] = True
-            
-        # Add speaker count hint if provided
-        if speakers_expected and int(speakers_expected) > 0:
-            json_data["speakers_expected"] = int(speakers_expected)
-            
-        response = requests.post('https://api.assemblyai.com/v2/transcript', json=json_data, headers=headers)
-        response.raise_for_status()
-        transcript_id = response.json()['id']
+def transcribe_audio(file_path, language_code=None, speakers_expected=None):
+    """(text, duration, diarization_data, speaker_count, language_code) from the configured backend."""
+    t0 = time.perf_counter()
+    result = transcriber.transcribe(file_path, language_code, speakers_expected)
+    failed = is_failed(result)
+    dependencies.record(transcriber.name, time.perf_counter() - t0, not failed, result[0] if failed else None)
+    return result
+
+# Recordings longer than this are split at pauses and transcribed as concurrent
+# shards (see transcription.py); 0 disables sharding
+sharded_transcriber = ShardedTranscriber(
+    transcribe_audio,
+    shard_seconds=float(os.environ.get("TRANSCRIBE_SHARD_MINUTES", "15")) * 60,
+    overlap_seconds=float(os.environ.get("TRANSCRIBE_SHARD_OVERLAP_SECONDS", "20")),
+    max_workers=int(os.environ.get("TRANSCRIBE_SHARD_WORKERS", "4")),
+)
 
-        print(f"Polling for transcript {transcript_id}...")
-        while True:
-            polling_response = requests.get(f'https://api.assemblyai.com/v2/transcript/{transcript_id}', headers=headers)
-            polling_response.raise_for_status()
-            result = polling_response.json()
-
-            if result['status'] == 'completed':
-                text = result.get('text', '')
-                duration = result.get('audio_duration', 0)
-                language_code = result.get('language_code', 'en')
-                
-                diarization_data = []
-                utterances = result.get('utterances', [])
-                speaker_set = set()
-                
-                if utterances:
-                    for utt in utterances:
-                        speaker_label = utt.get('speaker', 'Unknown')
-                        speaker_set.add(speaker_label)
-                        diarization_data.append({
-                            "speaker": speaker_label,
-                            "text": utt.get('text', ''),
-                            "start": utt.get('start'),
-                            "end": utt.get('end')
-                        })
-                
-                speaker_count = len(speaker_set)
-                print(f"[TRANSCRIBE] Duration: {duration}s, Speakers: {speaker_count}, Language: {language_code}")
-                return text, duration, diarization_data, speaker_count, language_code
-            
-            elif result['status'] == 'error':
-                 return f"Transcription Failed: {result.get('error')}", 0, [], 0, 'en'
-            
-            time.sleep(3)
+@stage("db_write")
+def insert_call_row(data):
+    """Insert a processed call into `calls` (the pipelines' final write)."""
+    return supabase.table('calls').insert(data).execute()
 
-    except Exception as e:
-        print(f"Transcription Exception: {e}")
-        return f"Transcription Exception: {e}", 0, [], 0, 'en'
+# Recordings being transcribed right now (the pipeline's heavy stage), for /readyz
+pipeline_jobs = 0
+pipeline_jobs_lock = threading.Lock()
+
+@stage("transcribe")
+def transcribe_prepared(prepared, language_code=None, speakers_expected=None):
+    """
+    transcribe_audio() on the silence-trimmed copy of a preprocessed recording
+    (sharded when it is long), with duration and diarization timestamps
+    translated back to the full recording.
+    """
+    global pipeline_jobs
+    transcribe = transcribe_audio
+    seconds = (prepared.duration or prepared.probe.get("duration") or 0) - prepared.seconds_trimmed
+    if audio_preprocessor.enabled and sharded_transcriber.should_shard(seconds):
+        transcribe = sharded_transcriber.transcribe
+    with pipeline_jobs_lock:
+        pipeline_jobs += 1
+    try:
+        transcript, duration_seconds, diarization_data, speaker_count, detected_lang = transcribe(
+            prepared.transcription_path, language_code, speakers_expected)
+    finally:
+        with pipeline_jobs_lock:
+            pipeline_jobs -= 1
+    duration_seconds, diarization_data = prepared.restore_timeline(duration_seconds, diarization_data)
+    if prepared.seconds_trimmed:
+        print(f"[TRANSCRIBE] Skipped {prepared.seconds_trimmed:.1f}s of silence ({prepared.describe()})")
+    return transcript, duration_seconds, diarization_data, speaker_count, detected_lang
 
 def encode_audio_to_base64(file_path):
     try:
         import base64
         with open(file_path, 'rb') as f:
             file_data = f.read()
-        ext = file_path.lower().split('.')[-1] if '.' in file_path else 'wav'
-        content_types = {'wav': 'audio/wav', 'mp3': 'audio/mpeg', 'm4a': 'audio/mp4', 'ogg': 'audio/ogg', 'webm': 'audio/webm'}
-        content_type = content_types.get(ext, 'audio/mpeg')
+        content_type = mime_type_for(file_path)
         b64_data = base64.b64encode(file_data).decode('utf-8')
         return f"data:{content_type};base64,{b64_data}"
     except Exception as e:
         print(f"[AUDIO] Error encoding audio: {e}")
         return None
 
-def process_audio_file(file_path, original_filename, drive_file_id=None, language_code=None, speakers_expected=None):
+def process_audio_file(file_path, original_filename, drive_file_id=None, language_code=None, speakers_expected=None, prepared=None):
+    """`prepared` is the caller's preprocessed audio, when it already transcoded (and owns) the file."""
+    own_prepared = None
     try:
-        transcript, duration_seconds, diarization_data, speaker_count, detected_lang = transcribe_audio(file_path, language_code, speakers_expected)
+        if prepared is None:
+            prepared = own_prepared = audio_preprocessor.prepare(file_path)
+        file_path = prepared.path
+        transcript, duration_seconds, diarization_data, speaker_count, detected_lang = transcribe_prepared(prepared, language_code, speakers_expected)
         sentiment, tags, summary, speakers = analyze_transcript(transcript, diarization_data=diarization_data)
         
         # Patch diarization_data with detected speaker names
@@ -853,8 +1129,6 @@ def process_audio_file(file_path, original_filename, drive_file_id=None, languag
             if len(speaker_map) > 0:
                 speaker_count = len(speaker_map)
 
-        email_sent = False
-        
         audio_url = encode_audio_to_base64(file_path)
         if not audio_url and drive_file_id:
             audio_url = f"https://drive.google.com/uc?export=download&id={drive_file_id}"
@@ -885,19 +1159,15 @@ def process_audio_file(file_path, original_filename, drive_file_id=None, languag
                             print(f"[DB] Skipping save: {original_filename} already exists in database.")
                             return exists.data[0]
 
-                    if attempt == 0: # Send email only once
-                         try:
-                             email_sent = send_email_notification(original_filename, sentiment, tags, summary)
-                             data["email_sent"] = email_sent
-                         except Exception as email_err:
-                             print(f"[EMAIL] Warning during processing: {email_err}")
-
-                    supabase.table('calls').insert(data).execute()
+                    inserted = insert_call_row(data)
+                    emit_call_change("insert", inserted.data[0] if inserted.data else data)
+                    queue_email_notification(inserted.data[0] if inserted.data else data)
                     print(f"[DB] Saved results for {original_filename}")
                     break # Success!
                 except Exception as db_err:
                     print(f"[DB] Error (Attempt {attempt+1}/{max_retries}): {db_err}")
                     if attempt < max_retries - 1:
+                        RETRIES.inc(operation="db_write")
                         time.sleep(2) # Wait before retry
                     else:
                         print(f"[DB] FAILED to save {original_filename} after {max_retries} attempts.")
@@ -906,18 +1176,20 @@ def process_audio_file(file_path, original_filename, drive_file_id=None, languag
     except Exception as e:
         print(f"Error processing file: {e}")
         return None
+    finally:
+        if own_prepared:
+            own_prepared.cleanup()
 
 # --- Drive Logic ---
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-
 _cached_creds = None
 drive_update_lock = threading.Lock()
 
 def get_drive_service(user_id=None):
     """Initializes Google Drive service using Service Account credentials from Supabase user_settings."""
     global _cached_creds
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
     SCOPES = ['https://www.googleapis.com/auth/drive']
     creds = _cached_creds
     
@@ -995,7 +1267,7 @@ def get_drive_service(user_id=None):
         return None
 
     try:
-        return build('drive', 'v3', credentials=creds)
+        return trace_calls(build('drive', 'v3', credentials=creds), dependencies.recorder("drive"))
     except Exception as e:
         print(f"[DRIVE] Service Build Error: {e}")
         return None
@@ -1010,13 +1282,16 @@ def list_files_in_folder(service, folder_id):
         print(f"Drive List Error: {e}")
         return []
 
+@stage("download")
 def download_file_from_drive(service, file_id, filename):
+    from googleapiclient.http import MediaIoBaseDownload
     request = service.files().get_media(fileId=file_id)
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
     done = False
-    while not done:
-        status, done = downloader.next_chunk()
+    with dependencies.track("drive"):
+        while not done:
+            status, done = downloader.next_chunk()
     
     file_path = os.path.join(UPLOAD_FOLDER, filename)
     with open(file_path, 'wb') as f:
@@ -1139,107 +1414,102 @@ from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 
+# Vapi retries webhooks that are slow to answer, so the endpoints only parse,
+# validate and enqueue. Events are then applied in order per call by
+# call_lane_dispatcher, through the shared handlers registered on vapi_router.
+VAPI_LANE_IDLE_SECONDS = float(os.environ.get("VAPI_LANE_IDLE_SECONDS", "60"))
+VAPI_IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("VAPI_IDEMPOTENCY_TTL_SECONDS", "900"))
+
+call_lane_dispatcher = CallLaneDispatcher(
+    idle_timeout=VAPI_LANE_IDLE_SECONDS,
+    dedupe_ttl=VAPI_IDEMPOTENCY_TTL_SECONDS,
+)
+vapi_router = VapiEventRouter()
+
+# Strong references to fire-and-forget tasks (asyncio only keeps weak ones)
+background_jobs = set()
+
+def spawn_background_job(coro):
+    task = asyncio.create_task(coro)
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    return task
+
+# Recording URLs whose processing has already been started (Vapi's end-of-call
+# report and the dashboard's own trigger can both deliver the same recording)
+_started_recordings: "OrderedDict[str, float]" = OrderedDict()
+
+async def ingest_vapi_payload(request: Request, log_tag: str) -> bool:
+    """Parse a Vapi webhook body once and queue it on its call's lane."""
+    raw_body = await request.body()
+    try:
+        payload = json.loads(raw_body)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Payload must be a JSON object")
+
+    event = parse_vapi_payload(payload)
+    accepted = call_lane_dispatcher.submit(
+        event.call_id, vapi_idempotency_key(raw_body), vapi_router.dispatch, event
+    )
+    if accepted:
+        print(f"[{log_tag}] Queued {event.type} for call {event.call_id}")
+    else:
+        print(f"[{log_tag}] Dropped duplicate {event.type} delivery for call {event.call_id}")
+    return accepted
+
 @app.post("/api/vapi-webhook")
-async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
+async def vapi_webhook(request: Request):
     """
     Handle Vapi webhooks for real-time transcripts and call events.
+    Responds immediately; the event is applied by the call's lane.
     """
+    accepted = await ingest_vapi_payload(request, "VAPI-WEBHOOK")
+    return JSONResponse(status_code=200, content={"success": True, "queued": accepted})
+
+@vapi_router.on("transcript", "speech-update", "conversation-update")
+async def handle_call_presence(event: VapiEvent):
+    """Any live-call activity means the call is in progress (ensures the vapi_calls row exists for FKs)."""
+    if not event.call_id or not supabase:
+        return
     try:
-        payload = await request.json()
-        message = payload.get('message', {})
-        
-        # Try to find call object in top-level or inside message
-        call_data = payload.get('call')
-        if not call_data:
-            call_data = message.get('call', {})
-            
-        # Try to find call_id
-        call_id = call_data.get('id')
-        if not call_id:
-            # Fallback: check other common locations
-            call_id = message.get('call_id') or message.get('callId') or payload.get('call_id')
-            
-        # Inject found ID back into call_data for handlers to use
-        if call_id and isinstance(call_data, dict):
-            call_data['id'] = call_id
-
-        print(f"[VAPI-WEBHOOK] Extracted Call ID: {call_id}")
-
-        message_type = message.get('type')
-        print(f"[VAPI-WEBHOOK] Message Type: {message_type}")
-        
-        # Ensure Call Exists in DB (Important for FK constraints)
-        if call_id and supabase:
-            # If we receive ANY event for a call ID, ensure it's tracked as 'in-progress' unless it's an end report
-            # This fixes issues where 'status-update' (started) might be missed or not sent
-            if message_type not in ['end-of-call-report']:
-                # Upsert call to ensure it exists
-                # We use a lightweight upsert to avoid overwriting critical fields if they exist
-                # But we ensure status is 'in-progress' logic if needed
-                
-                # Check if this qualifies as an active call signal
-                is_active_signal = message_type in ['transcript', 'speech-update', 'conversation-update', 'status-update']
-                
-                if is_active_signal:
-                    try:
-                         # Upsert with minimal data to ensure row exists
-                         # We'll set status to 'in-progress' if it's not already ended? 
-                         # Actually simpler: just upsert. If it was 'ended', we might re-open it? 
-                         # No, Vapi call IDs are unique. If we get a transcript, it IS in progress.
-                         
-                        data = {
-                            'call_id': call_id,
-                            'status': 'in-progress',
-                            'updated_at': datetime.now(timezone.utc).isoformat()
-                        }
-                        # If we have customer info, add it (optional refinement)
-                        if call_data.get('customer'):
-                            data['customer_phone'] = call_data.get('customer', {}).get('number')
-                        
-                        # Use upsert with ignoreDuplicates=False (default) to update timestamp
-                        # BUT we should be careful not to overwrite 'ended' if we process messages out of order?
-                        # For now, simplistic approach is best for "Live" visibility.
-                        
-                        supabase.table('vapi_calls').upsert(data).execute()
-                        # print(f"[VAPI-WEBHOOK] Ensured call {call_id} is tracked.")
-                    except Exception as e:
-                        print(f"[VAPI-WEBHOOK] Error tracking active call: {e}")
-
-        if message_type == 'transcript':
-            await handle_transcript(message, call_data)
-        elif message_type == 'end-of-call-report':
-            await handle_end_of_call(message, call_data, background_tasks)
-        elif message_type == 'status-update':
-            await handle_status_update(message, call_data)
-        elif message_type in ['conversation-update', 'speech-update']:
-            # Just tracking presence (handled above)
-            pass
-            
-        return JSONResponse(status_code=200, content={"success": True})
+        data = {
+            'call_id': event.call_id,
+            'status': 'in-progress',
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }
+        if event.customer_phone:
+            data['customer_phone'] = event.customer_phone
+        # Events for a call are applied in order on its lane, so this upsert
+        # cannot overwrite a later 'ended' status.
+        await asyncio.to_thread(lambda: supabase.table('vapi_calls').upsert(data).execute())
     except Exception as e:
-        print(f"[VAPI-WEBHOOK] Error: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        print(f"[VAPI-WEBHOOK] Error tracking active call: {e}")
+        raise
 
-async def handle_transcript(message: dict, call_data: dict):
-    """Save final transcripts to Supabase."""
-    transcript_type = message.get('transcriptType')
-    role = message.get('role')
-    transcript = message.get('transcript')
-    print(transcript)
-    if transcript_type != 'final' or not transcript:
+@vapi_router.on("transcript")
+async def handle_transcript(event: VapiEvent):
+    """Save final transcripts to Supabase, merging consecutive turns from the same role."""
+    if not event.is_final_transcript:
         return
 
     if not supabase:
         print("[VAPI-WEBHOOK] Error: Supabase client not initialized")
         return
 
+    role = event.role or 'user'
+    transcript = event.transcript
+
     try:
         # IST Timezone (UTC + 5:30)
         ist_time = datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)
         
         # 1. Check the LAST saved transcript for this call
         # Order by ID desc to get the very latest
-        last_res = supabase.table('transcripts').select("*").eq('call_id', call_data.get('id')).order('id', desc=True).limit(1).execute()
+        last_res = await asyncio.to_thread(
+            lambda: supabase.table('transcripts').select("*").eq('call_id', event.call_id).order('id', desc=True).limit(1).execute()
+        )
         
         last_entry = last_res.data[0] if last_res.data else None
         
@@ -1250,117 +1520,134 @@ async def handle_transcript(message: dict, call_data: dict):
             new_text = f"{prev_text.strip()} {transcript.strip()}"
             
             # Update the existing row
-            supabase.table('transcripts').update({
+            await asyncio.to_thread(lambda: supabase.table('transcripts').update({
                 'transcript': new_text,
                 'timestamp': ist_time.isoformat() # Update timestamp to latest utterance
-            }).eq('id', last_entry['id']).execute()
+            }).eq('id', last_entry['id']).execute())
             
             print(f"[VAPI-WEBHOOK] Merged transcript ({role}): ... {transcript[:30]}...")
             
         else:
             # 3. Else (New Speaker or First Entry) -> INSERT
             data = {
-                'call_id': call_data.get('id'),
+                'call_id': event.call_id,
                 'role': role,
                 'transcript': transcript,
                 'timestamp': ist_time.isoformat()
             }
             
-            supabase.table('transcripts').insert(data).execute()
+            await asyncio.to_thread(lambda: supabase.table('transcripts').insert(data).execute())
             print(f"[VAPI-WEBHOOK] Saved new turn ({role}): {transcript[:30]}...")
 
     except Exception as e:
         print(f"[VAPI-WEBHOOK] DB Error (Transcript): {e}")
+        raise
 
-async def handle_end_of_call(message: dict, call_data: dict, background_tasks: BackgroundTasks = None):
-    """Save call summary and trigger background processing if recording exists."""
+@vapi_router.on("status-update")
+async def handle_status_update(event: VapiEvent):
+    """Track call status."""
+    if not supabase or not event.call_id: return
+
+    status = event.status
+    # Only track essential statuses to avoid premature "Live" display
+    if status not in ['in-progress', 'ended']:
+        print(f"[VAPI-WEBHOOK] Ignoring status update: {event.call_id} -> {status}")
+        return
+
+    print(f"[VAPI-WEBHOOK] Call Status Update: {event.call_id} -> {status}")
+    now = datetime.now(timezone.utc).isoformat()
+    data = {
+        'call_id': event.call_id,
+        'status': status,
+        'updated_at': now
+    }
+    if status == 'in-progress':
+        data['started_at'] = now
+    elif status == 'ended':
+        data['ended_at'] = now
+        if event.cost is not None: data['cost'] = event.cost
+        if event.summary: data['summary'] = event.summary
+
+    try:
+        await asyncio.to_thread(lambda: supabase.table('vapi_calls').upsert(data).execute())
+    except Exception as e:
+        print(f"[VAPI-WEBHOOK] DB Error (Status): {e}")
+        raise
+
+@vapi_router.on("end-of-call-report")
+async def handle_end_of_call(event: VapiEvent):
+    """Notify the dashboard and save the call report."""
     
     # 1. Send immediate dashboard notification when call ends
     try:
-        call_id = call_data.get('id', 'Unknown')
-        duration = call_data.get('duration', 0)
-        ended_reason = message.get('endedReason', 'Unknown')
+        call_id = event.call_id or 'Unknown'
+        ended_reason = event.ended_reason or 'Unknown'
         
         # Broadcast to dashboard
         notification_payload = {
             "type": "call_ended",
             "call_id": call_id,
-            "duration": duration,
+            "duration": event.duration or 0,
             "ended_reason": ended_reason,
             "message": f"Call {call_id} ended ({ended_reason}). Processing recording...",
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
-        await notification_manager.broadcast(json.dumps(notification_payload))
+        await notification_manager.broadcast(notification_payload)
         print(f"[VAPI-WEBHOOK] Dashboard notification sent for call {call_id}")
     except Exception as e:
         print(f"[VAPI-WEBHOOK] Error sending dashboard notification: {e}")
-    
-    # 2. Trigger Audio Processing (Drive Upload + Analysis)
-    recording_url = message.get('recordingUrl') or message.get('recording_url')
-    # Fallback to stereo
-    if not recording_url:
-        recording_url = message.get('stereoRecordingUrl') or message.get('stereo_recording_url')
-        
-    if recording_url and background_tasks:
-        print(f"[VAPI-WEBHOOK] Found recording URL: {recording_url}")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"vapi_call_{timestamp}.wav"
-        safe_name = secure_filename(filename)
-        temp_path = os.path.join(UPLOAD_FOLDER, safe_name)
-        
-        print(f"[VAPI-WEBHOOK] Triggering background processing for {safe_name}")
-        background_tasks.add_task(process_vapi_call_background, recording_url, temp_path, safe_name, notification_manager)
-    else:
-        print("[VAPI-WEBHOOK] No recording URL found (or no background tasks), skipping file processing.")
 
-    # 3. Save Report to Database
+    # 2. Save Report to Database
     if not supabase: return
 
     try:
         data = {
-            'call_id': call_data.get('id'),
-            'ended_reason': message.get('endedReason'),
-            'summary': message.get('summary'),
-            'recording_url': recording_url,
-            'duration': call_data.get('duration'),
-            'cost': call_data.get('cost'),
-            # 'ended_at': datetime.now(timezone.utc).isoformat() 
+            'call_id': event.call_id,
+            'ended_reason': event.ended_reason,
+            'summary': event.summary,
+            'recording_url': event.recording_url,
+            'duration': event.duration,
+            'cost': event.cost,
         }
         
-        supabase.table('call_reports').insert(data).execute()
+        await asyncio.to_thread(lambda: supabase.table('call_reports').insert(data).execute())
         print(f"[VAPI-WEBHOOK] Saved End of Call Report for {data['call_id']}")
 
         # FALLBACK: Explicitly mark call as ended in vapi_calls table
-        supabase.table('vapi_calls').update({
+        await asyncio.to_thread(lambda: supabase.table('vapi_calls').update({
             'status': 'ended',
+            'ended_at': datetime.now(timezone.utc).isoformat(),
             'updated_at': datetime.now(timezone.utc).isoformat()
-        }).eq('call_id', call_data.get('id')).execute()
+        }).eq('call_id', event.call_id).execute())
         print(f"[VAPI-WEBHOOK] Force-updated status to 'ended' for {data['call_id']}")
     except Exception as e:
         print(f"[VAPI-WEBHOOK] DB Error (Report/Status Fallback): {e}")
+        raise
 
-async def handle_status_update(message: dict, call_data: dict):
-    """Track call status."""
-    if not supabase: return
+@vapi_router.on("end-of-call-report", RECORDING_READY)
+async def handle_recording(event: VapiEvent):
+    """Start background processing of the call recording (once per recording URL)."""
+    recording_url = event.recording_url
+    if not recording_url:
+        print(f"[VAPI-WEBHOOK] No recording URL found (Type: {event.type}), skipping file processing.")
+        return
 
-    try:
-        status = message.get('status')
-        call_id = call_data.get('id')
-        
-        # Only track essential statuses to avoid premature "Live" display
-        if status not in ['in-progress', 'ended']:
-            print(f"[VAPI-WEBHOOK] Ignoring status update: {call_id} -> {status}")
-            return
-            
-        print(f"[VAPI-WEBHOOK] Call Status Update: {call_id} -> {status}")
-        
-        supabase.table('vapi_calls').upsert({
-            'call_id': call_id,
-            'status': status,
-            'updated_at': datetime.now(timezone.utc).isoformat()
-        }).execute()
-    except Exception as e:
-        print(f"[VAPI-WEBHOOK] DB Error (Status): {e}")
+    if recording_url in _started_recordings:
+        print(f"[VAPI-WEBHOOK] Recording already being processed: {recording_url}")
+        return
+    _started_recordings[recording_url] = time.time()
+    while len(_started_recordings) > 1000:
+        _started_recordings.popitem(last=False)
+
+    print(f"[VAPI-WEBHOOK] Found recording URL: {recording_url}")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"vapi_call_{timestamp}.wav"
+    safe_name = secure_filename(filename)
+    temp_path = os.path.join(UPLOAD_FOLDER, safe_name)
+    
+    print(f"[VAPI-WEBHOOK] Triggering background processing for {safe_name}")
+    # Not awaited: the lane moves on while the recording is processed
+    spawn_background_job(process_vapi_call_background(recording_url, temp_path, safe_name, notification_manager))
 
 
 @app.get("/api/transcripts/{call_id}")
@@ -1383,12 +1670,17 @@ async def get_transcripts(call_id: str):
 seen_ids = set()
 
 def check_for_updates():
+    """
+    Pull pending Drive changes and schedule processing for new audio files.
+    Returns False if another scan already holds drive_update_lock, so callers
+    (see DriveChangeCoalescer) can retry instead of losing the notification.
+    """
     global drive_page_token
     
     # Non-blocking lock to prevent multiple concurrent checks
     if not drive_update_lock.acquire(blocking=False):
         # Silently skip if already running to prevent log spam
-        return
+        return False
 
     try:
         print(f"[CHANGES] check_for_updates called. Current Token: {str(drive_page_token)[:30]}...")
@@ -1478,6 +1770,7 @@ def check_for_updates():
         print(f"[CHANGES] Major Error in processing loop: {e}")
     finally:
         drive_update_lock.release()
+    return True
 
 # --- Dependencies ---
 
@@ -1551,7 +1844,8 @@ async def api_session(request: Request):
     return JSONResponse(status_code=401, content={"authenticated": False})
 
 @app.get("/api/settings")
-async def get_settings(user_id: str = Depends(get_current_user)):
+@response_cache.cached(lambda kw: [f"settings:{kw['user_id']}"], vary=("user_id",))
+async def get_settings(request: Request, user_id: str = Depends(get_current_user)):
     if not user_id: return JSONResponse(status_code=401, content={"error": "Unauthorized"})
     if not supabase: return {}
     
@@ -1581,6 +1875,7 @@ async def save_settings(settings: UserSettings, user_id: str = Depends(login_req
         
         # Upsert settings
         supabase.table('user_settings').upsert(data).execute()
+        response_cache.invalidate(f"settings:{user_id}")
         return {"success": True, "message": "Settings saved"}
         
     except Exception as e:
@@ -1594,27 +1889,344 @@ def run_query(query_builder):
     return query_builder.execute()
 
 
+# Call detail is split into a light header and independently cached parts,
+# so opening a call never pulls transcript, diarization and audio in one blob
+CALL_HEADER_COLUMNS = "id, filename, sentiment, tags, duration, created_at, speaker_count, email_sent, updated_at"
+CALL_HEADER_INCLUDES = ("summary", "transcript")
+DIARIZATION_PAGE_MAX = 500
+# Recently read diarization arrays, so paging through one call reads it once
+_diarization_cache = OrderedDict()
+_DIARIZATION_CACHE_SIZE = 32
+_diarization_cache_lock = threading.Lock()
+
+@on_call_change
+def forget_cached_diarization(kind, new_row=None, old_row=None):
+    call_id = (new_row or old_row or {}).get("id")
+    with _diarization_cache_lock:
+        _diarization_cache.pop(call_id, None)
+
+def call_parts(call_id):
+    return {
+        "summary": f"/api/calls/{call_id}/summary",
+        "transcript": f"/api/calls/{call_id}/transcript",
+        "diarization": f"/api/calls/{call_id}/diarization?offset=0&limit=100",
+        "audio": f"/api/calls/{call_id}/audio-ref",
+    }
+
+def fetch_call_columns(call_id, columns):
+    """One call's row restricted to `columns`, or None if it does not exist."""
+    response = supabase.table('calls').select(columns).eq('id', call_id).execute()
+    return response.data[0] if response.data else None
+
+def fetch_diarization(call_id):
+    with _diarization_cache_lock:
+        if call_id in _diarization_cache:
+            _diarization_cache.move_to_end(call_id)
+            return _diarization_cache[call_id]
+    row = fetch_call_columns(call_id, "id, diarization_data")
+    if row is None:
+        return None
+    utterances = row.get("diarization_data") or []
+    with _diarization_cache_lock:
+        _diarization_cache[call_id] = utterances
+        while len(_diarization_cache) > _DIARIZATION_CACHE_SIZE:
+            _diarization_cache.popitem(last=False)
+    return utterances
+
+async def call_part(call_id, columns):
+    """Shared body of the single-column part endpoints."""
+    if not supabase: return JSONResponse(status_code=500, content={"error": "Database not available"})
+    try:
+        row = await asyncio.to_thread(fetch_call_columns, call_id, columns)
+    except Exception as e:
+        print(f"[API] Error fetching call {call_id} ({columns}): {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    if row is None:
+        return JSONResponse(status_code=404, content={"error": "Call not found"})
+    return row
+
 @app.get("/api/calls/{call_id}")
-async def get_call_details(call_id: int, user_id: str = Depends(login_required)):
+@response_cache.cached(lambda kw: [f"call:{kw['call_id']}"])
+async def get_call_details(request: Request, call_id: int, user_id: str = Depends(login_required),
+                           include: Optional[str] = None):
+    """
+    Light call header (list-view columns) plus `parts`: URLs of the
+    separately fetched summary, transcript, diarization pages and audio
+    reference. `include=summary[,transcript]` embeds those parts so a
+    modal can render from one round trip.
+    """
+    embedded = split_param(include)
+    unknown = [part for part in embedded if part not in CALL_HEADER_INCLUDES]
+    if unknown:
+        return JSONResponse(status_code=400, content={"error": f"Unknown part(s): {', '.join(unknown)}"})
+    columns = ", ".join([CALL_HEADER_COLUMNS] + embedded)
+    row = await call_part(call_id, columns)
+    if isinstance(row, Response):
+        return row
+    return {**row, "parts": call_parts(call_id)}
+
+@app.get("/api/calls/{call_id}/summary")
+@response_cache.cached(lambda kw: [f"call:{kw['call_id']}"])
+async def get_call_summary(request: Request, call_id: int, user_id: str = Depends(login_required)):
+    return await call_part(call_id, "id, summary")
+
+@app.get("/api/calls/{call_id}/transcript")
+@response_cache.cached(lambda kw: [f"call:{kw['call_id']}"])
+async def get_call_transcript(request: Request, call_id: int, user_id: str = Depends(login_required)):
+    return await call_part(call_id, "id, transcript")
+
+@app.get("/api/calls/{call_id}/diarization")
+@response_cache.cached(lambda kw: [f"call:{kw['call_id']}"])
+async def get_call_diarization(request: Request, call_id: int, user_id: str = Depends(login_required),
+                               offset: int = 0, limit: int = 100):
+    """A page of diarized utterances, in order; `total` is the call's utterance count."""
     if not supabase: return JSONResponse(status_code=500, content={"error": "Database not available"})
-    
+    offset = max(0, offset)
+    limit = max(1, min(limit, DIARIZATION_PAGE_MAX))
     try:
-        response = supabase.table('calls').select("*").eq('id', call_id).execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]
+        utterances = await asyncio.to_thread(fetch_diarization, call_id)
+    except Exception as e:
+        print(f"[API] Error fetching diarization for call {call_id}: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    if utterances is None:
+        return JSONResponse(status_code=404, content={"error": "Call not found"})
+    page = utterances[offset:offset + limit]
+    has_more = offset + limit < len(utterances)
+    return {
+        "id": call_id,
+        "offset": offset,
+        "total": len(utterances),
+        "utterances": page,
+        "has_more": has_more,
+        "next": f"/api/calls/{call_id}/diarization?offset={offset + limit}&limit={limit}" if has_more else None,
+    }
+
+@app.get("/api/calls/{call_id}/audio-ref")
+@response_cache.cached(lambda kw: [f"call:{kw['call_id']}"])
+async def get_call_audio_ref(request: Request, call_id: int, user_id: str = Depends(login_required)):
+    """
+    Where to play the call from: /audio (Range-capable, whether the row stores
+    audio inline as a base64 data URL or in storage) and its waveform peaks.
+    """
+    row = await call_part(call_id, "id, audio_url")
+    if isinstance(row, Response):
+        return row
+    audio_url = row.get("audio_url") or ""
+    return {
+        "id": call_id,
+        "url": f"/api/calls/{call_id}/audio" if audio_url else None,
+        "waveform": f"/api/calls/{call_id}/waveform" if audio_url else None,
+        "inline": audio_url.startswith("data:"),
+    }
+
+# Decoded inline audio and waveform peaks of recently opened calls: a player
+# seeking through a call sends many Range requests for the same bytes
+_inline_audio_cache = OrderedDict()
+_INLINE_AUDIO_CACHE_SIZE = 8
+_waveform_cache = OrderedDict()
+_WAVEFORM_CACHE_SIZE = 64
+_media_cache_lock = threading.Lock()
+# Upstream response headers passed through when proxying stored audio
+PROXIED_AUDIO_HEADERS = ("content-type", "content-length", "content-range", "content-encoding",
+                         "accept-ranges", "etag", "last-modified")
+_media_client = None
+
+@on_call_change
+def forget_cached_media(kind, new_row=None, old_row=None):
+    call_id = (new_row or old_row or {}).get("id")
+    with _media_cache_lock:
+        _inline_audio_cache.pop(call_id, None)
+        _waveform_cache.pop(call_id, None)
+
+# (cache name, "hit" | "miss") -> lookups, exported by /metrics
+media_cache_requests = Counter()
+
+def media_cache_get(cache, call_id):
+    name = "waveform" if cache is _waveform_cache else "inline_audio"
+    with _media_cache_lock:
+        if call_id in cache:
+            cache.move_to_end(call_id)
+            media_cache_requests[(name, "hit")] += 1
+            return cache[call_id]
+        media_cache_requests[(name, "miss")] += 1
+    return None
+
+def media_cache_put(cache, call_id, value, size):
+    with _media_cache_lock:
+        cache[call_id] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+def get_media_client():
+    """Shared client for proxying stored audio (connection reuse across Range requests)."""
+    global _media_client
+    if _media_client is None:
+        _media_client = httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(30.0, read=60.0))
+    return _media_client
+
+def inline_audio(call_id, audio_url):
+    """(bytes, media type) of a base64 data URL audio_url. Raises ValueError if it is not valid base64."""
+    cached = media_cache_get(_inline_audio_cache, call_id)
+    if cached is None:
+        header, _, payload = audio_url.partition(",")
+        media_type = header[len("data:"):].split(";")[0] or "application/octet-stream"
+        cached = (base64.b64decode(payload), media_type)
+        media_cache_put(_inline_audio_cache, call_id, cached, _INLINE_AUDIO_CACHE_SIZE)
+    return cached
+
+@app.get("/api/calls/{call_id}/audio")
+async def get_call_audio(request: Request, call_id: int, user_id: str = Depends(login_required)):
+    """
+    The call's audio with HTTP Range support, so seeking fetches only the
+    bytes played. Inline (data URL) audio is decoded once and served from
+    memory; stored audio is proxied with the Range passed through.
+    """
+    row = await call_part(call_id, "id, audio_url")
+    if isinstance(row, Response):
+        return row
+    audio_url = row.get("audio_url") or ""
+    if not audio_url:
+        return JSONResponse(status_code=404, content={"error": "No audio for this call"})
+    range_header = request.headers.get("range")
+    if not is_byte_range(range_header):
+        range_header = None  # malformed or multi-range: ignored, the whole body is sent
+    if audio_url.startswith("data:"):
+        try:
+            audio, media_type = await asyncio.to_thread(inline_audio, call_id, audio_url)
+        except ValueError:
+            return JSONResponse(status_code=500, content={"error": "Stored audio is not valid base64"})
+        return byte_range_response(audio, media_type, range_header, {"Cache-Control": "private, max-age=3600"})
+
+    client = get_media_client()
+    upstream_request = client.build_request("GET", audio_url, headers={"Range": range_header} if range_header else {})
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.HTTPError as e:
+        print(f"[AUDIO] Fetching stored audio for call {call_id} failed: {e}")
+        return JSONResponse(status_code=502, content={"error": "Audio storage unavailable"})
+    if upstream.status_code >= 400:
+        await upstream.aclose()
+        if upstream.status_code == 416:
+            return Response(status_code=416, headers={"Content-Range": upstream.headers.get("content-range", "")})
+        return JSONResponse(status_code=502, content={"error": f"Audio storage returned {upstream.status_code}"})
+    headers = {}
+    for name in PROXIED_AUDIO_HEADERS:
+        if name in upstream.headers:
+            headers[name] = upstream.headers[name]
+    headers.setdefault("accept-ranges", "bytes")
+    headers["cache-control"] = "private, max-age=3600"
+    media_type = headers.pop("content-type", None) or mime_type_for(audio_url.split("?")[0])
+    return StreamingResponse(upstream.aiter_raw(), status_code=upstream.status_code, headers=headers,
+                             media_type=media_type, background=BackgroundTask(upstream.aclose))
+
+def compute_waveform(row):
+    """Waveform peaks decoded from the call's audio, for calls stored before peaks were."""
+    audio_url = row.get("audio_url") or ""
+    if not audio_url or not audio_preprocessor.enabled:
+        return None
+    path = os.path.join(UPLOAD_FOLDER, f"waveform_{uuid.uuid4().hex}")
+    try:
+        if audio_url.startswith("data:"):
+            audio, _ = inline_audio(row["id"], audio_url)
         else:
-            raise HTTPException(status_code=404, detail="Call not found")
+            import requests
+            response = requests.get(audio_url, timeout=120)
+            response.raise_for_status()
+            audio = response.content
+        with open(path, "wb") as f:
+            f.write(audio)
+        return waveform_for_file(path)
     except Exception as e:
-        print(f"[API] Error fetching call details: {e}")
+        print(f"[WAVEFORM] Could not compute waveform for call {row['id']}: {e}")
+        return None
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def load_waveform(row):
+    """Cached, stored, or (once, then stored) computed waveform peaks of a call."""
+    call_id = row["id"]
+    waveform = media_cache_get(_waveform_cache, call_id)
+    if waveform is not None:
+        return waveform
+    filename = row.get("filename") or f"call_{call_id}"
+    waveform = download_waveform_from_supabase(filename)
+    if waveform is None:
+        waveform = compute_waveform(row)
+        if waveform is not None:
+            upload_waveform_to_supabase(filename, waveform)
+    if waveform is not None:
+        media_cache_put(_waveform_cache, call_id, waveform, _WAVEFORM_CACHE_SIZE)
+    return waveform
+
+@app.get("/api/calls/{call_id}/waveform")
+async def get_call_waveform(request: Request, call_id: int, user_id: str = Depends(login_required)):
+    """
+    Waveform peaks for the call modal: a 16-byte header then one int8 peak
+    per N ms (see audio_processing.encode_peaks). Written at ingestion;
+    older calls get theirs computed from the audio on first request.
+    """
+    row = await call_part(call_id, "id, filename, audio_url")
+    if isinstance(row, Response):
+        return row
+    waveform = await asyncio.to_thread(load_waveform, row)
+    if waveform is None:
+        return JSONResponse(status_code=404, content={"error": "Waveform not available"})
+    etag = f'"{hashlib.blake2b(waveform, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=waveform, media_type=WAVEFORM_MIME_TYPE, headers=headers)
+
+# List-view columns returned with similar calls and topic examples
+PREVIEW_FIELDS = ("id", "filename", "sentiment", "tags", "summary_excerpt", "duration", "created_at")
+
+@app.get("/api/calls/{call_id}/similar")
+async def similar_calls(call_id: int, user_id: str = Depends(get_current_user), limit: int = 10):
+    """Calls whose summaries are closest in meaning to this one's, most similar first."""
+    if not supabase: return JSONResponse(status_code=500, content={"error": "Database not available"})
+    if not vector_index.available:
+        return JSONResponse(status_code=503, content={"error": "Vector index not available"})
+    limit = max(1, min(limit, 50))
+    t_start = time.time()
+    matches = await asyncio.to_thread(vector_index.similar, call_id, limit)
+    if matches is None:
+        return JSONResponse(status_code=404, content={"error": "Call has no embedding (not found or not summarised yet)"})
+    t_vectors = time.time()
+    try:
+        ids = [match_id for match_id, _ in matches]
+        res = await asyncio.to_thread(run_query, supabase.table('calls').select(
+            "id, filename, sentiment, tags, summary, duration, created_at").in_('id', ids))
+    except Exception as e:
+        print(f"[API] Error fetching similar calls: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
+    by_id = {row["id"]: project_call(row, PREVIEW_FIELDS) for row in res.data or []}
+    calls = []
+    for match_id, similarity in matches:
+        if match_id in by_id:  # skips calls deleted since they were embedded
+            calls.append({**by_id[match_id], "similarity": similarity})
+    return {
+        "call_id": call_id,
+        "calls": calls,
+        "index_ready": vector_index.ready,
+        "debug_timing": {
+            "vector_sec": round(t_vectors - t_start, 4),
+            "total_sec": round(time.time() - t_start, 4),
+        },
+    }
 
 @app.get("/api/call-stats")
-async def get_call_stats_endpoint(user_id: str = Depends(get_current_user)):
+@response_cache.cached(lambda kw: ["calls"])
+async def get_call_stats_endpoint(request: Request, user_id: str = Depends(get_current_user)):
     if not supabase: return {"stats": {}}
     
+    if call_stats.ready or call_stats.seeded:
+        # Maintained incrementally over the full history (see analytics_loop)
+        return {"stats": call_stats.snapshot()}
+
     try:
         t_start = time.time()
-        print("[API STATS] Fetching statistics...")
+        print("[API STATS] Stats not hydrated yet, fetching from database...")
 
         # CRITICAL FIX: Always try database function first
         use_db_function = False
@@ -1705,33 +2317,229 @@ async def get_call_stats_endpoint(user_id: str = Depends(get_current_user)):
             "tag_counts": {"Support": 0, "Billing": 0, "Technical": 0}
         }}
 
+# Default look-back per granularity when no start is given
+ANALYTICS_DEFAULT_RANGE = {"hour": timedelta(hours=48), "day": timedelta(days=30), "week": timedelta(weeks=26)}
+ANALYTICS_MAX_BUCKETS = 1000
+
+@app.get("/api/analytics/timeseries")
+async def analytics_timeseries(
+    user_id: str = Depends(get_current_user),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: str = "day",
+    group_by: str = "all",
+):
+    """
+    Calls per time bucket (UTC) with sentiment mix and average duration,
+    optionally grouped by sentiment, tag or speaker_count. Served from the
+    pre-aggregated rollups.
+    """
+    if granularity not in GRANULARITIES:
+        return JSONResponse(status_code=400, content={"error": f"granularity must be one of {list(GRANULARITIES)}"})
+    if group_by not in GROUP_BY:
+        return JSONResponse(status_code=400, content={"error": f"group_by must be one of {list(GROUP_BY)}"})
+    try:
+        end_dt = parse_timestamp(end) if end else datetime.now(timezone.utc)
+        start_dt = parse_timestamp(start) if start else end_dt - ANALYTICS_DEFAULT_RANGE[granularity]
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "start/end must be ISO 8601 timestamps"})
+    if start_dt > end_dt:
+        return JSONResponse(status_code=400, content={"error": "start must be before end"})
+    if (end_dt - start_dt) / GRANULARITIES[granularity] > ANALYTICS_MAX_BUCKETS:
+        return JSONResponse(status_code=400, content={"error": f"Range too large (max {ANALYTICS_MAX_BUCKETS} buckets)"})
+    if not (call_rollups.ready or call_rollups.seeded):
+        return JSONResponse(status_code=503, content={"error": "Analytics are still loading"})
+
+    return {
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+        "series": call_rollups.timeseries(start_dt, end_dt, granularity, group_by),
+    }
+
+@app.get("/api/analytics/topics")
+async def analytics_topics(
+    user_id: str = Depends(get_current_user),
+    sentiment: Optional[str] = "negative",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    k: int = 8,
+    sample: int = 2000,
+    examples: int = 3,
+):
+    """
+    Group the most recent `sample` calls matching the filters (by default the
+    negative ones, i.e. complaints) into up to k topics by summary
+    similarity. Topics are largest first; each lists its call ids
+    (most representative first) and a few example calls.
+    """
+    if not supabase: return JSONResponse(status_code=500, content={"error": "Database not available"})
+    if not vector_index.available:
+        return JSONResponse(status_code=503, content={"error": "Vector index not available"})
+    k = max(2, min(k, 20))
+    sample = max(k, min(sample, 10000))
+    examples = max(0, min(examples, 10))
+    filters = {
+        "sentiments": split_param(sentiment), "tags": [], "date_from": date_from, "date_to": date_to,
+        "min_duration": None, "max_duration": None, "speakers": None,
+    }
+    t_start = time.time()
+    try:
+        if search_index.ready:
+            result = await asyncio.to_thread(search_index.search, limit=sample, **filters)
+            rows = result["calls"]
+        else:
+            rows, _, _ = await asyncio.to_thread(postgrest_search_calls, None, filters, sample, 0, None)
+    except Exception as e:
+        print(f"[API] Error selecting calls for topics: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    by_id = {row["id"]: row for row in rows}
+    groups = await asyncio.to_thread(vector_index.cluster, list(by_id), k)
+    topics = [
+        {**group, "examples": [project_call(dict(by_id[i]), PREVIEW_FIELDS) for i in group["call_ids"][:examples]]}
+        for group in groups
+    ]
+    return {
+        "calls": len(rows),
+        "embedded": sum(group["size"] for group in groups),
+        "topics": topics,
+        "debug_timing": {"total_sec": round(time.time() - t_start, 4)},
+    }
+
+# Columns the list endpoint may return (heavy transcript/diarization stay on /api/calls/{id})
+LIST_FIELDS = ("id", "filename", "sentiment", "tags", "summary", "summary_excerpt",
+               "duration", "created_at", "speaker_count", "email_sent")
+DEFAULT_LIST_FIELDS = ("id", "filename", "sentiment", "tags", "summary",
+                       "duration", "created_at", "speaker_count", "email_sent")
+# How long an estimated row count is reused before asking PostgREST again
+CALLS_COUNT_CACHE_SECONDS = 60
+_calls_count_cache = {"value": None, "at": 0.0}
+
+def encode_calls_cursor(position):
+    """position: {"id": last_id} for newest-first pages, {"o": offset} for ranked search pages."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_calls_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    position = json.loads(base64.urlsafe_b64decode(padded))
+    if "id" in position:
+        return {"id": int(position["id"])}
+    return {"o": int(position["o"])}
+
+def split_param(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+async def calls_total():
+    """
+    Total number of calls without a per-page count(*): the maintained stats
+    counter when hydrated, otherwise a cached estimated count.
+    """
+    if call_stats.ready:
+        return call_stats.total, False
+    now = time.time()
+    if _calls_count_cache["value"] is None or now - _calls_count_cache["at"] > CALLS_COUNT_CACHE_SECONDS:
+        res = await asyncio.to_thread(run_query, supabase.table('calls').select("id", count="estimated").limit(1))
+        _calls_count_cache.update(value=res.count if isinstance(res.count, int) else 0, at=now)
+    return _calls_count_cache["value"], True
+
 @app.get("/api/calls")
-async def get_calls(user_id: str = Depends(get_current_user), offset: int = 0, limit: int = 20):
+@response_cache.cached(lambda kw: ["calls"])
+async def get_calls(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    offset: Optional[int] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    q: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    tags: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_duration: Optional[int] = None,
+    max_duration: Optional[int] = None,
+    speakers: Optional[int] = None,
+):
+    """
+    Page through calls, newest first.
+
+    Pass the previous response's `next_cursor` as `cursor` for keyset
+    pagination (constant cost at any depth); `offset` is still accepted for
+    older clients. `fields` is a comma-separated subset of LIST_FIELDS;
+    `summary_excerpt` is a short plain-text preview of the summary.
+
+    Filters: sentiment and tags (comma-separated, any match), date_from /
+    date_to (ISO 8601), min_duration / max_duration (seconds) and speakers.
+    `q` searches filename, summary and transcript; results are then ranked
+    by relevance and carry a highlighted `snippet`.
+    """
     if not supabase: return {"calls": [], "total": 0, "stats": {}}
-    
-    try:
-        t_start = time.time()
-        # Main query (Optimized: Exclude heavy transcript/diarization fields)
-        # Use ID for sorting as it's an indexed primary key (faster than created_at)
-        main_query = supabase.table('calls')\
-            .select("id, filename, sentiment, tags, summary, duration, created_at, speaker_count, email_sent", count="exact")\
-            .order('id', desc=True)\
-            .range(offset, offset + limit - 1)
+    limit = max(1, min(limit, 100))
 
-        # Execute main query
-        response = await asyncio.to_thread(run_query, main_query)
-        
-        print(f"[API] get_calls count: {response.count} (type: {type(response.count)})")
-        data_len = len(response.data) if response.data else 0
-        print(f"[API] get_calls returned {data_len} rows.")
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in LIST_FIELDS]
+        if unknown:
+            return JSONResponse(status_code=400, content={"error": f"Unknown field(s): {', '.join(unknown)}"})
+    else:
+        requested = list(DEFAULT_LIST_FIELDS)
+    columns = {f for f in requested if f != "summary_excerpt"} | {"id"}
+    if "summary_excerpt" in requested:
+        columns.add("summary")
 
-        total_count = response.count if isinstance(response.count, int) else 0
+    try:
+        position = decode_calls_cursor(cursor) if cursor else None
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+
+    filters = {
+        "sentiments": split_param(sentiment),
+        "tags": split_param(tags),
+        "date_from": date_from,
+        "date_to": date_to,
+        "min_duration": min_duration,
+        "max_duration": max_duration,
+        "speakers": speakers,
+    }
+    if q or any(v not in (None, []) for v in filters.values()):
+        return await search_calls(q, filters, requested, limit, position)
 
+    try:
+        t_start = time.time()
+        # Keyset on the primary key: the same index seek however deep the page
+        query = supabase.table('calls').select(", ".join(sorted(columns))).order('id', desc=True)
+        if position and "id" in position:
+            query = query.lt('id', position["id"]).limit(limit + 1)
+        elif offset:
+            query = query.range(offset, offset + limit)
+        else:
+            query = query.limit(limit + 1)
+
+        response = await asyncio.to_thread(run_query, query)
+        rows = response.data or []
+        # One extra row tells us whether another page exists
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        for row in rows:
+            if "summary_excerpt" in requested:
+                row["summary_excerpt"] = summary_excerpt(row.get("summary"))
+            for column in list(row):
+                if column not in requested:
+                    del row[column]
+
+        total, total_is_estimate = await calls_total()
         t_end = time.time()
-        
+        print(f"[API] get_calls returned {len(rows)} rows in {t_end - t_start:.4f}s")
+
         return {
-            "calls": response.data,
-            "total": total_count,
+            "calls": rows,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "has_more": has_more,
+            "next_cursor": encode_calls_cursor({"id": rows[-1]["id"]}) if has_more and rows else None,
             "stats": {}, # Stats are now fetched via /api/call-stats
             "debug_timing": {
                 "total_sec": round(t_end - t_start, 4)
@@ -1742,8 +2550,112 @@ async def get_calls(user_id: str = Depends(get_current_user), offset: int = 0, l
         print(f"[API] Error fetching calls: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-             
+def project_call(row, requested):
+    if "summary_excerpt" in requested and "summary_excerpt" not in row:
+        row["summary_excerpt"] = summary_excerpt(row.get("summary"))
+    return {k: v for k, v in row.items() if k in requested or k in ("snippet", "score")}
+
+async def search_calls(q, filters, requested, limit, position):
+    """Filtered/searched page of calls: local FTS index when ready, PostgREST filters otherwise."""
+    t_start = time.time()
+    offset = position.get("o", 0) if position else 0
+    before_id = position.get("id") if position else None
+    try:
+        if search_index.ready:
+            result = await asyncio.to_thread(
+                search_index.search, q, limit=limit, offset=offset, before_id=before_id, **filters
+            )
+            rows, total, has_more, backend = result["calls"], result["total"], result["has_more"], "index"
+            total_is_estimate = result["total_is_estimate"]
+        else:
+            rows, total, has_more = await asyncio.to_thread(postgrest_search_calls, q, filters, limit, offset, before_id)
+            backend, total_is_estimate = "postgrest", False
+    except Exception as e:
+        print(f"[API] Error searching calls: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
 
+    if has_more and rows:
+        next_position = {"o": offset + limit} if q else {"id": rows[-1]["id"]}
+    t_end = time.time()
+    print(f"[API] search ({backend}) returned {len(rows)} of {total} rows in {t_end - t_start:.4f}s")
+    return {
+        "calls": [project_call(row, requested) for row in rows],
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "has_more": has_more,
+        "next_cursor": encode_calls_cursor(next_position) if has_more and rows else None,
+        "stats": {},
+        "debug_timing": {"total_sec": round(t_end - t_start, 4), "backend": backend},
+    }
+
+def postgrest_search_calls(q, filters, limit, offset, before_id):
+    """Fallback while the local index is unavailable: ILIKE plus column filters (unranked)."""
+    query = supabase.table('calls').select(
+        "id, filename, sentiment, tags, summary, duration, created_at, speaker_count, email_sent",
+        count="exact" if not (offset or before_id) else None,
+    )
+    if filters["sentiments"]:
+        values = [s.lower() for s in filters["sentiments"]]
+        query = query.in_('sentiment', values + [v.capitalize() for v in values])
+    if filters["tags"]:
+        query = query.overlaps('tags', filters["tags"])
+    if filters["date_from"]:
+        query = query.gte('created_at', filters["date_from"])
+    if filters["date_to"]:
+        query = query.lte('created_at', filters["date_to"])
+    if filters["min_duration"] is not None:
+        query = query.gte('duration', filters["min_duration"])
+    if filters["max_duration"] is not None:
+        query = query.lte('duration', filters["max_duration"])
+    if filters["speakers"] is not None:
+        query = query.eq('speaker_count', filters["speakers"])
+    if q:
+        pattern = "%" + "".join(ch for ch in q if ch.isalnum() or ch in " -_'") + "%"
+        query = query.or_(f"filename.ilike.{pattern},summary.ilike.{pattern},transcript.ilike.{pattern}")
+    query = query.order('id', desc=True)
+    if before_id is not None:
+        query = query.lt('id', before_id)
+    res = query.range(offset, offset + limit).execute()
+    rows = res.data or []
+    return rows[:limit], res.count, len(rows) > limit
+
+
+@app.get("/api/search/utterances")
+async def search_utterances(
+    q: str,
+    user_id: str = Depends(get_current_user),
+    speaker: Optional[str] = None,
+    call_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    order: str = "recent",
+):
+    """
+    Find the moments where something was said: one hit per matching diarized
+    utterance with its call, index, start/end (ms) and speaker.
+    `q` supports "quoted phrases" and word* prefixes; `speaker` narrows to
+    speakers whose label contains it (e.g. speaker=customer).
+    `order` is "recent" (newest calls first, fast for common words) or "relevance".
+    """
+    if not search_index.available:
+        return JSONResponse(status_code=503, content={"error": "Search index not available"})
+    limit = max(1, min(limit, 200))
+    try:
+        offset = decode_calls_cursor(cursor).get("o", 0) if cursor else 0
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+
+    t_start = time.time()
+    if order not in ("recent", "relevance"):
+        return JSONResponse(status_code=400, content={"error": "order must be 'recent' or 'relevance'"})
+    result = await asyncio.to_thread(search_index.search_utterances, q, speaker, call_id, limit, offset, order)
+    return {
+        "hits": result["hits"],
+        "has_more": result["has_more"],
+        "next_cursor": encode_calls_cursor({"o": offset + limit}) if result["has_more"] else None,
+        "index_ready": search_index.ready,
+        "debug_timing": {"total_sec": round(time.time() - t_start, 4)},
+    }
 
 @app.put("/api/calls/{call_id}/diarization")
 async def update_diarization(call_id: int, request: DiarizationUpdateRequest):
@@ -1752,6 +2664,7 @@ async def update_diarization(call_id: int, request: DiarizationUpdateRequest):
         response = supabase.table('calls').update({
             'diarization_data': request.diarization_data
         }).eq('id', call_id).execute()
+        await run_in_threadpool(emit_call_change, "update", response.data[0] if response.data else {"id": call_id, "diarization_data": request.diarization_data})
         return {"success": True, "message": "Diarization data updated"}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -1777,6 +2690,7 @@ async def upload_audio(
         await out_file.write(content)
 
     async def generate_progress():
+        prepared = None
         try:
             # Upload to Supabase Storage
             yield f"data: {json.dumps({'step': 'upload', 'status': 'active', 'message': 'Uploading to Supabase Storage...'})}\n\n"
@@ -1790,13 +2704,14 @@ async def upload_audio(
                 yield f"data: {json.dumps({'step': 'upload', 'status': 'error', 'message': 'File already exists in Supabase Storage. Manual upload cancelled.'})}\n\n"
                 return # Stop further processing
             else:
-                # Upload to Supabase Storage
-                print(f"[UPLOAD] Uploading {safe_name} to Supabase Storage")
-                audio_url = await run_in_threadpool(upload_audio_to_supabase, temp_path, safe_name)
+                # Transcode to compact speech audio, then upload to Supabase Storage
+                prepared = await run_in_threadpool(audio_preprocessor.prepare, temp_path)
+                print(f"[UPLOAD] Uploading {safe_name} to Supabase Storage ({prepared.describe()})")
+                audio_url = await run_in_threadpool(store_prepared_audio, prepared, safe_name)
                 
                 if audio_url:
                     print(f"[UPLOAD] Upload successful. URL: {audio_url}")
-                    yield f"data: {json.dumps({'step': 'upload', 'status': 'complete', 'message': 'Uploaded to Supabase Storage!'})}\n\n"
+                    yield f"data: {json.dumps({'step': 'upload', 'status': 'complete', 'message': f'Uploaded to Supabase Storage! {prepared.describe()}'})}\n\n"
                 else:
                     error_msg = f"Supabase Storage upload failed for {safe_name}. Check server logs for details."
                     print(f"[UPLOAD] {error_msg}")
@@ -1805,8 +2720,11 @@ async def upload_audio(
 
             # Transcribe
             yield f"data: {json.dumps({'step': 'transcribe', 'status': 'active', 'message': 'Transcribing audio...'})}\n\n"
-            transcript, duration_seconds, diarization_data, speaker_count, detected_lang = await run_in_threadpool(transcribe_audio, temp_path, language, speakers)
-            yield f"data: {json.dumps({'step': 'transcribe', 'status': 'complete', 'message': 'Transcription complete!'})}\n\n"
+            transcript, duration_seconds, diarization_data, speaker_count, detected_lang = await run_in_threadpool(transcribe_prepared, prepared, language, speakers)
+            message = 'Transcription complete!'
+            if prepared.seconds_trimmed:
+                message += f' Skipped {prepared.seconds_trimmed:.0f}s of silence.'
+            yield f"data: {json.dumps({'step': 'transcribe', 'status': 'complete', 'message': message})}\n\n"
             
             # Analyze
             yield f"data: {json.dumps({'step': 'analyze', 'status': 'active', 'message': 'Analyzing sentiment...'})}\n\n"
@@ -1817,15 +2735,13 @@ async def upload_audio(
             yield f"data: {json.dumps({'step': 'save', 'status': 'active', 'message': 'Saving to database...'})}\n\n"
             # audio_url is already set from Supabase Storage upload
             
-            email_sent = send_email_notification(safe_name, sentiment, tags, summary)
-            
             data = {
                 "filename": safe_name,
                 "transcript": transcript,
                 "sentiment": sentiment,
                 "tags": tags,
                 "summary": summary,
-                "email_sent": email_sent,
+                "email_sent": False,
                 "audio_url": audio_url,
                 "duration": int(duration_seconds),
                 "diarization_data": diarization_data,
@@ -1833,7 +2749,9 @@ async def upload_audio(
             }
             
             if supabase:
-                supabase.table('calls').insert(data).execute()
+                inserted = await run_in_threadpool(insert_call_row, data)
+                await run_in_threadpool(emit_call_change, "insert", inserted.data[0] if inserted.data else data)
+                queue_email_notification(inserted.data[0] if inserted.data else data)
             
             yield f"data: {json.dumps({'step': 'save', 'status': 'complete', 'message': 'Saved to database!'})}\n\n"
             yield f"data: {json.dumps({'step': 'done', 'status': 'success', 'message': 'File processed successfully!'})}\n\n"
@@ -1841,6 +2759,8 @@ async def upload_audio(
         except Exception as e:
             yield f"data: {json.dumps({'step': 'error', 'status': 'error', 'message': str(e)})}\n\n"
         finally:
+            if prepared:
+                prepared.cleanup()
             if os.path.exists(temp_path):
                 # Robust deletion for Windows file locking
                 for i in range(5):
@@ -1856,6 +2776,7 @@ async def upload_audio(
     return StreamingResponse(generate_progress(), media_type="text/event-stream")
 
 @app.post("/api/translate")
+@stage("translate")
 async def translate_transcript(req: TranslateRequest):
     if not groq_client: return JSONResponse(status_code=500, content={"error": "Translation service not available"})
     try:
@@ -1978,12 +2899,12 @@ Return the translated JSON (keep field names like 'overview', 'key_points' in En
 async def delete_call(req: DeleteCallRequest):
     if not supabase: return JSONResponse(status_code=500, content={"error": "Database error"})
     try:
-        temp_sb = create_client(url, key)
+        temp_sb = create_supabase_client()
         auth = temp_sb.auth.sign_in_with_password({"email": "admin@10xds.com", "password": req.password})
         if not auth.user: return JSONResponse(status_code=401, content={"error": "Invalid admin password"})
         
         # First, get the call data to retrieve the filename
-        call_data = supabase.table('calls').select("filename, audio_url").eq('id', req.call_id).execute()
+        call_data = supabase.table('calls').select(f"{STATS_COLUMNS}, filename, audio_url").eq('id', req.call_id).execute()
         if not call_data.data or len(call_data.data) == 0:
             return JSONResponse(status_code=404, content={"error": "Call not found"})
         
@@ -1992,6 +2913,7 @@ async def delete_call(req: DeleteCallRequest):
         
         # Delete from database
         res = supabase.table('calls').delete().eq('id', req.call_id).execute()
+        await run_in_threadpool(emit_call_change, "delete", old_row=call_data.data[0])
         
         # Delete audio file from Supabase storage if it exists
         if filename:
@@ -2023,7 +2945,7 @@ async def reanalyze_call(req: Dict[str, Any]):
 
     try:
         # Verify admin
-        temp_sb = create_client(url, key)
+        temp_sb = create_supabase_client()
         auth = temp_sb.auth.sign_in_with_password({"email": "admin@10xds.com", "password": password})
         if not auth.user: return JSONResponse(status_code=401, content={"error": "Invalid admin password"})
 
@@ -2071,6 +2993,7 @@ async def reanalyze_call(req: Dict[str, Any]):
         }
         
         supabase.table('calls').update(update_data).eq('id', call_id).execute()
+        await run_in_threadpool(emit_call_change, "update", {**call_data, **update_data}, call_data)
         
         return {
             "success": True, 
@@ -2173,6 +3096,123 @@ async def webhook_renewal_loop():
 
 # --- Google Drive Webhook ---
 
+# Drive sends a burst of push notifications for a single upload. Notifications
+# that arrive within the debounce window collapse into one change scan.
+DRIVE_WEBHOOK_DEBOUNCE_SECONDS = float(os.environ.get("DRIVE_WEBHOOK_DEBOUNCE_SECONDS", "3"))
+# Upper bound on how long a steady stream of notifications can postpone a scan
+DRIVE_WEBHOOK_MAX_DELAY_SECONDS = float(os.environ.get("DRIVE_WEBHOOK_MAX_DELAY_SECONDS", "30"))
+
+class DriveChangeCoalescer:
+    """
+    Debounces Drive push notifications into change scans.
+
+    - A scan starts once no notification has arrived for `window` seconds,
+      or `max_delay` seconds after the first pending notification.
+    - Notifications that arrive while a scan is running schedule exactly one
+      trailing scan, so changes made mid-scan are never missed.
+    - If the scan could not take drive_update_lock it is retried.
+    """
+
+    def __init__(self, scan_func, window: float, max_delay: float):
+        self.scan_func = scan_func
+        self.window = window
+        self.max_delay = max(max_delay, window)
+        self._pending = False
+        self._first_pending_at = None
+        self._last_notification_at = None
+        self._task = None
+        self.notifications_received = 0
+        self.scans_executed = 0
+        self.scans_retried = 0
+        self.last_scan_at = None
+
+    def notify(self, resource_state: str = None):
+        """Record a notification; must be called from the event loop."""
+        now = time.monotonic()
+        self.notifications_received += 1
+        if not self._pending:
+            self._first_pending_at = now
+        self._pending = True
+        self._last_notification_at = now
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            # Wait for the burst to go quiet (bounded by max_delay)
+            while True:
+                deadline = min(self._last_notification_at + self.window,
+                               self._first_pending_at + self.max_delay)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+
+            # Anything arriving from here on needs a trailing scan
+            self._pending = False
+            self._first_pending_at = None
+
+            try:
+                ran = await run_in_threadpool(self.scan_func)
+            except Exception as e:
+                print(f"[DRIVE-WEBHOOK] Coalesced scan failed: {e}")
+                ran = True
+
+            if ran is False:
+                # Another scan held the lock; try again after another window
+                self.scans_retried += 1
+                now = time.monotonic()
+                if not self._pending:
+                    self._first_pending_at = now
+                self._pending = True
+                self._last_notification_at = now
+                continue
+
+            self.scans_executed += 1
+            self.last_scan_at = datetime.now(timezone.utc).isoformat()
+            print(f"[DRIVE-WEBHOOK] Scan complete ({self.scans_executed} scans for {self.notifications_received} notifications)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "notifications_received": self.notifications_received,
+            "scans_executed": self.scans_executed,
+            "scans_retried": self.scans_retried,
+            "scan_pending": self._pending,
+            "scan_running": bool(self._task and not self._task.done()),
+            "last_scan_at": self.last_scan_at,
+            "debounce_seconds": self.window,
+            "max_delay_seconds": self.max_delay,
+        }
+
+drive_change_coalescer = DriveChangeCoalescer(
+    check_for_updates,
+    window=DRIVE_WEBHOOK_DEBOUNCE_SECONDS,
+    max_delay=DRIVE_WEBHOOK_MAX_DELAY_SECONDS,
+)
+
+
+@app.post("/api/admin/rollups/backfill")
+async def backfill_rollups_endpoint(req: Dict[str, Any]):
+    """Rebuild the analytics rollups from the full calls history (runs in the background)."""
+    if not supabase: return JSONResponse(status_code=500, content={"error": "Database error"})
+    try:
+        temp_sb = create_supabase_client()
+        auth = temp_sb.auth.sign_in_with_password({"email": "admin@10xds.com", "password": req.get("password")})
+        if not auth.user: return JSONResponse(status_code=401, content={"error": "Invalid admin password"})
+    except Exception as e:
+        if "Invalid login credentials" in str(e): return JSONResponse(status_code=401, content={"error": "Invalid admin password"})
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    async def run_backfill():
+        try:
+            await asyncio.to_thread(backfill_rollups)
+        except Exception as e:
+            print(f"[ROLLUPS] Backfill failed: {e}")
+
+    spawn_background_job(run_backfill())
+    return {"success": True, "message": "Rollup backfill started"}
+
 @app.post("/webhook/drive")
 async def drive_webhook(request: Request, background_tasks: BackgroundTasks):
     """
@@ -2193,9 +3233,8 @@ async def drive_webhook(request: Request, background_tasks: BackgroundTasks):
         # 'sync' is sent when the webhook is first registered to confirm connectivity
         # 'add' or 'update' means files changed
         if resource_state in ['sync', 'add', 'update', 'change']:
-            print("[DRIVE-WEBHOOK] Triggering file scan...")
-            # Reuse the existing check logic, running in background
-            background_tasks.add_task(run_in_threadpool, check_for_updates)
+            print("[DRIVE-WEBHOOK] Queueing coalesced file scan...")
+            drive_change_coalescer.notify(resource_state)
             
         print(f"[DRIVE-WEBHOOK] Responding 200 OK to Channel {channel_id}")
         return Response(status_code=200)
@@ -2206,59 +3245,78 @@ async def drive_webhook(request: Request, background_tasks: BackgroundTasks):
 
 # --- Notification System (Global SSE) ---
 
-class NotificationManager:
-    def __init__(self):
-        self.active_connections: List[asyncio.Queue] = []
-
-    async def connect(self):
-        queue = asyncio.Queue()
-        self.active_connections.append(queue)
-        print(f"[NOTIFY] Client connected. Total: {len(self.active_connections)}")
-        try:
-            while True:
-                data = await queue.get()
-                yield f"data: {data}\n\n"
-        except asyncio.CancelledError:
-            self.active_connections.remove(queue)
-            print(f"[NOTIFY] Client disconnected. Total: {len(self.active_connections)}")
-
-    async def broadcast(self, message: str):
-        if not self.active_connections:
-            return
-        
-        # Create tasks for all queues
-        for queue in self.active_connections:
-            await queue.put(message)
-
-notification_manager = NotificationManager()
+# Per-client ring buffer size; beyond it the oldest pending events are dropped
+NOTIFY_CLIENT_QUEUE_SIZE = int(os.environ.get("NOTIFY_CLIENT_QUEUE_SIZE", "100"))
+NOTIFY_HEARTBEAT_SECONDS = float(os.environ.get("NOTIFY_HEARTBEAT_SECONDS", "15"))
+# A client whose buffer stays full this long is disconnected (EventSource reconnects)
+NOTIFY_EVICT_AFTER_SECONDS = float(os.environ.get("NOTIFY_EVICT_AFTER_SECONDS", "60"))
+# "memory" (single process) or "redis" (shared by all workers and pipeline processes)
+NOTIFICATION_BACKEND = os.environ.get("NOTIFICATION_BACKEND", "memory").lower()
+REDIS_URL = os.environ.get("REDIS_URL")
+# Recent events kept for Last-Event-ID replay when a browser reconnects
+NOTIFY_HISTORY_SIZE = int(os.environ.get("NOTIFY_HISTORY_SIZE", "500"))
+NOTIFY_HISTORY_SECONDS = float(os.environ.get("NOTIFY_HISTORY_SECONDS", "300"))
+
+notification_manager = NotificationManager(
+    max_queue=NOTIFY_CLIENT_QUEUE_SIZE,
+    heartbeat_interval=NOTIFY_HEARTBEAT_SECONDS,
+    evict_after=NOTIFY_EVICT_AFTER_SECONDS,
+    backend=create_notification_backend(
+        NOTIFICATION_BACKEND,
+        redis_url=REDIS_URL,
+        history_size=NOTIFY_HISTORY_SIZE,
+        history_seconds=NOTIFY_HISTORY_SECONDS,
+    ),
+)
 
 @app.get("/api/notifications/stream")
-async def notifications_stream(request: Request):
+async def notifications_stream(request: Request, topics: Optional[str] = None):
+    """
+    SSE stream of pipeline notifications.
+    Call changes arrive as typed events (call.created, call.updated,
+    call.deleted with the changed table fields, and stats.changed with the
+    /api/call-stats payload); pipeline progress as untyped messages.
+    `topics` is an optional comma-separated filter (e.g. job:call.wav,call:abc);
+    filtered streams still receive global events. Pipelines are started by
+    Drive and Vapi, not by a user, so there is no per-user topic.
+    A reconnecting EventSource sends Last-Event-ID and gets the events it missed.
+    """
+    topic_filter = None
+    if topics:
+        topic_filter = {t.strip() for t in topics.split(",") if t.strip()}
     return StreamingResponse(
-        notification_manager.connect(),
-        media_type="text/event-stream"
+        notification_manager.connect(
+            topic_filter,
+            is_disconnected=request.is_disconnected,
+            last_event_id=request.headers.get("last-event-id"),
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
+@app.get("/api/debug/notifications")
+async def debug_notifications():
+    """Notification hub metrics (subscribers, queued, dropped, coalesced, evicted)."""
+    return notification_manager.stats()
+
 # --- Vapi Webhook Handling ---
 
 async def process_vapi_call_background(url: str, temp_path: str, filename: str, notification_manager: NotificationManager):
     """
     Background task to process Vapi call and broadcast updates.
     """
-    def create_event(step, message, status="active", file_id=None):
-        payload = {"step": step, "message": message, "status": status}
-        if file_id: payload["file_id"] = file_id
-        return json.dumps(payload)
-
-    await notification_manager.broadcast(create_event("start", "New Vapi call received. Starting processing..."))
+    prepared = None
+    await notification_manager.broadcast(create_notification_event("start", "New Vapi call received. Starting processing...", job=filename))
     
     print(f"[VAPI] Downloading recording from {url}...")
-    await notification_manager.broadcast(create_event("download", "Downloading audio file..."))
+    await notification_manager.broadcast(create_notification_event("download", "Downloading audio file...", job=filename))
     
     try:
         # Download Recording
         # Use run_in_threadpool for blocking I/O
+        @stage("download")
         def download_file():
+            import requests
             with requests.get(url, stream=True) as r:
                 r.raise_for_status()
                 with open(temp_path, 'wb') as f:
@@ -2268,11 +3326,14 @@ async def process_vapi_call_background(url: str, temp_path: str, filename: str,
         await run_in_threadpool(download_file)
         
         print(f"[VAPI] Download complete: {temp_path}")
-        await notification_manager.broadcast(create_event("download", "Download complete", "complete"))
+        await notification_manager.broadcast(create_notification_event("download", "Download complete", "complete", job=filename))
+
+        # Compact speech copy: stored, transcribed and inlined instead of the raw recording
+        prepared = await run_in_threadpool(audio_preprocessor.prepare, temp_path)
         
         # Upload to Supabase Storage
         audio_url = None
-        await notification_manager.broadcast(create_event("upload", "Uploading to Supabase Storage...", "active"))
+        await notification_manager.broadcast(create_notification_event("upload", "Uploading to Supabase Storage...", "active", job=filename))
         
         # Check for existing file in Supabase Storage
         def check_and_upload_supabase():
@@ -2283,7 +3344,7 @@ async def process_vapi_call_background(url: str, temp_path: str, filename: str,
                     return existing_url, False, None  # URL, is_new, error
                 else:
                     print(f"\n{'='*50}\n[VAPI DEBUG] STARTING SUPABASE UPLOAD\nFilename: {filename}\n{'='*50}\n")
-                    new_url = upload_audio_to_supabase(temp_path, filename)
+                    new_url = store_prepared_audio(prepared, filename)
                     if new_url:
                         print(f"\n{'='*50}\n[VAPI DEBUG] UPLOAD SUCCESSFUL\nURL: {new_url}\n{'='*50}\n")
                         return new_url, True, None
@@ -2301,32 +3362,34 @@ async def process_vapi_call_background(url: str, temp_path: str, filename: str,
         if not audio_url:
             error_msg = f"[VAPI] CRITICAL: Supabase Storage upload FAILED. Error: {upload_error}"
             print(error_msg)
-            await notification_manager.broadcast(create_event("upload", f"Supabase Upload Failed - Processing Aborted", "error"))
+            await notification_manager.broadcast(create_notification_event("upload", f"Supabase Upload Failed - Processing Aborted", "error", job=filename))
             print("[VAPI] ABORTING: File was NOT uploaded to Supabase. Processing cancelled.")
             print(f"[VAPI] Error details: {upload_error}")
             return
         
         # Upload successful - proceed with processing
         if is_new:
-            await notification_manager.broadcast(create_event("upload", "Saved to Supabase Storage! Starting analysis...", "complete"))
+            await notification_manager.broadcast(create_notification_event("upload", "Saved to Supabase Storage! Starting analysis...", "complete", job=filename))
         else:
-            await notification_manager.broadcast(create_event("upload", "File already in Supabase Storage. Proceeding...", "complete"))
+            await notification_manager.broadcast(create_notification_event("upload", "File already in Supabase Storage. Proceeding...", "complete", job=filename))
             
         # Run Analysis Pipeline (only if Supabase upload succeeded)
         print("[VAPI] Supabase upload confirmed. Starting Analysis Pipeline...")
-        await notification_manager.broadcast(create_event("analyze", "Analyzing call sentiment..."))
+        await notification_manager.broadcast(create_notification_event("analyze", "Analyzing call sentiment...", job=filename))
         
         # process_audio_file is synchronous - pass None for drive_file_id since we're using Supabase
-        await run_in_threadpool(process_audio_file, temp_path, filename, drive_file_id=None)
+        await run_in_threadpool(process_audio_file, temp_path, filename, drive_file_id=None, prepared=prepared)
         
         print("[VAPI] Processing Complete!")
-        await notification_manager.broadcast(create_event("done", "Analysis complete!", "success"))
+        await notification_manager.broadcast(create_notification_event("done", "Analysis complete!", "success", job=filename))
         
     except Exception as e:
         print(f"[VAPI] Error processing Vapi call: {e}")
-        await notification_manager.broadcast(create_event("error", f"Error: {str(e)}", "error"))
+        await notification_manager.broadcast(create_notification_event("error", f"Error: {str(e)}", "error", job=filename))
     finally:
         # Cleanup
+        if prepared:
+            prepared.cleanup()
         if os.path.exists(temp_path):
             try:
                 os.remove(temp_path)
@@ -2334,126 +3397,13 @@ async def process_vapi_call_background(url: str, temp_path: str, filename: str,
                 pass
 
 @app.post("/api/vapi-call")
-async def handle_vapi_call(request: Request, background_tasks: BackgroundTasks):
+async def handle_vapi_call(request: Request):
     """
-    Endpoint to receive Vapi webhook payloads.
-    Vapi sends different event types with varying structures.
+    Endpoint to receive Vapi webhook payloads (and the dashboard's recording trigger).
+    Shares parsing and handlers with /api/vapi-webhook via vapi_router.
     """
-    try:
-        # Get raw JSON payload
-        payload = await request.json()
-
-        
-        # Extract recording URL from different possible locations in Vapi's payload
-        recording_url = None
-        
-        # Check common paths where Vapi might put the recording URL
-        if isinstance(payload, dict):
-            check_obj = payload.get('message', payload)
-            message_type = check_obj.get('type')
-            call_id = check_obj.get('call', {}).get('id') or payload.get('call', {}).get('id')
-        
-        # --- 1. Handle Status Updates (Live Call Tracking) ---
-        if message_type == 'status-update' or message_type == 'call-status-update':
-            status = check_obj.get('status')
-            if call_id and status and supabase:
-                print(f"[VAPI LIVE] Status Update: {call_id} -> {status}")
-                data = {
-                    "call_id": call_id,
-                    "status": status,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-                # Additional fields on start
-                if status == 'started':
-                    data['started_at'] = datetime.now(timezone.utc).isoformat()
-                elif status == 'ended':
-                    data['ended_at'] = datetime.now(timezone.utc).isoformat()
-                    # Try to get cost/summary if available
-                    if 'cost' in check_obj: data['cost'] = check_obj['cost']
-                    if 'summary' in check_obj: data['summary'] = check_obj['summary']
-
-                try:
-                    await asyncio.to_thread(lambda: supabase.table('vapi_calls').upsert(data).execute())
-                except Exception as e:
-                    print(f"[VAPI LIVE] Error updating call status: {e}")
-
-        # --- 2. Handle Live Transcripts ---
-        elif message_type == 'transcript' and check_obj.get('transcriptType') == 'final':
-            transcript_text = check_obj.get('transcript')
-            role = check_obj.get('role', 'user') # 'user' or 'assistant'
-            
-            if call_id and transcript_text and supabase:
-                print(f"[VAPI LIVE] Transcript: {role}: {transcript_text[:30]}...")
-                t_data = {
-                    "call_id": call_id,
-                    "role": role,
-                    "transcript": transcript_text,
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                try:
-                    await asyncio.to_thread(lambda: supabase.table('transcripts').insert(t_data).execute())
-                except Exception as e:
-                    print(f"[VAPI LIVE] Error saving transcript: {e}")
-
-        # --- 3. PROCEED TO ORIGINAL RECORDING URL CHECK ---
-        # Get raw JSON payload
-        # (check_obj is already set above)
-            
-        # Extract recording URL from different possible locations in Vapi's payload
-        recording_url = None
-        
-        # Check common paths where Vapi might put the recording URL
-        if isinstance(payload, dict):
-            # Direct recording_url field
-            recording_url = check_obj.get('recording_url') or check_obj.get('recordingUrl')
-            
-            # Nested in artifact
-            if not recording_url and 'artifact' in check_obj:
-                artifact = check_obj['artifact']
-                recording_url = artifact.get('recordingUrl') or artifact.get('recording_url')
-            
-            # Nested in call object
-            if not recording_url and 'call' in check_obj:
-                call = check_obj['call']
-                recording_url = call.get('recordingUrl') or call.get('recording_url')
-                
-                # Check artifact inside call
-                if not recording_url and 'artifact' in call:
-                    artifact = call['artifact']
-                    recording_url = artifact.get('recordingUrl') or artifact.get('recording_url')
-            
-            # Stereo recording URL as fallback
-            if not recording_url:
-                recording_url = check_obj.get('stereoRecordingUrl')
-                if not recording_url and 'artifact' in check_obj:
-                    recording_url = check_obj['artifact'].get('stereoRecordingUrl')
-        
-        if not recording_url:
-            # Silence logs for normal status updates to avoid clutter
-            if message_type not in ['status-update', 'transcript', 'call-status-update']:
-                print(f"[VAPI WEBHOOK] No recording URL found in payload (Type: {message_type})")
-            return {"status": "received", "message": "Event processed"}
-        
-        
-        print(f"[VAPI WEBHOOK] Extracted recording URL: {recording_url}")
-        
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"vapi_call_{timestamp}.wav"
-        
-        safe_name = secure_filename(filename)
-        temp_path = os.path.join(UPLOAD_FOLDER, safe_name)
-        
-        # Trigger background task
-        background_tasks.add_task(process_vapi_call_background, recording_url, temp_path, safe_name, notification_manager)
-        
-        return {"status": "processing", "message": "Call processing started in background"}
-        
-    except Exception as e:
-        print(f"[VAPI WEBHOOK] Error processing webhook: {e}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse(status_code=500, content={"error": str(e)})
+    accepted = await ingest_vapi_payload(request, "VAPI WEBHOOK")
+    return {"status": "received", "queued": accepted}
 
 
 
@@ -2474,6 +3424,121 @@ async def debug_live_calls():
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/debug/vapi-queue")
+async def debug_vapi_queue():
+    """Vapi webhook ingestion counters (received, duplicates dropped, lanes, backlog, events by type)."""
+    return {**call_lane_dispatcher.stats(), **vapi_router.stats()}
+
+@app.get("/api/debug/search-index")
+async def debug_search_index():
+    """Local search index status (available, ready, indexed calls, size)."""
+    return await asyncio.to_thread(search_index.stats)
+
+@app.get("/api/debug/response-cache")
+async def debug_response_cache():
+    """Read-endpoint cache counters (entries, hits, misses, 304s, invalidations)."""
+    return response_cache.stats()
+
+@app.get("/api/debug/audio")
+async def debug_audio():
+    """Speech transcoding and silence-trimming counters (transcoded, bytes in/out, seconds trimmed)."""
+    return audio_preprocessor.stats()
+
+@app.get("/api/debug/email")
+async def debug_email():
+    """Notification outbox (pending / failed rows, messages sent, SMTP connections) and render cache."""
+    stats = await asyncio.to_thread(email_outbox.stats)
+    stats["render_cache"] = email_renderer.stats()
+    return stats
+
+@app.get("/api/debug/vector-index")
+async def debug_vector_index():
+    """Local vector index status (embedder, vectors, IVF clusters, size)."""
+    return await asyncio.to_thread(vector_index.stats)
+
+# --- Health ---
+# /readyz fails (503) while more than this share of either worker pool
+# (run_in_threadpool, asyncio.to_thread) is busy, or more than READY_MAX_PIPELINE_JOBS recordings are queued or being transcribed
+READY_MAX_THREADPOOL_USE = float(os.environ.get("READY_MAX_THREADPOOL_USE", "0.9"))
+READY_MAX_PIPELINE_JOBS = int(os.environ.get("READY_MAX_PIPELINE_JOBS", "8"))
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop responds. No dependency is touched."""
+    return {"status": "ok", "uptime_seconds": round(time.perf_counter() - PROCESS_STARTED, 1)}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: startup finished, worker threads and the pipeline have headroom."""
+    pool = threadpool_usage()
+    executor = default_executor.usage()
+    pipeline = pipeline_jobs + call_lane_dispatcher.backlog()
+    checks = {
+        "startup": "ready" in startup_timing,
+        "threadpool": not saturated(pool, READY_MAX_THREADPOOL_USE),
+        "default_executor": not saturated(executor, READY_MAX_THREADPOOL_USE),
+        "pipeline": pipeline <= READY_MAX_PIPELINE_JOBS,
+    }
+    ready = all(checks.values())
+    return FastJSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "not ready",
+        "checks": checks,
+        "threadpool": pool,
+        "default_executor": executor,
+        "pipeline_jobs": pipeline,
+    })
+
+@app.get("/api/admin/dependencies")
+async def admin_dependencies(user_id: str = Depends(login_required)):
+    """Per external service: calls, error rate and p50 / p95 latency over the last 5 minutes."""
+    return {"window_seconds": dependencies.window_seconds, "dependencies": dependencies.stats()}
+
+# --- Metrics ---
+# Read from the stats the app already keeps, at scrape time
+metrics.Counter("cache_requests_total", "In-process cache lookups.", ("cache", "result"), callback=lambda: {
+    ("response", "hit"): response_cache.hits,
+    ("response", "miss"): response_cache.misses,
+    ("response", "not_modified"): response_cache.not_modified,
+    ("email_render", "hit"): email_renderer.hits,
+    ("email_render", "miss"): email_renderer.misses,
+    **dict(media_cache_requests),
+})
+metrics.Counter("transcription_shard_fallbacks_total", "Sharded transcriptions redone as one job after a shard failed.",
+                callback=lambda: {(): sharded_transcriber.fallbacks})
+metrics.Counter("vapi_events_total", "Vapi webhook events by outcome.", ("outcome",), callback=lambda: {
+    ("received",): call_lane_dispatcher.received, ("duplicate",): call_lane_dispatcher.duplicates,
+    ("processed",): call_lane_dispatcher.processed, ("failed",): call_lane_dispatcher.failed,
+})
+metrics.Gauge("pipeline_jobs_in_flight", "Recordings being transcribed right now.",
+              callback=lambda: {(): pipeline_jobs})
+metrics.Gauge("vapi_event_backlog", "Vapi webhook events queued, not yet applied.",
+              callback=lambda: {(): call_lane_dispatcher.backlog()})
+metrics.Gauge("threadpool_threads", "Worker threads of run_in_threadpool and asyncio.to_thread.", ("pool", "state"),
+              callback=lambda: {
+                  **{("run_in_threadpool", state): value for state, value in threadpool_usage().items()},
+                  **{("to_thread", state): value for state, value in default_executor.usage().items()},
+              })
+metrics.Gauge("email_outbox_rows", "Notification emails in the outbox.", ("status",), callback=lambda: {
+    (status,): count for status, count in email_outbox.row_counts().items()
+})
+metrics.Gauge("sse_connections", "Open dashboard notification streams.",
+              callback=lambda: {(): len(notification_manager.subscribers)})
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (text format 0.0.4)."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/debug/startup")
+async def debug_startup():
+    """Seconds from process start to import / clients warm / ready, and per-client init times."""
+    return {"timing": startup_timing, "clients": clients_stats()}
+
+@app.get("/api/debug/drive-sync")
+async def debug_drive_sync():
+    """Drive webhook coalescing counters (notifications received vs. scans executed)."""
+    return drive_change_coalescer.stats()
+
 if __name__ == "__main__":
     import uvicorn
     # ... rest of main ...
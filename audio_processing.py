@@ -0,0 +1,472 @@
+"""
+Audio preprocessing: probe recordings and transcode them for speech.
+
+Vapi recordings and uploads arrive as WAV/FLAC at 44.1-48 kHz stereo,
+roughly 10x more bytes than speech needs. AudioPreprocessor.prepare()
+probes a file with ffprobe and transcodes it with ffmpeg to 16 kHz mono
+Opus in an Ogg container at a speech bitrate, so the Supabase upload, the
+AssemblyAI upload and any inline copy all move the compact file.
+
+Each transcode runs in its own ffmpeg process; a semaphore bounds how
+many run at once (AUDIO_TRANSCODE_WORKERS, default: CPU count) so a burst
+of webhook calls cannot oversubscribe the host. Files that are already
+compact speech Opus are left alone, and without ffmpeg on PATH every
+file passes through unchanged (with its real MIME type).
+
+With silence trimming on, the speech copy is also decoded to PCM and run
+through an energy-based voice-activity detector (NumPy, no model): spans
+of dead air longer than `min_silence` are cut from a second, shorter file
+that is sent for transcription, while the full recording is what gets
+stored and played back. The OffsetMap of kept spans translates the
+transcript's `start`/`end` timestamps back to the original recording.
+
+The same decode yields the waveform peaks the call modal draws: one int8
+peak per WAVEFORM_MS behind a 16-byte header (see encode_peaks), stored
+next to the audio so the browser never decodes audio just to draw it.
+"""
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Extension -> MIME type for everything /api/upload accepts, plus Opus
+AUDIO_MIME_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+    "ogg": "audio/ogg",
+    "opus": "audio/ogg",
+    "oga": "audio/ogg",
+    "webm": "audio/webm",
+    "flac": "audio/flac",
+}
+SPEECH_EXTENSION = "ogg"
+SPEECH_MIME_TYPE = "audio/ogg"
+SPEECH_SAMPLE_RATE = 16000
+# Opus at 16 kHz mono is transparent for ASR well below this
+SPEECH_BITRATE = "24k"
+# Ceiling for one transcode; a multi-hour recording finishes well within it
+TRANSCODE_TIMEOUT = 600
+
+# Voice-activity detection
+VAD_FRAME_MS = 30
+# Quieter spans at least this long are cut...
+VAD_MIN_SILENCE = 1.0
+# ...leaving this much of them on each side of the speech around them
+VAD_PADDING = 0.25
+# Not worth a second file (and a remap) below this
+VAD_MIN_SAVED = 2.0
+
+# Waveform peaks: one per WAVEFORM_MS, coarser for calls that would exceed WAVEFORM_MAX_PEAKS
+WAVEFORM_MS = 50
+WAVEFORM_MAX_PEAKS = 20000
+WAVEFORM_MAGIC = b"VXPK"
+WAVEFORM_VERSION = 1
+# magic, version, reserved, ms per peak, duration ms, peak count (little-endian)
+WAVEFORM_HEADER = struct.Struct("<4sBBHII")
+WAVEFORM_MIME_TYPE = "application/octet-stream"
+
+
+def mime_type_for(path: str, default: str = "audio/mpeg") -> str:
+    ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    return AUDIO_MIME_TYPES.get(ext, default)
+
+
+def speech_filename(filename: str) -> str:
+    """Storage name of the speech-encoded copy of `filename` (call_1.wav -> call_1.ogg)."""
+    stem = filename.rsplit(".", 1)[0] if "." in filename else filename
+    return f"{stem}.{SPEECH_EXTENSION}"
+
+
+def waveform_filename(filename: str) -> str:
+    """Storage name of the waveform peaks for `filename` (call_1.wav -> waveforms/call_1.peaks)."""
+    stem = filename.rsplit(".", 1)[0] if "." in filename else filename
+    return f"waveforms/{stem}.peaks"
+
+
+def probe_audio(path: str) -> Dict[str, Any]:
+    """
+    Container, codec, duration and layout of the first audio stream.
+    Missing ffprobe or an unreadable file yields the size alone.
+    """
+    info: Dict[str, Any] = {"size": os.path.getsize(path)}
+    if not shutil.which("ffprobe"):
+        return info
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-print_format", "json", "-show_format",
+             "-show_streams", "-select_streams", "a:0", path],
+            capture_output=True, timeout=60, check=True,
+        )
+        probed = json.loads(result.stdout or b"{}")
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        print(f"[AUDIO] ffprobe failed for {path}: {e}")
+        return info
+    fmt = probed.get("format", {})
+    stream = (probed.get("streams") or [{}])[0]
+    info.update({
+        "format": fmt.get("format_name"),
+        "codec": stream.get("codec_name"),
+        "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+        "bit_rate": int(fmt["bit_rate"]) if fmt.get("bit_rate") else None,
+    })
+    return info
+
+
+def is_speech_encoded(info: Dict[str, Any]) -> bool:
+    """Already mono Opus at a speech bitrate: nothing to gain from re-encoding."""
+    return (info.get("codec") == "opus" and info.get("channels") == 1
+            and (info.get("bit_rate") or 0) <= 64000)
+
+
+def transcode_for_speech(src: str, dst: str, bitrate: str = SPEECH_BITRATE,
+                         sample_rate: int = SPEECH_SAMPLE_RATE):
+    """ffmpeg src -> 16 kHz mono Opus/Ogg at dst. Raises CalledProcessError on failure."""
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+         "-vn", "-ac", "1", "-ar", str(sample_rate), "-c:a", "libopus", "-b:a", bitrate,
+         "-application", "voip", "-threads", "1", dst],
+        capture_output=True, timeout=TRANSCODE_TIMEOUT, check=True,
+    )
+
+
+def decode_pcm(path: str, sample_rate: int = SPEECH_SAMPLE_RATE) -> np.ndarray:
+    """Mono int16 samples of `path` at `sample_rate`, decoded by ffmpeg."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-i", path,
+         "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"],
+        capture_output=True, timeout=TRANSCODE_TIMEOUT, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype="<i2")
+
+
+def encode_pcm(samples: np.ndarray, dst: str, sample_rate: int = SPEECH_SAMPLE_RATE,
+               bitrate: str = SPEECH_BITRATE):
+    """Mono int16 samples -> Opus/Ogg at dst."""
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+         "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-threads", "1", dst],
+        input=samples.astype("<i2", copy=False).tobytes(), capture_output=True,
+        timeout=TRANSCODE_TIMEOUT, check=True,
+    )
+
+
+def frame_energy_db(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level of each `frame`-sample frame in dBFS (digital silence clamps to -100)."""
+    usable = len(samples) - len(samples) % frame
+    frames = samples[:usable].astype(np.float32).reshape(-1, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-5))
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int = SPEECH_SAMPLE_RATE,
+                  min_silence: float = VAD_MIN_SILENCE, padding: float = VAD_PADDING,
+                  threshold_db: Optional[float] = None) -> List[Tuple[int, int]]:
+    """
+    Sample ranges [start, end) to keep: everything except quiet runs of at
+    least `min_silence` seconds, which shrink to `padding` on each side.
+
+    The threshold adapts to the call: a third of the way from the noise
+    floor (10th percentile frame level) to the speech level (95th). A
+    recording without a clear gap between the two is kept whole.
+    """
+    frame = sample_rate * VAD_FRAME_MS // 1000
+    if len(samples) < frame:
+        return [(0, len(samples))]
+    energy = frame_energy_db(samples, frame)
+    if threshold_db is None:
+        floor, peak = np.percentile(energy, [10, 95])
+        if peak - floor < 15:
+            return [(0, len(samples))]
+        threshold_db = floor + (peak - floor) / 3
+    voiced = energy > threshold_db
+
+    # Runs of quiet frames, as [start, end) frame indices
+    edges = np.diff(np.concatenate(([1], voiced.view(np.int8), [1])))
+    quiet_starts = np.flatnonzero(edges == -1).tolist()
+    quiet_ends = np.flatnonzero(edges == 1).tolist()
+
+    min_frames = int(min_silence * 1000 / VAD_FRAME_MS)
+    pad = int(padding * sample_rate)
+    keep, cursor = [], 0
+    for q_start, q_end in zip(quiet_starts, quiet_ends):
+        if q_end - q_start < min_frames:
+            continue
+        cut_start = q_start * frame + (pad if q_start > 0 else 0)
+        cut_end = q_end * frame - (pad if q_end < len(voiced) else 0)
+        if q_end == len(voiced):
+            cut_end = len(samples)  # trailing silence, including the partial last frame
+        if cut_end <= cut_start:
+            continue
+        if cut_start > cursor:
+            keep.append((cursor, cut_start))
+        cursor = cut_end
+    if cursor < len(samples):
+        keep.append((cursor, len(samples)))
+    return keep or [(0, min(len(samples), frame))]
+
+
+def compute_peaks(samples: np.ndarray, sample_rate: int = SPEECH_SAMPLE_RATE) -> Tuple[int, np.ndarray]:
+    """
+    (ms per peak, int8 peaks 0..127): the loudest sample of each bucket,
+    normalised to the call's own loudest so quiet calls still draw.
+    """
+    duration_ms = len(samples) * 1000 / sample_rate
+    ms_per_peak = max(WAVEFORM_MS, int(np.ceil(duration_ms / WAVEFORM_MAX_PEAKS / 10)) * 10)
+    bucket = max(1, sample_rate * ms_per_peak // 1000)
+    count = -(-len(samples) // bucket)
+    padded = np.zeros(count * bucket, dtype=np.int32)
+    padded[:len(samples)] = np.abs(samples.astype(np.int32))
+    peaks = padded.reshape(count, bucket).max(axis=1) if count else padded
+    loudest = int(peaks.max()) if len(peaks) else 0
+    scaled = np.ceil(peaks * (127 / loudest)) if loudest else peaks
+    return ms_per_peak, scaled.astype(np.int8)
+
+
+def encode_peaks(peaks: np.ndarray, ms_per_peak: int, duration_ms: int) -> bytes:
+    return WAVEFORM_HEADER.pack(WAVEFORM_MAGIC, WAVEFORM_VERSION, 0, ms_per_peak, duration_ms, len(peaks)) + \
+        peaks.astype(np.int8, copy=False).tobytes()
+
+
+def waveform_for_samples(samples: np.ndarray, sample_rate: int = SPEECH_SAMPLE_RATE) -> bytes:
+    ms_per_peak, peaks = compute_peaks(samples, sample_rate)
+    return encode_peaks(peaks, ms_per_peak, int(len(samples) * 1000 / sample_rate))
+
+
+def waveform_for_file(path: str) -> bytes:
+    """Waveform peaks of any audio ffmpeg can decode."""
+    return waveform_for_samples(decode_pcm(path))
+
+
+class OffsetMap:
+    """
+    Kept spans of a trimmed recording, for translating trimmed-audio
+    timestamps (milliseconds, as AssemblyAI reports them) back to the
+    original recording.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float]]):
+        # (trimmed start, original start, length), all in ms
+        self.segments: List[Tuple[float, float, float]] = []
+        position = 0.0
+        for start, end in spans:
+            self.segments.append((position, start, end - start))
+            position += end - start
+        self._starts = [segment[0] for segment in self.segments]
+
+    @classmethod
+    def from_samples(cls, ranges: List[Tuple[int, int]], sample_rate: int) -> "OffsetMap":
+        return cls([(start * 1000 / sample_rate, end * 1000 / sample_rate) for start, end in ranges])
+
+    @property
+    def kept_ms(self) -> float:
+        return sum(length for _, _, length in self.segments)
+
+    def to_original(self, ms: Optional[float], is_end: bool = False) -> Optional[float]:
+        """
+        Original-recording time of trimmed time `ms`. An `end` that falls
+        exactly on a cut belongs to the span before it, not after.
+        """
+        if ms is None or not self.segments:
+            return ms
+        i = bisect_right(self._starts, ms) - 1
+        if is_end and i > 0 and ms == self._starts[i]:
+            i -= 1
+        trimmed_start, original_start, length = self.segments[max(i, 0)]
+        return original_start + min(max(ms - trimmed_start, 0.0), length)
+
+    def remap_utterances(self, utterances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rewrite each utterance's start/end (in place) onto the original timeline."""
+        for utterance in utterances:
+            for key in ("start", "end"):
+                value = utterance.get(key)
+                if isinstance(value, (int, float)):
+                    utterance[key] = int(round(self.to_original(value, is_end=key == "end")))
+        return utterances
+
+
+@dataclass
+class PreparedAudio:
+    """A recording ready for upload and transcription."""
+    path: str
+    mime_type: str
+    original_path: str
+    original_mime_type: str
+    transcoded: bool = False
+    probe: Dict[str, Any] = field(default_factory=dict)
+    original_size: int = 0
+    size: int = 0
+    # Silence-trimmed copy sent for transcription, with its map back to `path`
+    trimmed_path: Optional[str] = None
+    offset_map: Optional[OffsetMap] = None
+    duration: Optional[float] = None
+    seconds_trimmed: float = 0.0
+    # encode_peaks() output for the full recording
+    waveform: Optional[bytes] = None
+
+    @property
+    def transcription_path(self) -> str:
+        return self.trimmed_path or self.path
+
+    def restore_timeline(self, duration_seconds: float, utterances: List[Dict[str, Any]]):
+        """
+        (duration, utterances) of a transcription of transcription_path,
+        translated to the full recording.
+        """
+        if self.offset_map is None:
+            return duration_seconds, utterances
+        self.offset_map.remap_utterances(utterances)
+        return (self.duration or duration_seconds), utterances
+
+    def storage_name(self, filename: str) -> str:
+        """Name to store under: the speech name when transcoded, else `filename`."""
+        return speech_filename(filename) if self.transcoded else filename
+
+    def describe(self) -> str:
+        if not self.transcoded:
+            return f"{self.original_size / 1e6:.1f} MB (kept as {self.mime_type})"
+        ratio = self.original_size / max(1, self.size)
+        return f"{self.original_size / 1e6:.1f} MB -> {self.size / 1e6:.1f} MB ({ratio:.0f}x smaller)"
+
+    def cleanup(self):
+        """Remove the transcoded and trimmed temp files (the caller owns original_path)."""
+        paths = [self.trimmed_path]
+        if self.transcoded and self.path != self.original_path:
+            paths.append(self.path)
+        for path in paths:
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"[AUDIO] Failed to remove {path}: {e}")
+
+
+class AudioPreprocessor:
+    """
+    Thread-safe: prepare() is called from the request threadpool and the
+    background pipelines concurrently; at most `workers` ffmpeg processes
+    (or VAD passes) run at a time.
+    """
+
+    def __init__(self, workers: Optional[int] = None, bitrate: str = SPEECH_BITRATE,
+                 sample_rate: int = SPEECH_SAMPLE_RATE, enabled: bool = True,
+                 trim_silence: bool = True, min_silence: float = VAD_MIN_SILENCE):
+        self.workers = workers or os.cpu_count() or 2
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.enabled = enabled and shutil.which("ffmpeg") is not None
+        self.trim_silence = trim_silence
+        self.min_silence = min_silence
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self.transcoded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.trimmed = 0
+        self.seconds_in = 0.0
+        self.seconds_trimmed = 0.0
+        if enabled and not self.enabled:
+            print("[AUDIO] ffmpeg not found on PATH; audio is stored and transcribed as uploaded.")
+
+    def prepare(self, path: str) -> PreparedAudio:
+        info = probe_audio(path)
+        original_mime = mime_type_for(path)
+        prepared = PreparedAudio(path=path, mime_type=original_mime, original_path=path,
+                                 original_mime_type=original_mime, probe=info,
+                                 original_size=info["size"], size=info["size"])
+        if not self.enabled:
+            self.skipped += 1
+            return prepared
+        if is_speech_encoded(info):
+            self.skipped += 1
+            self._analyse(prepared)
+            return prepared
+
+        dst = f"{path.rsplit('.', 1)[0] if '.' in os.path.basename(path) else path}.speech.{SPEECH_EXTENSION}"
+        try:
+            with self._slots:
+                transcode_for_speech(path, dst, self.bitrate, self.sample_rate)
+        except (subprocess.SubprocessError, OSError) as e:
+            stderr = getattr(e, "stderr", b"") or b""
+            print(f"[AUDIO] Transcode failed for {path}, using original: {e} {stderr.decode(errors='replace')[-300:]}")
+            self.failed += 1
+            if os.path.exists(dst):
+                os.remove(dst)
+            return prepared
+
+        prepared.path = dst
+        prepared.mime_type = SPEECH_MIME_TYPE
+        prepared.transcoded = True
+        prepared.size = os.path.getsize(dst)
+        self.transcoded += 1
+        self.bytes_in += prepared.original_size
+        self.bytes_out += prepared.size
+        source = ""
+        if info.get("codec"):
+            source = f" {info['codec']} {info.get('sample_rate')} Hz x{info.get('channels')}"
+            if info.get("duration"):
+                source += f", {info['duration']:.0f}s"
+        print(f"[AUDIO] {os.path.basename(path)}:{source} -> {prepared.describe()}")
+        self._analyse(prepared)
+        return prepared
+
+    def _analyse(self, prepared: PreparedAudio):
+        """
+        Decode prepared.path once for its waveform peaks and, if it saves
+        enough, a silence-trimmed copy for transcription.
+        """
+        try:
+            with self._slots:
+                samples = decode_pcm(prepared.path, self.sample_rate)
+                prepared.duration = len(samples) / self.sample_rate
+                prepared.waveform = waveform_for_samples(samples, self.sample_rate)
+                if not self.trim_silence:
+                    return
+                ranges = detect_speech(samples, self.sample_rate, self.min_silence)
+                kept = sum(end - start for start, end in ranges)
+                saved = (len(samples) - kept) / self.sample_rate
+                self.seconds_in += prepared.duration
+                if saved < VAD_MIN_SAVED:
+                    return
+                dst = prepared.path.rsplit(".", 1)[0] + f".trimmed.{SPEECH_EXTENSION}"
+                encode_pcm(np.concatenate([samples[start:end] for start, end in ranges]),
+                           dst, self.sample_rate, self.bitrate)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"[AUDIO] Analysis failed for {prepared.path}, transcribing it whole: {e}")
+            return
+        prepared.trimmed_path = dst
+        prepared.offset_map = OffsetMap.from_samples(ranges, self.sample_rate)
+        prepared.seconds_trimmed = saved
+        self.trimmed += 1
+        self.seconds_trimmed += saved
+        print(f"[AUDIO] {os.path.basename(prepared.original_path)}: trimmed {saved:.1f}s of silence "
+              f"({prepared.duration:.0f}s -> {prepared.duration - saved:.0f}s, {len(ranges)} spans)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "bitrate": self.bitrate,
+            "sample_rate": self.sample_rate,
+            "transcoded": self.transcoded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "trim_silence": self.trim_silence,
+            "trimmed": self.trimmed,
+            "seconds_in": round(self.seconds_in, 1),
+            "seconds_trimmed": round(self.seconds_trimmed, 1),
+        }
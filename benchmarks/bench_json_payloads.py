@@ -0,0 +1,123 @@
+"""
+Bytes on the wire and serialization time for representative API payloads.
+
+    python benchmarks/bench_json_payloads.py
+    python benchmarks/bench_json_payloads.py --utterances 3000 --repeats 50
+
+Compares the stdlib encoder FastAPI's JSONResponse uses with the orjson
+path of FastJSONResponse (http_responses.py), and uncompressed bodies with
+the gzip / brotli output of CompressionMiddleware, for:
+  - a long call's detail (transcript + diarization + structured summary),
+  - a 100-row /api/calls page with summaries,
+  - a translate_transcript response with translated_diarization.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from http_responses import brotli, compress, dumps_json, orjson  # noqa: E402
+
+WORDS = ("account billing refund router outage the customer agent said please thank you internet "
+         "payment invoice cancel plan upgrade technician tomorrow yesterday issue resolved sorry "
+         "problem connection slow speed contract price offer discount email password reset").split()
+
+
+def sentence(rng, low=6, high=24):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + "."
+
+
+def utterances(rng, n):
+    out, t = [], 0
+    for i in range(n):
+        text = sentence(rng)
+        duration = 350 * len(text.split())
+        out.append({"speaker": "A" if i % 2 else "B", "text": text, "start": t, "end": t + duration,
+                    "confidence": round(rng.uniform(0.8, 1.0), 4)})
+        t += duration + 250
+    return out
+
+
+def summary(rng):
+    return json.dumps({
+        "overview": " ".join(sentence(rng) for _ in range(4)),
+        "key_points": [sentence(rng) for _ in range(5)],
+        "caller_intent": sentence(rng), "issue_details": sentence(rng), "resolution": sentence(rng),
+        "action_items": [sentence(rng) for _ in range(3)], "tone": "Frustrated then calm",
+        "detected_speakers": {"Speaker 1": "Agent", "Speaker 2": "Customer"},
+    })
+
+
+def payloads(rng, n_utterances):
+    diarization = utterances(rng, n_utterances)
+    detail = {
+        "id": 4821, "filename": "call_2026_03_14_0930.wav", "sentiment": "Negative",
+        "tags": ["Billing", "Complaint"], "duration": diarization[-1]["end"] // 1000,
+        "created_at": "2026-03-14T09:30:00+00:00", "speaker_count": 2, "email_sent": True,
+        "summary": summary(rng), "transcript": " ".join(u["text"] for u in diarization),
+        "diarization_data": diarization,
+    }
+    page = {
+        "calls": [{
+            "id": 5000 - i, "filename": f"call_{5000 - i}.wav", "sentiment": rng.choice(["Positive", "Negative", "Neutral"]),
+            "tags": ["Support"], "summary": summary(rng), "duration": rng.randint(60, 1800),
+            "created_at": "2026-03-14T09:30:00+00:00", "speaker_count": 2, "email_sent": True,
+        } for i in range(100)],
+        "total": 5000, "total_is_estimate": False, "has_more": True, "next_cursor": "eyJpZCI6IDQ5MDF9",
+    }
+    translated = {
+        "success": True, "language": "hi", "has_diarization": True,
+        "translated_text": " ".join(u["text"] for u in diarization),
+        "translated_diarization": [{**u, "text": "अनुवाद " + u["text"]} for u in diarization],
+    }
+    return [("call detail", detail), ("/api/calls page", page), ("translate", translated)]
+
+
+def stdlib_dumps(content):
+    # What starlette's JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timed_ms(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=1500, help="utterances in the long call")
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}   brotli: {'yes' if brotli else 'no (gzip only)'}")
+    print()
+    print(f"{'payload':<17} {'stdlib ms':>9} {'fast ms':>8} {'raw KB':>8} {'gzip KB':>8} {'gzip ms':>8} "
+          f"{'br KB':>7} {'br ms':>6}")
+    for name, content in payloads(rng, args.utterances):
+        stdlib_ms, body = timed_ms(lambda: stdlib_dumps(content), args.repeats)
+        fast_ms, _ = timed_ms(lambda: dumps_json(content), args.repeats)
+        gzip_ms, gzipped = timed_ms(lambda: compress(body, "gzip"), args.repeats)
+        row = (f"{name:<17} {stdlib_ms:>9.2f} {fast_ms:>8.2f} {len(body) / 1024:>8.1f} "
+               f"{len(gzipped) / 1024:>8.1f} {gzip_ms:>8.2f}")
+        if brotli:
+            br_ms, br = timed_ms(lambda: compress(body, "br"), args.repeats)
+            row += f" {len(br) / 1024:>7.1f} {br_ms:>6.2f}"
+        print(row)
+        assert gzip.decompress(gzipped) == body
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark the local search index (search_index.py) on a synthetic corpus.
+
+    python benchmarks/bench_search_index.py                     # 1M utterances
+    python benchmarks/bench_search_index.py --utterances 100000 --keep /tmp/idx.db
+
+Builds calls with diarized utterances (Zipf-distributed vocabulary, two
+speakers per call, a known share of customer utterances containing the
+phrase "i want a refund"), then reports build throughput, index size and
+p50/p95 latency for term, phrase, prefix, speaker-filtered and per-call
+utterance queries, call-level ranked search, and re-indexing one call.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from search_index import CallSearchIndex  # noqa: E402
+
+SYLLABLES = ["ba", "co", "di", "fe", "ga", "hi", "jo", "ku", "la", "me", "no", "pa",
+             "qui", "ro", "sa", "te", "vu", "wa", "xe", "yo", "zu", "an", "el", "or"]
+PLANTED_PHRASE = "i want a refund"
+
+
+def build_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_calls(n_calls, per_call, vocab, weights, plant_rate, rng):
+    planted = 0
+    for call_id in range(1, n_calls + 1):
+        utterances, t = [], 0
+        for i in range(per_call):
+            speaker = "Customer" if i % 2 else "Agent"
+            words = rng.choices(vocab, cum_weights=weights, k=rng.randint(6, 18))
+            if speaker == "Customer" and rng.random() < plant_rate:
+                words[len(words) // 2:len(words) // 2] = PLANTED_PHRASE.split()
+                planted += 1
+            duration = 400 * len(words)
+            utterances.append({"speaker": "A" if speaker == "Agent" else "B", "display_name": speaker,
+                               "text": " ".join(words), "start": t, "end": t + duration})
+            t += duration + 300
+        yield {
+            "id": call_id,
+            "filename": f"call_{call_id:07d}.wav",
+            "sentiment": rng.choice(["Positive", "Negative", "Neutral"]),
+            "tags": [rng.choice(["Billing", "Support", "Technical Issue"])],
+            "summary": " ".join(rng.choices(vocab, cum_weights=weights, k=30)),
+            "transcript": " ".join(u["text"] for u in utterances),
+            "diarization_data": utterances,
+            "duration": t // 1000,
+            "created_at": f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d}T12:00:00+00:00",
+            "speaker_count": 2,
+            "email_sent": True,
+        }
+    synthetic_calls.planted = planted
+
+
+def timed(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=1_000_000)
+    parser.add_argument("--per-call", type=int, default=40)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--plant-rate", type=float, default=0.005)
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--keep", help="write the index here and keep it (default: temp file)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = build_vocabulary(args.vocabulary, rng)
+    # Cumulative weights once: rng.choices(weights=...) would re-sum them per call
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    n_calls = max(1, args.utterances // args.per_call)
+
+    tmpdir = None
+    path = args.keep
+    if not path:
+        tmpdir = tempfile.mkdtemp(prefix="bench_search_")
+        path = os.path.join(tmpdir, "index.db")
+    index = CallSearchIndex(path)
+    if not index.available:
+        print("SQLite FTS5 is not available in this Python build")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    batch = []
+    for row in synthetic_calls(n_calls, args.per_call, vocab, weights, args.plant_rate, rng):
+        batch.append(row)
+        if len(batch) == 500:
+            index.upsert_many(batch)
+            batch = []
+    index.upsert_many(batch)
+    build_seconds = time.perf_counter() - t0
+    total_utterances = n_calls * args.per_call
+    size_mb = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)) / 1e6
+
+    print(f"Corpus:        {n_calls:,} calls, {total_utterances:,} utterances")
+    print(f"Build:         {build_seconds:.1f}s ({total_utterances / build_seconds:,.0f} utterances/s)")
+    print(f"Index size:    {size_mb:,.0f} MB")
+    print(f"Planted:       {synthetic_calls.planted:,} utterances containing \"{PLANTED_PHRASE}\"")
+    print()
+
+    common, mid, rare = vocab[0], vocab[len(vocab) // 100], vocab[len(vocab) // 2]
+    queries = [
+        ("term (common)", lambda: index.search_utterances(common, limit=20)),
+        ("term (common) ranked", lambda: index.search_utterances(common, limit=20, order="relevance")),
+        ("term (mid)", lambda: index.search_utterances(mid, limit=20)),
+        ("term (mid) ranked", lambda: index.search_utterances(mid, limit=20, order="relevance")),
+        ("term (rare)", lambda: index.search_utterances(rare, limit=20)),
+        ("phrase", lambda: index.search_utterances(f'"{PLANTED_PHRASE}"', limit=20)),
+        ("phrase + speaker", lambda: index.search_utterances('"want a refund"', speaker="customer", limit=20)),
+        ("prefix", lambda: index.search_utterances(mid[:4] + "*", limit=20)),
+        ("one call", lambda: index.search_utterances(common, call_id=n_calls // 2, limit=20)),
+        ("calls: ranked q", lambda: index.search(mid, limit=20)),
+        ("calls: q + filters", lambda: index.search(mid, sentiments=["negative"], tags=["Billing"], limit=20)),
+    ]
+    print(f"{'query':<22} {'p50 ms':>8} {'p95 ms':>8} {'hits':>6}")
+    ok = True
+    for name, fn in queries:
+        p50, p95, result = timed(fn, args.repeats)
+        hits = result.get("hits", result.get("calls", []))
+        print(f"{name:<22} {p50:>8.2f} {p95:>8.2f} {len(hits):>6}")
+        if name.startswith("phrase"):
+            wrong = [h for h in hits if "refund" not in h["snippet"] or
+                     (name.endswith("speaker") and h["speaker"] != "Customer")]
+            if wrong or (synthetic_calls.planted and not hits):
+                print(f"FAIL: {name} returned {len(wrong)} non-matching hit(s)")
+                ok = False
+
+    # Re-indexing one call (what update_diarization / reanalyze trigger)
+    row = next(synthetic_calls(1, args.per_call, vocab, weights, 0, random.Random(1)))
+    row["id"] = n_calls // 3
+    p50, p95, _ = timed(lambda: index.apply_change("update", row), min(args.repeats, 10))
+    print(f"{'reindex one call':<22} {p50:>8.2f} {p95:>8.2f}")
+
+    if tmpdir:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(tmpdir)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
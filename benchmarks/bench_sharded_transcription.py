@@ -0,0 +1,105 @@
+"""
+Time sharded transcription (transcription.py) with a stubbed backend.
+
+    python benchmarks/bench_sharded_transcription.py
+    python benchmarks/bench_sharded_transcription.py --hours 2 --shard-minutes 15
+
+Builds a synthetic multi-speaker call (known utterances over noise-floor
+silence), plans shards over its audio, and "transcribes" each shard with a
+stub that behaves like a real job: it only hears its own window, reports
+times relative to the shard start (with a little jitter), and names
+speakers by order of appearance, so labels disagree between shards.
+
+Reports wall-clock time for one job vs the sharded run, with the stub
+sleeping in proportion to the audio it is given. Stitching correctness is
+covered by tests/test_transcription_sharding.py.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from transcription import ShardedTranscriber, plan_shards, speaker_label, stitch_shards  # noqa: E402
+
+# Low rate keeps hours of synthetic audio small; planning only looks at frame energy
+SAMPLE_RATE = 1000
+JITTER_MS = 40
+
+
+def synthetic_call(seconds, speakers, rng):
+    """(int16 samples, utterances in ms) for a call of `seconds` with `speakers` people."""
+    utterances, t, i = [], 1000.0, 0
+    while True:
+        duration = rng.uniform(1500, 12000)
+        if t + duration > seconds * 1000 - 1000:
+            break
+        speaker = rng.randrange(speakers) if rng.random() < 0.3 else i % speakers
+        utterances.append({"speaker": speaker, "text": f"utterance {i}", "start": int(t), "end": int(t + duration)})
+        t += duration + (rng.uniform(4000, 9000) if rng.random() < 0.05 else rng.uniform(300, 1500))
+        i += 1
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    signal = np_rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001
+    for u in utterances:
+        lo, hi = u["start"] * SAMPLE_RATE // 1000, u["end"] * SAMPLE_RATE // 1000
+        signal[lo:hi] = np_rng.standard_normal(hi - lo) * 0.2
+    return (signal * 32767).clip(-32768, 32767).astype(np.int16), utterances
+
+
+def stub_transcribe(shard, truth, rng, seconds_per_audio_second=0.0):
+    """What a transcription job over just this shard's audio would return."""
+    heard, labels = [], {}
+    for u in truth:
+        start, end = max(u["start"], shard.start_ms), min(u["end"], shard.end_ms)
+        if end - start < 200:
+            continue
+        local = labels.setdefault(u["speaker"], speaker_label(len(labels)))
+        heard.append({
+            "speaker": local, "text": u["text"],
+            "start": int(start - shard.start_ms + rng.randint(-JITTER_MS, JITTER_MS)),
+            "end": int(end - shard.start_ms + rng.randint(-JITTER_MS, JITTER_MS)),
+        })
+    duration = (shard.end_ms - shard.start_ms) / 1000
+    time.sleep(duration * seconds_per_audio_second)
+    text = " ".join(u["text"] for u in heard)
+    return text, duration, heard, len(labels), "en"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--speakers", type=int, default=3)
+    parser.add_argument("--shard-minutes", type=float, default=15)
+    parser.add_argument("--overlap", type=float, default=20, help="seconds of overlap on each side of a cut")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0005,
+                        help="stub job seconds per second of audio (0.0005: 2 h of audio -> 3.6 s)")
+    args = parser.parse_args()
+
+    seconds = args.hours * 3600
+    shard_seconds = args.shard_minutes * 60
+    samples, truth = synthetic_call(seconds, args.speakers, random.Random(0))
+    transcriber = ShardedTranscriber(lambda *a: None, shard_seconds, args.overlap, args.workers, SAMPLE_RATE)
+    shards = plan_shards(samples, SAMPLE_RATE, shard_seconds, args.overlap)
+
+    t0 = time.perf_counter()
+    whole = plan_shards(samples, SAMPLE_RATE, seconds * 2, 0)[0]
+    stub_transcribe(whole, truth, random.Random(0), args.latency)
+    single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = transcriber.run_shards(
+        shards, lambda shard: stub_transcribe(shard, truth, random.Random(shard.index), args.latency))
+    stitch_shards(shards, results)
+    sharded = time.perf_counter() - t0
+
+    print(f"one job:     {single:.2f}s")
+    print(f"{len(shards)} shards:    {sharded:.2f}s ({single / sharded:.1f}x faster, {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold-start import time of app.py, per module.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --top 30 --repeats 5
+    python benchmarks/bench_startup.py --module transcription
+
+Imports the module in a fresh interpreter under `python -X importtime`
+(repeated, median taken) and reports:
+  - wall-clock time of the import,
+  - the slowest top-level packages by cumulative import time (what each
+    `import x` at the top of the module costs, including everything it
+    pulls in),
+  - this repo's own modules, by cumulative time.
+
+Run it from an environment with the full requirements installed; a
+dependency that fails to import stops the run with its traceback. Heavy
+clients (Supabase, Groq, Drive, the embedding model) are built after
+startup (see lazy_clients.py), so they should not appear here.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LOCAL_MODULES = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+
+def import_profile(module):
+    """(wall seconds, {top-level package: cumulative µs}) for one cold import."""
+    code = f"import time; t0 = time.perf_counter(); import {module}; print(time.perf_counter() - t0)"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-3000:])
+        sys.exit(f"importing {module} failed")
+    packages = defaultdict(int)
+    block = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue  # header line
+        # Nesting is shown by indentation: depth 0 is what the profiled code imported
+        # itself (children are printed before their parent), depth 1 what `module` imported
+        depth = (len(name) - len(name.lstrip())) // 2
+        block.append((depth, name.strip(), int(cumulative_us)))
+        if depth == 0:
+            if name.strip() == module:
+                break
+            block = []  # interpreter startup (site, encodings, ...)
+    for depth, name, us in block:
+        top = name.split(".")[0]
+        if depth <= 1:
+            packages[top] += us
+        elif top in LOCAL_MODULES:
+            packages[top] = max(packages[top], us)
+    wall = float(proc.stdout.strip().splitlines()[-1])
+    return wall, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    walls, runs = [], defaultdict(list)
+    for _ in range(args.repeats):
+        wall, packages = import_profile(args.module)
+        walls.append(wall)
+        for name, us in packages.items():
+            runs[name].append(us)
+    medians = {name: statistics.median(values) / 1000 for name, values in runs.items()}
+
+    print(f"import {args.module}: {statistics.median(walls) * 1000:.0f} ms "
+          f"(median of {args.repeats}, min {min(walls) * 1000:.0f} ms)")
+    print()
+    print(f"{'package':<32} {'cumulative ms':>13}")
+    ranked = sorted(medians.items(), key=lambda item: -item[1])
+    for name, ms in ranked[:args.top]:
+        print(f"{name:<32} {ms:>13.1f}")
+    local = [(name, ms) for name, ms in ranked if name in LOCAL_MODULES and name != args.module]
+    if local:
+        print()
+        print(f"{'repo module':<32} {'cumulative ms':>13}")
+        for name, ms in local:
+            print(f"{name:<32} {ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the local vector index (vector_index.py) on synthetic summaries.
+
+    python benchmarks/bench_vector_index.py                  # 100k calls, hashing embedder
+    python benchmarks/bench_vector_index.py --calls 20000 --nprobe 16
+
+Generates call summaries drawn from a handful of topics (billing, outage,
+cancellation, ...), embeds them, trains the IVF index, then reports
+similar-call latency (IVF and exact), recall@10 of IVF against exact
+search, and the share of neighbours that share the query's topic.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vector_index import VectorIndex, create_embedder  # noqa: E402
+
+TOPICS = {
+    "billing": "refund charge invoice payment overcharged bill credit card dispute fee",
+    "outage": "internet outage router down connection slow technician modem signal",
+    "cancellation": "cancel subscription contract plan terminate leave competitor price",
+    "account": "password login account locked reset email verification access",
+    "delivery": "order delivery package late shipping tracking courier address",
+    "upgrade": "upgrade plan faster speed bundle offer discount package",
+}
+FILLER = "customer agent called about the issue and asked for help with their service today".split()
+
+
+def synthetic_rows(n, rng):
+    names = list(TOPICS)
+    for call_id in range(1, n + 1):
+        topic = rng.choice(names)
+        words = rng.choices(TOPICS[topic].split(), k=8) + rng.choices(FILLER, k=12)
+        rng.shuffle(words)
+        yield {"id": call_id, "summary": " ".join(words), "tags": [], "updated_at": str(call_id)}, topic
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--embedder", default="hashing", help="hashing, sentence-transformers or auto")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="bench_vectors_")
+    index = VectorIndex(directory, create_embedder(args.embedder), nprobe=args.nprobe)
+
+    topics, batch = {}, []
+    t0 = time.perf_counter()
+    for row, topic in synthetic_rows(args.calls, rng):
+        topics[row["id"]] = topic
+        batch.append(row)
+        if len(batch) == 1000:
+            index.upsert_many(batch)
+            batch = []
+    index.upsert_many(batch)
+    embed_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index.train()
+    train_seconds = time.perf_counter() - t0
+    stats = index.stats()
+
+    print(f"Embedder:      {stats['embedder']} ({stats['dim']} dims, int8)")
+    print(f"Embed:         {args.calls:,} calls in {embed_seconds:.1f}s ({args.calls / embed_seconds:,.0f}/s)")
+    print(f"Train:         {stats['clusters']} clusters in {train_seconds:.2f}s")
+    print(f"Index size:    {stats['size_bytes'] / 1e6:,.1f} MB")
+    print()
+
+    queries = rng.sample(range(1, args.calls + 1), min(args.queries, args.calls))
+    ivf_ms, ivf_results = [], {}
+    for call_id in queries:
+        t0 = time.perf_counter()
+        ivf_results[call_id] = index.similar(call_id, 10)
+        ivf_ms.append((time.perf_counter() - t0) * 1000)
+
+    # Exact search: score every vector (what the index does before training)
+    centroids, index._centroids = index._centroids, None
+    exact_ms, exact_results = [], {}
+    for call_id in queries:
+        t0 = time.perf_counter()
+        exact_results[call_id] = index.similar(call_id, 10)
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+    index._centroids = centroids
+
+    recall = statistics.mean(
+        len({c for c, _ in ivf_results[q]} & {c for c, _ in exact_results[q]}) / max(1, len(exact_results[q]))
+        for q in queries
+    )
+    same_topic = statistics.mean(
+        sum(topics[c] == topics[q] for c, _ in ivf_results[q]) / max(1, len(ivf_results[q])) for q in queries
+    )
+    print(f"{'query':<16} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'similar (IVF)':<16} {percentiles(ivf_ms)[0]:>8.2f} {percentiles(ivf_ms)[1]:>8.2f}")
+    print(f"{'similar (exact)':<16} {percentiles(exact_ms)[0]:>8.2f} {percentiles(exact_ms)[1]:>8.2f}")
+    print(f"recall@10 vs exact: {recall:.3f}   same-topic neighbours: {same_topic:.3f}")
+
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Persistent outbox for call notification emails.
+
+The ingest pipelines only enqueue: a row goes into a local SQLite table
+(so queued mail survives a restart) and the sender thread is woken. The
+thread owns one SMTP connection (STARTTLS + login once) and reuses it for
+every message until it has been idle for `idle_seconds` or the server
+drops it, so a slow handshake is paid once per burst instead of once per
+call, and never while a call is being saved.
+
+Digest mode batches calls into one email: a batch is sent when
+`digest_size` calls are pending or the oldest has waited `digest_seconds`,
+whichever comes first (digest_size=1, digest_seconds=0 sends each call on
+its own, as before).
+
+A failed send is retried with exponential backoff (`retry_seconds`
+doubling, capped at an hour) up to `max_attempts`, after which the rows
+are kept as "failed" for inspection. on_sent(call_ids) runs after every
+successful send; the app uses it to set `calls.email_sent`, and
+record_latency(seconds, ok, error) after every attempt.
+
+A batch is rendered once. With `separate_recipients` every recipient gets
+their own message (no shared To: list) built from the same rendered
+parts; otherwise one message is addressed to all of them. Separate
+messages are recorded per recipient as they go out (the row's
+`delivered` list), so when a later one fails the retry only mails the
+recipients that have not had it yet.
+"""
+import json
+import smtplib
+import sqlite3
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# render(calls) -> (subject, plain text, html)
+RenderEmail = Callable[[List[Dict[str, Any]]], Tuple[str, str, str]]
+
+# (row id, call id, payload, attempts, recipients already sent this row)
+OutboxRow = Tuple[int, Optional[int], Dict[str, Any], int, Set[str]]
+
+MAX_RETRY_SECONDS = 3600
+# Rows this old that were sent (or gave up) are deleted
+KEEP_SENT_SECONDS = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    call_id INTEGER,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT,
+    delivered TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox(status, next_attempt_at);
+"""
+
+
+class EmailOutbox:
+    """
+    SQLite-backed queue drained by one sender thread.
+
+    enqueue() is safe from any thread (pipelines run in threadpool workers
+    and on the event loop) and only touches the local database.
+    """
+
+    def __init__(self, path: str, render: RenderEmail, sender: Optional[str], password: Optional[str],
+                 recipients: List[str], smtp_host: str = "smtp.gmail.com", smtp_port: int = 587,
+                 digest_size: int = 1, digest_seconds: float = 0, max_attempts: int = 8,
+                 retry_seconds: float = 30, idle_seconds: float = 60, separate_recipients: bool = False,
+                 on_sent: Optional[Callable[[List[int]], None]] = None,
+                 record_latency: Optional[Callable[[float, bool, Optional[str]], None]] = None):
+        self.path = path
+        self.render = render
+        self.sender = sender
+        self.password = password
+        self.recipients = recipients
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.digest_size = max(1, digest_size)
+        self.digest_seconds = digest_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.idle_seconds = idle_seconds
+        self.separate_recipients = separate_recipients
+        self.on_sent = on_sent
+        self.record_latency = record_latency
+        self.enabled = bool(sender and password and recipients)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_used_at = 0.0
+        self.sent_messages = 0
+        self.sent_calls = 0
+        self.failures = 0
+        self.connections = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        if "delivered" not in columns:  # outbox created before per-recipient tracking
+            self.conn.execute("ALTER TABLE outbox ADD COLUMN delivered TEXT NOT NULL DEFAULT '[]'")
+        self.conn.commit()
+        # Row counts by status, kept in step with every write so the metrics
+        # scrape (on the event loop) never queries the database
+        self._row_counts = {"pending": 0, "failed": 0}
+        for status, count in self.conn.execute(
+                "SELECT status, COUNT(*) FROM outbox WHERE status IN ('pending', 'failed') GROUP BY status"):
+            self._row_counts[status] = count
+
+    # --- Queue ---
+
+    def enqueue(self, call: Dict[str, Any]) -> bool:
+        """Queue a notification for a saved call (id, filename, sentiment, tags, summary)."""
+        if not self.enabled:
+            return False
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO outbox (call_id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (call.get("id"), json.dumps(call, default=str), now, now))
+            self.conn.commit()
+            self._row_counts["pending"] += 1
+        self._wake.set()
+        return True
+
+    def _due_batch(self, now: float) -> Tuple[List[OutboxRow], float]:
+        """(rows to send now, seconds until the next batch could be due)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, call_id, payload, attempts, created_at, next_attempt_at, delivered FROM outbox "
+                "WHERE status = 'pending' ORDER BY id").fetchall()
+        ready = [r for r in rows if r[5] <= now]
+        waiting = [r[5] - now for r in rows if r[5] > now]
+        if not ready:
+            return [], min(waiting, default=self.idle_seconds)
+        oldest_wait = now - min(r[4] for r in ready)
+        if len(ready) < self.digest_size and oldest_wait < self.digest_seconds:
+            return [], min([self.digest_seconds - oldest_wait] + waiting)
+        batch = ready[:self.digest_size]
+        return [(r[0], r[1], json.loads(r[2]), r[3], set(json.loads(r[6]))) for r in batch], 0
+
+    def _mark_delivered(self, rows: List[OutboxRow], recipient: str):
+        with self._lock:
+            for row_id, _call_id, _payload, _attempts, delivered in rows:
+                delivered.add(recipient)
+                self.conn.execute("UPDATE outbox SET delivered = ? WHERE id = ?",
+                                  (json.dumps(sorted(delivered)), row_id))
+            self.conn.commit()
+
+    def _mark_sent(self, row_ids: List[int]):
+        marks = ",".join("?" * len(row_ids))
+        with self._lock:
+            sent = self.conn.execute(f"UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL "
+                                     f"WHERE id IN ({marks})", [time.time(), *row_ids]).rowcount
+            self.conn.execute("DELETE FROM outbox WHERE status = 'sent' AND created_at < ?",
+                              (time.time() - KEEP_SENT_SECONDS,))
+            expired = self.conn.execute("DELETE FROM outbox WHERE status = 'failed' AND created_at < ?",
+                                        (time.time() - KEEP_SENT_SECONDS,)).rowcount
+            self.conn.commit()
+            self._row_counts["pending"] -= sent
+            self._row_counts["failed"] -= expired
+
+    def _mark_failed(self, batch, error: str):
+        now = time.time()
+        with self._lock:
+            for row_id, _call_id, _payload, attempts, _delivered in batch:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    self.conn.execute("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                                      (attempts, error, row_id))
+                    self._row_counts["pending"] -= 1
+                    self._row_counts["failed"] += 1
+                else:
+                    delay = min(self.retry_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+                    self.conn.execute("UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                      (attempts, now + delay, error, row_id))
+            self.conn.commit()
+
+    # --- SMTP ---
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is not None and time.time() - self._smtp_used_at > self.idle_seconds:
+            self._disconnect()
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+            smtp.starttls()
+            smtp.login(self.sender, self.password)
+            self._smtp = smtp
+            self.connections += 1
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _sendmail(self, recipients: List[str], message: str):
+        try:
+            self._connection().sendmail(self.sender, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed the reused connection; one fresh attempt
+            self._smtp = None
+            self._connection().sendmail(self.sender, recipients, message)
+        self._smtp_used_at = time.time()
+
+    def _send(self, batch: List[OutboxRow]):
+        if self.separate_recipients:
+            # Each recipient only gets the rows not already sent to them
+            groups = [([r], [row for row in batch if r not in row[4]]) for r in self.recipients]
+        else:
+            groups = [(self.recipients, batch)]
+        # Rendered once per distinct set of rows (once, unless a retry left recipients uneven)
+        rendered: Dict[Tuple[int, ...], Tuple[str, List[MIMEText]]] = {}
+        for recipients, rows in groups:
+            if not rows:
+                continue
+            row_ids = tuple(row[0] for row in rows)
+            if row_ids not in rendered:
+                subject, text, html = self.render([row[2] for row in rows])
+                rendered[row_ids] = (subject, [MIMEText(text, "plain"), MIMEText(html, "html")])
+            subject, parts = rendered[row_ids]
+            msg = MIMEMultipart("alternative")
+            msg["Subject"] = subject
+            msg["From"] = self.sender
+            msg["To"] = ", ".join(recipients)
+            for part in parts:
+                msg.attach(part)
+            self._sendmail(recipients, msg.as_string())
+            if self.separate_recipients:
+                self._mark_delivered(rows, recipients[0])
+
+    # --- Sender thread ---
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop after the current send; pending rows stay queued for the next start."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                wait = self._drain_once()
+            except Exception as e:
+                print(f"[EMAIL] Outbox error: {e}")
+                wait = self.retry_seconds
+            if wait > 0:
+                if self._smtp is not None and time.time() - self._smtp_used_at > self.idle_seconds:
+                    self._disconnect()
+                self._wake.wait(min(wait, self.idle_seconds))
+                self._wake.clear()
+        self._disconnect()
+
+    def _drain_once(self) -> float:
+        """Send one due batch; returns how long to sleep before looking again (0: look now)."""
+        batch, wait = self._due_batch(time.time())
+        if not batch:
+            return wait
+        calls = [payload for _row_id, _call_id, payload, _attempts, _delivered in batch]
+        t0 = time.perf_counter()
+        try:
+            self._send(batch)
+        except Exception as e:
+            if self.record_latency:
+                self.record_latency(time.perf_counter() - t0, False, str(e))
+            self._disconnect()
+            self.failures += 1
+            print(f"[EMAIL] Send failed for {len(calls)} call(s), will retry: {e}")
+            self._mark_failed(batch, str(e))
+            return 0
+        if self.record_latency:
+            self.record_latency(time.perf_counter() - t0, True, None)
+        self._mark_sent([row_id for row_id, *_ in batch])
+        self.sent_messages += 1
+        self.sent_calls += len(calls)
+        print(f"[EMAIL] Notification for {len(calls)} call(s) sent to {', '.join(self.recipients)}")
+        call_ids = [call_id for _row_id, call_id, _payload, _attempts, _delivered in batch if call_id is not None]
+        if self.on_sent and call_ids:
+            try:
+                self.on_sent(call_ids)
+            except Exception as e:
+                print(f"[EMAIL] on_sent error: {e}")
+        return 0
+
+    def row_counts(self) -> Dict[str, int]:
+        """Pending and failed rows, without touching the database."""
+        return dict(self._row_counts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = self.conn.execute("SELECT MIN(created_at) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "sent_messages": self.sent_messages,
+            "sent_calls": self.sent_calls,
+            "send_failures": self.failures,
+            "smtp_connections": self.connections,
+            "digest_size": self.digest_size,
+            "digest_seconds": self.digest_seconds,
+        }
@@ -0,0 +1,138 @@
+"""
+Notification email rendering from Jinja2 templates (templates/email).
+
+Templates are loaded and compiled once at startup. HTML templates are
+autoescaped, so filenames, tags and summaries cannot inject markup.
+
+- call.html / call.txt: one call's block (metadata, tags, summary).
+- notification.html / notification.txt / subject.txt: the message around
+  one block, or several in digest mode.
+
+A locale may override any of them with templates/email/<locale>/<name>;
+missing overrides fall back to the default template.
+
+Rendered call blocks are cached per (call id, locale), so a call appearing
+in several digests, or a retried send, is not re-rendered and its summary
+JSON is parsed once. The message is rendered once per batch and the same
+text and HTML parts go to every recipient.
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from markupsafe import Markup
+
+EMAIL_TEMPLATE_DIR = "templates/email"
+TEMPLATES = ("call.html", "call.txt", "notification.html", "notification.txt", "subject.txt")
+
+SENTIMENT_COLORS = {
+    "positive": {"bg": "#d1fae5", "text": "#065f46"},
+    "negative": {"bg": "#fee2e2", "text": "#991b1b"},
+    "neutral": {"bg": "#e2e8f0", "text": "#475569"},
+}
+# Call fields that change how a call renders; other updates keep its cached block
+RENDERED_FIELDS = ("filename", "sentiment", "tags", "summary")
+
+
+def summary_overview(summary: Any) -> str:
+    """The overview sentence(s) of a stored summary (JSON string, dict or plain text)."""
+    if isinstance(summary, str):
+        try:
+            data = json.loads(summary)
+        except ValueError:
+            return summary
+        return data.get("overview", summary) if isinstance(data, dict) else summary
+    if isinstance(summary, dict):
+        return summary.get("overview", str(summary))
+    return str(summary)
+
+
+class EmailRenderer:
+    """render(calls) -> (subject, text, html) for the notification outbox."""
+
+    def __init__(self, directory: str = EMAIL_TEMPLATE_DIR, locale: str = "en", cache_size: int = 512):
+        self.locale = locale
+        self.cache_size = cache_size
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html"]),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=False,
+        )
+        self._templates: Dict[Tuple[str, str], Any] = {}
+        # (call id, locale) -> (text block, html block)
+        self._blocks: "OrderedDict[Tuple[Any, str], Tuple[str, Markup]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for name in TEMPLATES:
+            self._template(locale, name)
+
+    def _template(self, locale: str, name: str):
+        key = (locale, name)
+        template = self._templates.get(key)
+        if template is None:
+            try:
+                template = self.env.get_template(f"{locale}/{name}")
+            except TemplateNotFound:
+                template = self.env.get_template(name)
+            self._templates[key] = template
+        return template
+
+    def _context(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        sentiment = call.get("sentiment")
+        return {
+            "filename": call.get("filename"),
+            "sentiment": sentiment,
+            "colors": SENTIMENT_COLORS.get((sentiment or "neutral").lower(), SENTIMENT_COLORS["neutral"]),
+            "tags": call.get("tags") or [],
+            "summary_text": summary_overview(call.get("summary")),
+        }
+
+    def call_block(self, call: Dict[str, Any], locale: Optional[str] = None) -> Tuple[str, Markup]:
+        locale = locale or self.locale
+        key = (call.get("id"), locale)
+        if key[0] is not None:
+            with self._lock:
+                block = self._blocks.get(key)
+                if block is not None:
+                    self._blocks.move_to_end(key)
+                    self.hits += 1
+                    return block
+        context = self._context(call)
+        block = (self._template(locale, "call.txt").render(context).strip("\n"),
+                 Markup(self._template(locale, "call.html").render(context)))
+        with self._lock:
+            self.misses += 1
+            if key[0] is not None:
+                self._blocks[key] = block
+                while len(self._blocks) > self.cache_size:
+                    self._blocks.popitem(last=False)
+        return block
+
+    def render(self, calls: List[Dict[str, Any]], locale: Optional[str] = None) -> Tuple[str, str, str]:
+        locale = locale or self.locale
+        blocks = [self.call_block(call, locale) for call in calls]
+        context = {"calls": calls, "count": len(calls), "locale": locale}
+        subject = self._template(locale, "subject.txt").render(context).strip()
+        text = self._template(locale, "notification.txt").render(context, parts=[b[0] for b in blocks])
+        html = self._template(locale, "notification.html").render(context, parts=[b[1] for b in blocks])
+        return subject, text, html
+
+    def apply_change(self, kind: str, new_row: Optional[Dict[str, Any]] = None,
+                     old_row: Optional[Dict[str, Any]] = None):
+        """Call-change listener: drop a call's cached blocks when what they show changes."""
+        row = new_row or old_row or {}
+        if kind != "delete" and not any(field in row for field in RENDERED_FIELDS):
+            return  # e.g. email_sent being set
+        with self._lock:
+            for key in [k for k in self._blocks if k[0] == row.get("id")]:
+                del self._blocks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cached_blocks": len(self._blocks), "hits": self.hits, "misses": self.misses,
+                    "locale": self.locale}
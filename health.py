@@ -0,0 +1,231 @@
+"""
+Dependency latency tracking and readiness checks.
+
+Every call the app makes to an external service (Supabase, AssemblyAI,
+Groq, Drive, SMTP) is timed as it happens and recorded in a rolling
+window per dependency. /api/admin/dependencies reports each one's call
+count, error rate and p50 / p95 latency over that window, so a slow
+service shows up from real traffic without synthetic probes.
+
+Recording happens in one of two ways:
+- DependencyMonitor.track(name) is a context manager around a call site.
+  An exception counts as an error and is re-raised.
+- trace_calls() wraps a client object for services with many call sites.
+  Calls are timed only at "terminal" methods, e.g. a Supabase query
+  builder's execute(). The chained builder calls before it only build
+  the request, so they are not timed.
+
+Readiness (/readyz) is a separate question from liveness (/healthz): an
+instance can be alive but not ready, either because it is still starting
+up or because its worker threads or pipeline are saturated. The load
+balancer should stop routing new work to it until it recovers. Blocking
+work runs in two pools: Starlette's run_in_threadpool (anyio's limiter)
+and asyncio.to_thread (the loop's default executor, replaced by a
+TrackedExecutor so its use can be read).
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Rolling window per dependency
+WINDOW_SECONDS = 300
+MAX_SAMPLES = 2000
+# A dependency is reported "degraded" above either limit (given enough calls to judge)
+DEGRADED_ERROR_RATE = 0.2
+DEGRADED_MIN_CALLS = 5
+
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None), list, dict, tuple)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class LatencyWindow:
+    """(timestamp, seconds, ok) samples from the last `window_seconds`."""
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, max_samples: int = MAX_SAMPLES):
+        self.window_seconds = window_seconds
+        self.samples: deque = deque(maxlen=max_samples)
+        self.total = 0
+        self.total_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self.last_ok_at: Optional[float] = None
+
+    def record(self, seconds: float, ok: bool, error: Optional[str] = None):
+        now = time.time()
+        self.samples.append((now, seconds, ok))
+        self.total += 1
+        if ok:
+            self.last_ok_at = now
+        else:
+            self.total_errors += 1
+            self.last_error = error
+            self.last_error_at = now
+
+    def stats(self) -> Dict[str, Any]:
+        cutoff = time.time() - self.window_seconds
+        recent = [(seconds, ok) for ts, seconds, ok in self.samples if ts >= cutoff]
+        latencies = sorted(seconds for seconds, _ok in recent)
+        errors = sum(1 for _seconds, ok in recent if not ok)
+        error_rate = errors / len(recent) if recent else 0.0
+        p50, p95 = percentile(latencies, 0.5), percentile(latencies, 0.95)
+        return {
+            "calls": len(recent),
+            "errors": errors,
+            "error_rate": round(error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "degraded": len(recent) >= DEGRADED_MIN_CALLS and error_rate > DEGRADED_ERROR_RATE,
+            "total_calls": self.total,
+            "total_errors": self.total_errors,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "last_ok_at": self.last_ok_at,
+        }
+
+
+class DependencyMonitor:
+    """Rolling latency / error windows for named dependencies; safe from any thread."""
+
+    def __init__(self, names: Iterable[str] = (), window_seconds: float = WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._windows: Dict[str, LatencyWindow] = {name: LatencyWindow(window_seconds) for name in names}
+
+    def record(self, name: str, seconds: float, ok: bool = True, error: Optional[str] = None):
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = self._windows[name] = LatencyWindow(self.window_seconds)
+            window.record(seconds, ok, error)
+
+    def recorder(self, name: str) -> Callable[[float, bool, Optional[str]], None]:
+        return lambda seconds, ok=True, error=None: self.record(name, seconds, ok, error)
+
+    @contextmanager
+    def track(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, time.perf_counter() - t0, False, f"{type(e).__name__}: {e}")
+            raise
+        self.record(name, time.perf_counter() - t0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: window.stats() for name, window in self._windows.items()}
+
+
+class _Traced:
+    """Forwards to `target`; see trace_calls()."""
+
+    __slots__ = ("_target", "_record", "_terminal", "_attributes")
+
+    def __init__(self, target, record, terminal, attributes):
+        self._target = target
+        self._record = record
+        self._terminal = terminal
+        self._attributes = attributes
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._target, attr)
+        if not callable(value):
+            if attr in self._attributes:
+                return _Traced(value, self._record, self._terminal, self._attributes)
+            return value
+        if attr in self._terminal:
+            def timed(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    result = value(*args, **kwargs)
+                except Exception as e:
+                    self._record(time.perf_counter() - t0, False, f"{type(e).__name__}: {e}")
+                    raise
+                self._record(time.perf_counter() - t0, True, None)
+                return result
+            return timed
+
+        def chained(*args, **kwargs):
+            result = value(*args, **kwargs)
+            if isinstance(result, _PLAIN_TYPES):
+                return result
+            return _Traced(result, self._record, self._terminal, self._attributes)
+        return chained
+
+    def __repr__(self) -> str:
+        return f"traced({self._target!r})"
+
+
+def trace_calls(client: Any, record: Callable[[float, bool, Optional[str]], None],
+                terminal: Iterable[str] = ("execute",), attributes: Iterable[str] = ()) -> Any:
+    """
+    Wrap `client` so that every call to a method named in `terminal`,
+    anywhere along a call chain that starts at the client, is timed and
+    passed to record(seconds, ok, error).
+
+    - Objects returned by other method calls are wrapped in the same way.
+    - Plain values are returned unwrapped.
+    - Attributes are returned unwrapped, except those named in
+      `attributes` (e.g. `storage` on the Supabase client).
+    """
+    if client is None:
+        return None
+    return _Traced(client, record, frozenset(terminal), frozenset(attributes))
+
+
+def threadpool_usage() -> Dict[str, Any]:
+    """Worker threads in use by Starlette's run_in_threadpool (the anyio default limiter)."""
+    try:
+        import anyio.to_thread
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        return {"in_use": limiter.borrowed_tokens, "limit": limiter.total_tokens,
+                "waiting": limiter.statistics().tasks_waiting}
+    except Exception:  # no running anyio loop (e.g. called from a thread)
+        return {"in_use": None, "limit": None, "waiting": None}
+
+
+class TrackedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that counts submitted calls not yet finished (for the loop's default executor)."""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = ""):
+        # Same default size as ThreadPoolExecutor (and so as asyncio's own default executor)
+        self.limit = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        super().__init__(self.limit, thread_name_prefix)
+        self._count_lock = threading.Lock()
+        self._unfinished = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        with self._count_lock:
+            self._unfinished += 1
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future):
+        with self._count_lock:
+            self._unfinished -= 1
+
+    def usage(self) -> Dict[str, Any]:
+        """Same shape as threadpool_usage()."""
+        with self._count_lock:
+            unfinished = self._unfinished
+        return {"in_use": min(unfinished, self.limit), "limit": self.limit,
+                "waiting": max(0, unfinished - self.limit)}
+
+
+def saturated(usage: Dict[str, Any], max_share: float) -> bool:
+    """True when more than `max_share` of a pool's threads are busy (or calls are waiting)."""
+    if usage["limit"] is None:
+        return False
+    return usage["in_use"] >= usage["limit"] * max_share or bool(usage["waiting"])
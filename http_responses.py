@@ -0,0 +1,206 @@
+"""
+Response stack for the API: fast JSON encoding and on-the-fly compression.
+
+FastJSONResponse is the app's default response class. It encodes with
+orjson when installed (several times faster than the stdlib on large
+transcripts) and falls back to compact stdlib JSON otherwise.
+
+CompressionMiddleware compresses buffered responses above a size
+threshold with brotli (when the `brotli` package is installed and the
+client accepts it) or gzip. Streaming responses (the SSE notification
+stream, file downloads) pass through untouched so events are never held
+back in a compressor buffer; so do bodies that are already encoded (the
+response cache stores pre-compressed variants), partial content and
+media types that are already compressed.
+
+byte_range_response() serves a single HTTP Range of an in-memory body
+(206 Partial Content / 416), for media the browser seeks in.
+"""
+import gzip
+import json
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Never worth compressing (already compressed, or must stream unbuffered)
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "audio/", "video/", "image/", "application/zip",
+                          "application/gzip", "application/x-gzip", "font/woff")
+# Bodies at least this large are compressed in a worker thread
+THREAD_MIN_BYTES = 256 * 1024
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def negotiate_encoding(accept_encoding: Optional[str],
+                       available: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Best content coding the client accepts ("br", "gzip" or None), by
+    q-value with brotli winning ties. `available` limits the choice (the
+    response cache only has the variants it stored); by default it is
+    whatever this process can compress with.
+    """
+    if available is None:
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, 0.0)
+        if encoding in available and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+def _byte_range_spec(range_header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(first, last) digit strings of a well-formed single `bytes=` range, else None."""
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if not (first or last).isdigit() or (first and last and not last.isdigit()):
+        return None
+    if first and last and int(last) < int(first):
+        return None  # e.g. bytes=5-2: syntactically invalid
+    return first, last
+
+
+def is_byte_range(range_header: Optional[str]) -> bool:
+    """True for a Range header worth honouring (or forwarding); it may still be unsatisfiable."""
+    return _byte_range_spec(range_header) is not None
+
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single `bytes=` range, or None to send the
+    whole body (no header, another unit, several ranges, or a malformed
+    header, which RFC 9110 says to ignore). Raises ValueError only for a
+    well-formed range that cannot be satisfied.
+    """
+    spec = _byte_range_spec(range_header)
+    if spec is None:
+        return None
+    first, last = spec
+    if not first:  # suffix: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError(f"Range not satisfiable: {range_header}")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(f"Range not satisfiable: {range_header}")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def byte_range_response(body: bytes, media_type: str, range_header: Optional[str],
+                        headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    try:
+        byte_range = parse_byte_range(range_header, len(body))
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(body)}"})
+    if byte_range is None:
+        return Response(content=body, media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+    return Response(content=body[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if ("content-encoding" in headers or message["status"] in (204, 206, 304)
+                        or content_type.startswith(EXCLUDED_CONTENT_TYPES)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # held until we know whether the body is worth compressing
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streaming (sent as it is produced) or too small to benefit
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_BYTES:
+                compressed = await run_in_threadpool(compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers = MutableHeaders(raw=list(start["headers"]))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
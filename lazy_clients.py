@@ -0,0 +1,113 @@
+"""
+Lazily created service clients, for a fast cold start.
+
+Building the Supabase or Groq client imports a large dependency tree, and
+app.py used to do it at import time. A LazyClient stands in for the
+client: the factory runs on first attribute access or when warm() builds
+it in the background after the server is up, whichever comes first.
+Concurrent first users wait for the one build.
+
+The proxy keeps the module-level idioms working unchanged:
+`if not supabase:` is True when the service is unconfigured or the
+factory failed (the factory returns None or raises, as the eager setup
+used to leave the global None), and `supabase.table(...)` forwards to
+the real client.
+
+Async handlers run the truth test on the event loop, so it never waits
+for a build: until the client exists it is answered by `configured()`
+(are the credentials there at all), and a factory that then fails turns
+it False from then on. Attribute access does build; WarmClientsMiddleware
+holds HTTP requests until the builds are done, waiting in a worker
+thread, so a handler that touches a client on the event loop never builds
+it there. Health checks are exempt and answer throughout.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+_registry: List["LazyClient"] = []
+
+
+class LazyClient:
+    def __init__(self, name: str, factory: Callable[[], Any],
+                 configured: Callable[[], bool] = lambda: True):
+        self._name = name
+        self._factory = factory
+        self._configured = configured
+        self._client = None
+        self._built = False
+        self._error: Optional[str] = None
+        self._seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def get(self) -> Any:
+        """The client, built on first call; None when unavailable."""
+        if self._built:
+            return self._client
+        with self._lock:
+            if not self._built:
+                t0 = time.perf_counter()
+                try:
+                    self._client = self._factory()
+                except Exception as e:
+                    print(f"[STARTUP] {self._name} client init error: {e}")
+                    self._error = str(e)
+                self._seconds = time.perf_counter() - t0
+                self._built = True
+        return self._client
+
+    def warm(self):
+        self.get()
+
+    def __bool__(self) -> bool:
+        if self._built:
+            return self._client is not None
+        return bool(self._configured())
+
+    def __getattr__(self, attr: str) -> Any:
+        client = self.get()
+        if client is None:
+            raise AttributeError(f"{self._name} client is not available")
+        return getattr(client, attr)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self._built,
+            "available": self._client is not None,
+            "init_seconds": round(self._seconds, 3) if self._seconds is not None else None,
+            "error": self._error,
+        }
+
+
+def warm_all():
+    """Build every registered client not built yet (run off the event loop)."""
+    for client in list(_registry):
+        client.warm()
+
+
+async def wait_built():
+    """Wait, in worker threads, until every registered client is built."""
+    for client in list(_registry):
+        if not client._built:
+            await asyncio.to_thread(client.get)
+
+
+class WarmClientsMiddleware:
+    """Holds HTTP requests, except under the `exempt` path prefixes, until wait_built()."""
+
+    def __init__(self, app: ASGIApp, exempt: Iterable[str] = ()):
+        self.app = app
+        self.exempt = tuple(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and not scope["path"].startswith(self.exempt):
+            await wait_built()
+        await self.app(scope, receive, send)
+
+
+def clients_stats() -> Dict[str, Dict[str, Any]]:
+    return {client._name: client.stats() for client in _registry}
@@ -0,0 +1,193 @@
+"""
+Pipeline metrics in the Prometheus text exposition format (GET /metrics).
+
+No client library: the three metric kinds the app needs are small, and a
+scrape only renders what is already in memory.
+
+- Histogram: pipeline stage durations (download, upload, transcribe and
+  its transcribe_queue / transcribe_processing parts, analyze, translate,
+  email, db_write), in seconds.
+- Counter: retries, fallbacks, cache hits and misses.
+- Gauge: in-flight jobs, threadpool use, outbox backlog.
+
+Counters and gauges may take a callback instead of being updated: it is
+read at scrape time and returns {label tuple: value}. This lets the stats
+objects the app already keeps (response cache, email outbox) be exported
+without also counting in two places.
+
+Metric objects are module-level, like the stats dicts they sit beside:
+import the one you need and call observe() / inc() / set(). Use
+stage(name) to time a block or decorate a function (sync or async).
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PREFIX = "voxanalyze_"
+# Pipeline stages range from a DB write (ms) to transcribing a long call (minutes)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_registry: List["_Metric"] = []
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: str = "") -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _samples(self) -> List[str]:
+        values = self.callback() if self.callback else self._snapshot()
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}"
+                for key, value in sorted(values.items()) if value is not None]
+
+    def _snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = STAGE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> ([count per bucket, not cumulative], sum, count)
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._series[key] = (counts, total + value, n + 1)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+        lines = []
+        for key, (counts, total, n) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {n}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric, in the Prometheus text format (version 0.0.4)."""
+    blocks = []
+    for metric in _registry:
+        try:
+            blocks.append(metric.render())
+        except Exception as e:  # a failing callback must not break the scrape
+            blocks.append(f"# {metric.name} unavailable: {_escape(e)}")
+    return "\n".join(blocks) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Pipeline metrics ---
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Duration of each call-pipeline stage.", ("stage",))
+STAGE_ERRORS = Counter("pipeline_stage_errors_total", "Pipeline stages that raised.", ("stage",))
+RETRIES = Counter("retries_total", "Operations retried after a failure.", ("operation",))
+FALLBACKS = Counter("fallbacks_total", "Times a degraded fallback path was taken.", ("kind",))
+
+
+def observe_stage(stage_name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage_name)
+
+
+class stage:
+    """Time a pipeline stage: `with stage("upload"):` or `@stage("analyze")` (sync or async)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._t0 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.name)
+        STAGE_SECONDS.observe(time.perf_counter() - self._t0, stage=self.name)
+        return False
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(self.name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,391 @@
+"""
+Server-sent event fan-out for dashboard notifications.
+
+NotificationManager is a small pub/sub hub:
+- every SSE client is a Subscriber with a bounded ring buffer, so a stalled
+  browser can never grow server memory without limit;
+- when a buffer is full the oldest pending event is dropped, and a newer
+  event with the same coalesce key (e.g. the same job step going from
+  "active" to "complete") replaces the pending one instead of queueing;
+- subscribers may filter by topic (job:<filename>, file:<drive id>, call:<id>);
+- idle streams get heartbeat comments, and a subscriber whose buffer stays
+  full for too long is evicted (the browser's EventSource reconnects).
+
+Events travel through a pluggable backend before local fan-out, so with
+RedisBackend every uvicorn worker (and any separate pipeline process) sees
+every event. Each event gets an id; the backend keeps a short history so a
+reconnecting browser can resume from its Last-Event-ID.
+
+Events may carry an SSE event type (e.g. "call.created"); typed events are
+dispatched to addEventListener(type) in the browser, untyped ones to
+onmessage.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+# Events without explicit topics go to every subscriber
+GLOBAL_TOPIC = "global"
+
+
+def topics_for_event(payload: Dict[str, Any]):
+    """Derive routing topics and a coalesce key from a notification payload."""
+    topics = []
+    coalesce_key = None
+    if payload.get("job"):
+        topics.append(f"job:{payload['job']}")
+        if payload.get("step"):
+            coalesce_key = f"job:{payload['job']}:{payload['step']}"
+    if payload.get("file_id"):
+        topics.append(f"file:{payload['file_id']}")
+    if payload.get("call_id"):
+        topics.append(f"call:{payload['call_id']}")
+    return topics or [GLOBAL_TOPIC], coalesce_key
+
+
+class InMemoryBackend:
+    """
+    Single-process backend: events are delivered straight to this process's
+    subscribers. Also the stand-in for RedisBackend in tests and local runs.
+
+    Event ids are "<epoch>.<n>", the epoch being this process's start time:
+    a browser resuming with an id from an earlier process (before a
+    restart) gets the whole retained history rather than only the events
+    numbered above its old counter.
+    """
+    name = "memory"
+
+    def __init__(self, history_size: int = 500, history_seconds: float = 300):
+        self.history = deque(maxlen=history_size)
+        self.history_seconds = history_seconds
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._next_id = itertools.count(1)
+        self._deliver: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    async def start(self, deliver: Callable[[Dict[str, Any]], None]):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, envelope: Dict[str, Any]):
+        envelope["id"] = f"{self.epoch}.{next(self._next_id)}"
+        envelope["ts"] = time.time()
+        self.history.append(envelope)
+        if self._deliver:
+            self._deliver(envelope)
+
+    async def history_since(self, last_event_id: str) -> List[Dict[str, Any]]:
+        epoch, _, seq = str(last_event_id).partition(".")
+        last = int(seq) if epoch == self.epoch and seq.isdigit() else 0
+        cutoff = time.time() - self.history_seconds
+        return [e for e in self.history
+                if int(e["id"].partition(".")[2]) > last and e["ts"] >= cutoff]
+
+
+class RedisBackend:
+    """
+    Cross-process backend on a Redis stream: XADD publishes (trimmed to the
+    retained history), and one reader task per process XREADs new entries and
+    delivers them locally. Stream entry ids double as SSE event ids, so
+    Last-Event-ID replay is an XRANGE.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, stream: str = "voxanalyze:notifications",
+                 history_size: int = 500, history_seconds: float = 300):
+        import redis.asyncio as redis_asyncio  # optional dependency
+
+        self.redis = redis_asyncio.from_url(url)
+        self.stream = stream
+        self.history_size = history_size
+        self.history_seconds = history_seconds
+        self._reader: Optional[asyncio.Task] = None
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+        await self.redis.close()
+
+    async def publish(self, envelope: Dict[str, Any]):
+        # Delivery (including to this process) happens in _read_loop
+        await self.redis.xadd(self.stream, {"e": json.dumps(envelope)},
+                              maxlen=self.history_size, approximate=True)
+
+    def _decode(self, entry_id, fields) -> Dict[str, Any]:
+        envelope = json.loads(fields[b"e"])
+        envelope["id"] = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        return envelope
+
+    async def _read_loop(self):
+        last_id = "$"
+        while True:
+            try:
+                result = await self.redis.xread({self.stream: last_id}, block=5000, count=100)
+                for _, entries in result or []:
+                    for entry_id, fields in entries:
+                        last_id = entry_id
+                        if self._deliver:
+                            self._deliver(self._decode(entry_id, fields))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[NOTIFY] Redis read error: {e}")
+                await asyncio.sleep(1)
+
+    async def history_since(self, last_event_id: str) -> List[Dict[str, Any]]:
+        # Stream ids start with the epoch-ms they were added at
+        min_ms = int((time.time() - self.history_seconds) * 1000)
+        try:
+            last_ms = int(last_event_id.split("-", 1)[0])
+        except ValueError:
+            return []
+        start = f"({last_event_id}" if last_ms >= min_ms else f"{min_ms}-0"
+        try:
+            entries = await self.redis.xrange(self.stream, min=start, max="+")
+        except Exception as e:
+            print(f"[NOTIFY] Redis history error: {e}")
+            return []
+        return [self._decode(entry_id, fields) for entry_id, fields in entries]
+
+
+def create_backend(kind: str, redis_url: Optional[str] = None, **kwargs):
+    """Build the configured backend, falling back to in-memory if Redis is unavailable."""
+    if kind == "redis":
+        if not redis_url:
+            print("[NOTIFY] Warning: NOTIFICATION_BACKEND=redis but REDIS_URL not set. Using in-memory backend.")
+        else:
+            try:
+                backend = RedisBackend(redis_url, **kwargs)
+                print("[NOTIFY] Using Redis notification backend")
+                return backend
+            except ImportError:
+                print("[NOTIFY] Warning: 'redis' package not installed. Using in-memory backend.")
+    return InMemoryBackend(**kwargs)
+
+
+class Subscriber:
+    _ids = itertools.count(1)
+
+    def __init__(self, topics: Optional[Set[str]], max_queue: int):
+        self.id = next(self._ids)
+        # None means "everything"; otherwise global events are always included
+        self.topics = None if topics is None else set(topics) | {GLOBAL_TOPIC}
+        self.max_queue = max_queue
+        self.buffer = deque()
+        self._pending_by_key: Dict[str, list] = {}
+        self.wakeup = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.full_since = None
+        self.evicted = False
+        self.connected_at = time.time()
+
+    def wants(self, topics: Iterable[str]) -> bool:
+        return self.topics is None or any(t in self.topics for t in topics)
+
+    def offer(self, data: str, coalesce_key: Optional[str], event_id: Optional[str] = None,
+              event: Optional[str] = None):
+        """Queue an event without ever blocking the publisher."""
+        if coalesce_key is not None:
+            pending = self._pending_by_key.get(coalesce_key)
+            if pending is not None:
+                # Not delivered yet: the newer state supersedes it in place
+                pending[1] = data
+                pending[2] = event_id
+                pending[3] = event
+                self.coalesced += 1
+                self.wakeup.set()
+                return
+
+        if len(self.buffer) >= self.max_queue:
+            oldest = self.buffer.popleft()
+            key = oldest[0]
+            if key is not None and self._pending_by_key.get(key) is oldest:
+                del self._pending_by_key[key]
+            self.dropped += 1
+            if self.full_since is None:
+                self.full_since = time.monotonic()
+
+        entry = [coalesce_key, data, event_id, event]
+        self.buffer.append(entry)
+        if coalesce_key is not None:
+            self._pending_by_key[coalesce_key] = entry
+        self.wakeup.set()
+
+    def take(self):
+        """Pop every pending event (in order) as (event_id, event, data) tuples."""
+        entries = list(self.buffer)
+        self.buffer.clear()
+        self._pending_by_key.clear()
+        self.wakeup.clear()
+        self.full_since = None
+        self.delivered += len(entries)
+        return [(event_id, event, data) for _, data, event_id, event in entries]
+
+
+def format_sse(event_id: Optional[str], data: str, event: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+class NotificationManager:
+    def __init__(self, max_queue: int = 100, heartbeat_interval: float = 15.0,
+                 evict_after: float = 60.0, backend=None):
+        self.backend = backend or InMemoryBackend()
+        self._started = False
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self.evict_after = evict_after
+        self.subscribers: Dict[int, Subscriber] = {}
+        self.published = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.total_connections = 0
+
+    @property
+    def active_connections(self):
+        return list(self.subscribers.values())
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscriber:
+        sub = Subscriber(set(topics) if topics else None, self.max_queue)
+        self.subscribers[sub.id] = sub
+        self.total_connections += 1
+        print(f"[NOTIFY] Client connected. Total: {len(self.subscribers)}")
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        if self.subscribers.pop(sub.id, None) is not None:
+            self.dropped += sub.dropped
+            self.coalesced += sub.coalesced
+            print(f"[NOTIFY] Client disconnected. Total: {len(self.subscribers)}")
+
+    async def start(self):
+        """Attach to the backend (call once the event loop is running)."""
+        if not self._started:
+            await self.backend.start(self._deliver)
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            await self.backend.stop()
+            self._started = False
+
+    async def broadcast(self, message: Union[str, Dict[str, Any]], topics: Optional[Iterable[str]] = None,
+                        coalesce_key: Optional[str] = None, event: Optional[str] = None):
+        """
+        Publish an event through the backend to subscribers in every process.
+        event: optional SSE event type (delivered to addEventListener(event)).
+        """
+        if isinstance(message, dict):
+            derived_topics, derived_key = topics_for_event(message)
+            topics = topics or derived_topics
+            coalesce_key = coalesce_key or derived_key
+            message = json.dumps(message)
+        envelope = {
+            "data": message,
+            "topics": list(topics) if topics else [GLOBAL_TOPIC],
+            "coalesce_key": coalesce_key,
+            "event": event,
+        }
+        if not self._started:
+            await self.start()
+        self.published += 1
+        await self.backend.publish(envelope)
+
+    def _deliver(self, envelope: Dict[str, Any]):
+        """Fan an event out to this process's matching subscribers (never blocks)."""
+        now = time.monotonic()
+        for sub in list(self.subscribers.values()):
+            if not sub.wants(envelope["topics"]):
+                continue
+            sub.offer(envelope["data"], envelope.get("coalesce_key"), envelope.get("id"), envelope.get("event"))
+            if sub.full_since is not None and now - sub.full_since > self.evict_after:
+                self._evict(sub)
+
+    def _evict(self, sub: Subscriber):
+        sub.evicted = True
+        sub.wakeup.set()
+        self.evictions += 1
+        print(f"[NOTIFY] Evicting slow client {sub.id} ({sub.dropped} events dropped)")
+        self.unsubscribe(sub)
+
+    async def connect(self, topics: Optional[Iterable[str]] = None, is_disconnected=None,
+                      last_event_id: Optional[str] = None):
+        """
+        SSE generator for one client.
+        is_disconnected: optional coroutine function (Request.is_disconnected).
+        last_event_id: resume point sent by a reconnecting EventSource.
+        """
+        sub = self.subscribe(topics)
+        replayed = set()
+        try:
+            if last_event_id:
+                # Subscribed first, so nothing published meanwhile is missed;
+                # anything both replayed and buffered is skipped below.
+                for envelope in await self.backend.history_since(last_event_id):
+                    if sub.wants(envelope["topics"]):
+                        replayed.add(envelope["id"])
+                        yield format_sse(envelope["id"], envelope["data"], envelope.get("event"))
+                if replayed:
+                    print(f"[NOTIFY] Replayed {len(replayed)} event(s) after {last_event_id}")
+
+            while not sub.evicted:
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    # SSE comment line keeps proxies from closing the idle stream
+                    yield ": ping\n\n"
+                    continue
+
+                for event_id, event, data in sub.take():
+                    if sub.evicted:
+                        break
+                    if event_id in replayed:
+                        continue
+                    yield format_sse(event_id, data, event)
+        finally:
+            # Runs on client disconnect (cancellation / generator close) and on eviction
+            self.unsubscribe(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        subs = list(self.subscribers.values())
+        return {
+            "backend": self.backend.name,
+            "subscribers": len(subs),
+            "total_connections": self.total_connections,
+            "published": self.published,
+            "dropped": self.dropped + sum(s.dropped for s in subs),
+            "coalesced": self.coalesced + sum(s.coalesced for s in subs),
+            "evictions": self.evictions,
+            "queued": sum(len(s.buffer) for s in subs),
+            "clients": [
+                {
+                    "id": s.id,
+                    "topics": sorted(s.topics) if s.topics is not None else None,
+                    "queued": len(s.buffer),
+                    "delivered": s.delivered,
+                    "dropped": s.dropped,
+                    "coalesced": s.coalesced,
+                    "connected_seconds": round(time.time() - s.connected_at, 1),
+                }
+                for s in subs
+            ],
+        }
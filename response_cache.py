@@ -0,0 +1,217 @@
+"""
+Server-side cache for read endpoints, with ETag / If-None-Match support.
+
+Cached bodies are keyed by path + query (+ user where responses differ per
+user) and tagged ("calls", "call:42", "settings:<user>"). Writes invalidate
+tags: the call-change hook bumps "calls" and the call's own tag, settings
+saves bump the user's settings tag. A cached entry is served while its tags
+are unchanged and it is younger than its TTL, so any number of idle
+dashboards polling the same page cost no database queries; the TTL bounds
+staleness for writes this process never sees (other workers, edits made
+directly in Supabase).
+
+ETags are a hash of the body (volatile keys such as debug_timing left
+out), so a client whose copy is still current gets 304 Not Modified even
+after its entry was recomputed.
+
+Bodies above COMPRESS_MIN_BYTES are compressed once when cached (gzip,
+plus brotli when the `brotli` package is installed) and served in the
+best encoding the client accepts, so every viewer of a large transcript
+shares one compression.
+"""
+import asyncio
+import functools
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+from http_responses import dumps_json, negotiate_encoding
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Keys that change on every computation and must not change the ETag
+VOLATILE_KEYS = ("debug_timing",)
+# Sent with every cached response: browsers keep the body but revalidate each time
+CACHE_CONTROL = "private, no-cache"
+# Smaller bodies are not worth compressing (headers and framing dominate)
+COMPRESS_MIN_BYTES = 1024
+
+
+def etag_for(content: Any) -> str:
+    if isinstance(content, dict):
+        content = {k: v for k, v in content.items() if k not in VOLATILE_KEYS}
+    digest = hashlib.blake2b(dumps_json(content), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def compress_body(body: bytes) -> Dict[str, bytes]:
+    """The body in every supported encoding ("identity" always present)."""
+    variants = {"identity": body}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        variants["gzip"] = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            # Compressed once per cache fill, so spend more than the on-the-fly middleware does
+            variants["br"] = brotli.compress(body, quality=7)
+    return variants
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Weak comparison (RFC 9110): a W/ prefix added by a proxy still matches
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+class ResponseCache:
+    """
+    LRU of rendered JSON bodies with tag-based invalidation.
+
+    invalidate() may be called from worker threads (the upload pipeline
+    writes from a threadpool), so the tables are guarded by a lock.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> ({encoding: body}, etag, created_at, ttl, {tag: generation at compute time})
+        self._entries: "OrderedDict[str, Tuple[Dict[str, bytes], str, float, float, Dict[str, int]]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # key -> future of (bodies, etag) or an error Response being computed; only touched on the event loop
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _generation_of(self, tags: Iterable[str]) -> Dict[str, int]:
+        return {tag: self._generations.get(tag, 0) for tag in tags}
+
+    def _get(self, key: str, tags: Iterable[str]) -> Optional[Tuple[Dict[str, bytes], str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, etag, created_at, ttl, generations = entry
+            if time.time() - created_at > ttl or generations != self._generation_of(tags):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def _put(self, key: str, body: Dict[str, bytes], etag: str, ttl: float, generations: Dict[str, int]):
+        with self._lock:
+            # generations were read before computing: if a write landed in
+            # between, this entry is already stale and the next read recomputes
+            self._entries[key] = (body, etag, time.time(), ttl, generations)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def respond(self, request: Request, key: str, tags: Iterable[str],
+                      compute: Callable[[], Any], ttl: Optional[float] = None) -> Response:
+        """
+        Serve `key` from cache or by awaiting compute(). compute() returning
+        a Response (an error, typically) is passed through uncached, and
+        handed to requests that were waiting on the same computation.
+        """
+        tags = tuple(tags)
+        cached = self._get(key, tags)
+        if cached is not None:
+            self.hits += 1
+        # Same page requested while it is being computed: share the result,
+        # error Responses included. If that computation raised, the first
+        # waiter to wake computes again and the others wait on it instead.
+        while cached is None and key in self._inflight:
+            shared = await asyncio.shield(self._inflight[key])
+            if isinstance(shared, Response):
+                return shared
+            if shared is not None:
+                cached = shared
+                self.hits += 1
+        if cached is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            try:
+                with self._lock:
+                    generations = self._generation_of(tags)
+                content = await compute()
+                if isinstance(content, Response):
+                    future.set_result(content)
+                    return content
+                content = jsonable_encoder(content)
+                body = dumps_json(content)
+                cached = (compress_body(body), etag_for(content))
+                self._put(key, cached[0], cached[1], self.ttl if ttl is None else ttl, generations)
+                self.misses += 1
+                future.set_result(cached)
+            except BaseException:
+                if not future.done():
+                    future.set_result(None)
+                raise
+            finally:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+        variants, etag = cached
+
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), variants) or "identity"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=variants[encoding], media_type="application/json", headers=headers)
+
+    def cached(self, tags: Callable[[Dict[str, Any]], Iterable[str]], ttl: Optional[float] = None,
+               vary: Iterable[str] = ()):
+        """
+        Decorator for GET endpoints that declare a `request: Request`
+        parameter. tags(kwargs) names what invalidates the response; `vary`
+        lists endpoint arguments (e.g. "user_id") that are part of the key
+        besides the path and query string.
+        """
+        vary = tuple(vary)
+
+        def decorate(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                request: Request = kwargs["request"]
+                query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+                key = "|".join([request.url.path, query] + [f"{name}={kwargs.get(name)}" for name in vary])
+                return await self.respond(request, key, tags(kwargs),
+                                          lambda: endpoint(*args, **kwargs), ttl)
+            return wrapper
+        return decorate
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,540 @@
+"""
+Local full-text search index over calls (SQLite FTS5).
+
+The Supabase `calls` table stays the source of truth. This index mirrors the
+searchable text (filename, summary, transcript) plus the filterable columns
+so /api/calls can filter and rank across the whole history without scanning
+PostgREST. It is kept current through the call-change hook and re-synced
+against the database at startup.
+
+Diarized utterances are indexed individually as well, so a query can
+return the exact moments (call, utterance, start time, speaker) where
+something was said.
+
+    python search_index.py --rebuild    # re-index every call from Supabase
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from analytics import parse_timestamp
+
+# Columns the index needs from a `calls` row
+SEARCH_COLUMNS = ("id, filename, sentiment, tags, summary, transcript, diarization_data, "
+                  "duration, created_at, speaker_count, email_sent")
+
+# Bump when the schema changes; older index files are re-indexed from scratch
+SCHEMA_VERSION = 2
+# Utterance rowids are call_id * UTTERANCE_STRIDE + utterance index, so one
+# call's utterances form a contiguous rowid range (cheap delete/reindex)
+UTTERANCE_STRIDE = 100000
+
+# Unlikely-in-text markers around matches; replaced with <mark> after escaping
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls_meta (
+    id INTEGER PRIMARY KEY,
+    filename TEXT,
+    sentiment TEXT,
+    tags TEXT,
+    summary TEXT,
+    summary_excerpt TEXT,
+    duration INTEGER,
+    created_at TEXT,
+    speaker_count INTEGER,
+    email_sent INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_meta_created ON calls_meta(created_at);
+CREATE INDEX IF NOT EXISTS calls_meta_sentiment ON calls_meta(sentiment, id);
+CREATE INDEX IF NOT EXISTS calls_meta_duration ON calls_meta(duration);
+CREATE TABLE IF NOT EXISTS call_tags (
+    tag TEXT NOT NULL,
+    call_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, call_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS call_tags_call ON call_tags(call_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5(
+    filename, summary, transcript,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    text, speaker UNINDEXED, start_ms UNINDEXED, end_ms UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2',
+    prefix = '3'
+);
+"""
+
+
+def summary_text(summary: Any) -> str:
+    """Plain text of a stored summary (structured JSON or plain text)."""
+    if not summary:
+        return ""
+    data = summary
+    if isinstance(summary, str):
+        if not summary.lstrip().startswith("{"):
+            return summary
+        try:
+            data = json.loads(summary)
+        except ValueError:
+            return summary
+
+    parts = []
+
+    def walk(value):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(data)
+    return "\n".join(parts)
+
+
+def summary_excerpt(summary: Any, length: int = 160) -> str:
+    """Short plain-text preview of a stored summary (the overview when structured)."""
+    if not summary:
+        return ""
+    text = summary
+    if isinstance(summary, str) and summary.lstrip().startswith("{"):
+        try:
+            text = json.loads(summary).get("overview") or summary
+        except (ValueError, AttributeError):
+            pass
+    elif isinstance(summary, dict):
+        text = summary.get("overview") or summary_text(summary)
+    text = " ".join(str(text).split())
+    return text if len(text) <= length else text[:length].rsplit(" ", 1)[0] + "…"
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query (users never hit FTS syntax
+    errors): every word must match, the last one as a prefix so results
+    keep up while typing.
+    """
+    words = ["".join(ch for ch in word if ch.isalnum() or ch in "'-_") for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    # Shorter prefixes expand to too many terms; the 3-char prefix index covers the rest
+    if len(words[-1]) >= 3:
+        terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+def phrase_query(text: str) -> Optional[str]:
+    """
+    FTS5 query for utterance search: "quoted words" match as a phrase, a
+    trailing * makes a word a prefix, and every part must match.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase:
+            words = ["".join(ch for ch in w if ch.isalnum() or ch in "'-_") for w in phrase.split()]
+            words = [w for w in words if w]
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+        else:
+            prefix = word.endswith("*")
+            word = "".join(ch for ch in word if ch.isalnum() or ch in "'-_")
+            if word:
+                parts.append(f'"{word}"' + ("*" if prefix else ""))
+    return " AND ".join(parts) or None
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    return parse_timestamp(value).isoformat() if value else None
+
+
+class CallSearchIndex:
+    """
+    SQLite FTS5 mirror of the calls table.
+
+    Matches are ranked with bm25 (filename weighted above summary above
+    transcript) and returned with an HTML-escaped snippet in which hits are
+    wrapped in <mark>. One connection is shared behind a lock; writes come
+    from threadpool workers as well as the event loop.
+    """
+
+    def __init__(self, path: str, count_cap: int = 10000):
+        self.path = path
+        self.count_cap = count_cap
+        self._lock = threading.Lock()
+        self.ready = False
+        self.available = True
+        try:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            self.conn.executescript(SCHEMA)
+            if version < SCHEMA_VERSION:
+                # Older index: forget what was indexed so the next sync re-reads every call
+                self.conn.execute("DELETE FROM calls_meta")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.execute("INSERT INTO calls_fts(calls_fts, rank) VALUES('rank', 'bm25(4.0, 2.0, 1.0)')")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            # e.g. an SQLite build without FTS5; callers fall back to PostgREST filters
+            print(f"[SEARCH] Index unavailable: {e}")
+            self.available = False
+
+    # --- Writes ---
+
+    def _write(self, cur: sqlite3.Cursor, row: Dict[str, Any]):
+        call_id = row["id"]
+        tags = row.get("tags") or []
+        cur.execute(
+            "INSERT OR REPLACE INTO calls_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                call_id,
+                row.get("filename"),
+                (row.get("sentiment") or "neutral").lower(),
+                json.dumps(tags),
+                row.get("summary"),
+                summary_excerpt(row.get("summary")),
+                row.get("duration"),
+                _timestamp(row.get("created_at")),
+                row.get("speaker_count"),
+                None if row.get("email_sent") is None else int(bool(row.get("email_sent"))),
+                row.get("updated_at"),
+            ),
+        )
+        cur.execute("DELETE FROM call_tags WHERE call_id = ?", (call_id,))
+        cur.executemany("INSERT OR IGNORE INTO call_tags VALUES (?, ?)",
+                        [(str(t).lower(), call_id) for t in tags])
+        cur.execute("DELETE FROM calls_fts WHERE rowid = ?", (call_id,))
+        cur.execute("INSERT INTO calls_fts(rowid, filename, summary, transcript) VALUES (?, ?, ?, ?)",
+                    (call_id, row.get("filename") or "", summary_text(row.get("summary")), row.get("transcript") or ""))
+        if "diarization_data" in row:
+            self._write_utterances(cur, call_id, row.get("diarization_data") or [])
+
+    def _write_utterances(self, cur: sqlite3.Cursor, call_id: int, utterances: List[Dict[str, Any]]):
+        base = call_id * UTTERANCE_STRIDE
+        cur.execute("DELETE FROM utterances_fts WHERE rowid BETWEEN ? AND ?", (base, base + UTTERANCE_STRIDE - 1))
+        cur.executemany(
+            "INSERT INTO utterances_fts(rowid, text, speaker, start_ms, end_ms) VALUES (?, ?, ?, ?, ?)",
+            [
+                (base + i, u.get("text") or "", u.get("display_name") or u.get("speaker") or "",
+                 u.get("start"), u.get("end"))
+                for i, u in enumerate(utterances[:UTTERANCE_STRIDE])
+                if isinstance(u, dict) and u.get("text")
+            ],
+        )
+
+    def _stored(self, cur: sqlite3.Cursor, call_id: int) -> Optional[Dict[str, Any]]:
+        meta = cur.execute("SELECT * FROM calls_meta WHERE id = ?", (call_id,)).fetchone()
+        if not meta:
+            return None
+        row = dict(zip([d[0] for d in cur.description], meta))
+        row["tags"] = json.loads(row["tags"] or "[]")
+        text = cur.execute("SELECT transcript FROM calls_fts WHERE rowid = ?", (call_id,)).fetchone()
+        row["transcript"] = text[0] if text else ""
+        return row
+
+    def upsert_many(self, rows: Iterable[Dict[str, Any]]):
+        if not self.available:
+            return
+        with self._lock:
+            cur = self.conn.cursor()
+            for row in rows:
+                self._write(cur, row)
+            self.conn.commit()
+
+    def delete_many(self, call_ids: Iterable[int]):
+        if not self.available:
+            return
+        ids = [(i,) for i in call_ids]
+        with self._lock:
+            self.conn.executemany("DELETE FROM calls_meta WHERE id = ?", ids)
+            self.conn.executemany("DELETE FROM call_tags WHERE call_id = ?", ids)
+            self.conn.executemany("DELETE FROM calls_fts WHERE rowid = ?", ids)
+            self.conn.executemany(
+                "DELETE FROM utterances_fts WHERE rowid BETWEEN ? AND ?",
+                [(i * UTTERANCE_STRIDE, (i + 1) * UTTERANCE_STRIDE - 1) for (i,) in ids],
+            )
+            self.conn.commit()
+
+    def apply_change(self, kind: str, new_row: Optional[Dict[str, Any]] = None,
+                     old_row: Optional[Dict[str, Any]] = None):
+        """Call-change listener: partial update rows are merged with what is indexed."""
+        if not self.available:
+            return
+        if kind == "delete" and old_row:
+            self.delete_many([old_row["id"]])
+        elif kind in ("insert", "update") and new_row and new_row.get("id") is not None:
+            with self._lock:
+                cur = self.conn.cursor()
+                stored = self._stored(cur, new_row["id"]) or {}
+                self._write(cur, {**(old_row or {}), **stored, **new_row})
+                self.conn.commit()
+
+    # --- Sync ---
+
+    def max_id(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM calls_meta").fetchone()[0]
+
+    def sync(self, fetch_after: Callable[[int, int], List[Dict[str, Any]]],
+             fetch_versions: Callable[[], Dict[int, Optional[str]]],
+             fetch_by_ids: Callable[[List[int]], List[Dict[str, Any]]],
+             page_size: int = 200) -> Tuple[int, int]:
+        """
+        Bring the index in line with the database.
+        fetch_after(after_id, limit): full rows with id > after_id (new calls).
+        fetch_versions(): {id: updated_at} for every call (ids only scan).
+        fetch_by_ids(ids): full rows for calls re-analysed since indexing.
+        Returns (rows indexed, rows removed).
+        """
+        if not self.available:
+            return 0, 0
+        indexed = 0
+        after_id = self.max_id()
+        while True:
+            rows = fetch_after(after_id, page_size)
+            self.upsert_many(rows)
+            indexed += len(rows)
+            if len(rows) < page_size:
+                break
+            after_id = rows[-1]["id"]
+
+        # Snapshot the index first: a call inserted (via apply_change) while the
+        # ids are being paged is missing from versions but also from local
+        with self._lock:
+            local = dict(self.conn.execute("SELECT id, updated_at FROM calls_meta").fetchall())
+        versions = fetch_versions()
+        removed = [call_id for call_id in local if call_id not in versions]
+        self.delete_many(removed)
+
+        stale = [call_id for call_id, updated in versions.items()
+                 if call_id in local and updated and updated != local[call_id]]
+        for i in range(0, len(stale), page_size):
+            rows = fetch_by_ids(stale[i:i + page_size])
+            self.upsert_many(rows)
+            indexed += len(rows)
+
+        self.ready = True
+        return indexed, len(removed)
+
+    # --- Queries ---
+
+    def search(self, q: Optional[str] = None, sentiments: Optional[List[str]] = None,
+               tags: Optional[List[str]] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, min_duration: Optional[int] = None,
+               max_duration: Optional[int] = None, speakers: Optional[int] = None,
+               limit: int = 20, offset: int = 0, before_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Filter (and, with q, rank) calls. Without q results are newest first
+        and page with before_id; ranked results page with offset.
+        Returns {"calls", "total", "total_is_estimate", "has_more"}; totals
+        are capped at count_cap.
+        """
+        where, params = [], []
+        if sentiments:
+            where.append(f"m.sentiment IN ({','.join('?' * len(sentiments))})")
+            params += [s.lower() for s in sentiments]
+        if tags:
+            where.append(f"m.id IN (SELECT call_id FROM call_tags WHERE tag IN ({','.join('?' * len(tags))}))")
+            params += [t.lower() for t in tags]
+        if date_from:
+            where.append("m.created_at >= ?")
+            params.append(_timestamp(date_from))
+        if date_to:
+            where.append("m.created_at <= ?")
+            params.append(_timestamp(date_to))
+        if min_duration is not None:
+            where.append("m.duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            where.append("m.duration <= ?")
+            params.append(max_duration)
+        if speakers is not None:
+            where.append("m.speaker_count = ?")
+            params.append(speakers)
+
+        match = fts_query(q) if q else None
+        columns = ("m.id, m.filename, m.sentiment, m.tags, m.summary, m.summary_excerpt, "
+                   "m.duration, m.created_at, m.speaker_count, m.email_sent")
+        if match:
+            # CROSS JOIN pins the join order: drive from the FTS matches, never
+            # re-run MATCH per filtered calls_meta row
+            source = "calls_fts f CROSS JOIN calls_meta m ON m.id = f.rowid"
+            where.insert(0, "calls_fts MATCH ?")
+            params.insert(0, match)
+            select = f"{columns}, f.rank AS score"
+            order = "ORDER BY f.rank"
+        else:
+            source = "calls_meta m"
+            select = f"{columns}, NULL AS score"
+            order = "ORDER BY m.id DESC"
+
+        filter_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        page_where = list(where)
+        page_params = list(params)
+        if before_id is not None and not match:
+            page_where.append("m.id < ?")
+            page_params.append(before_id)
+        page_sql = f"WHERE {' AND '.join(page_where)}" if page_where else ""
+
+        with self._lock:
+            cur = self.conn.execute(
+                f"SELECT {select} FROM {source} {page_sql} {order} LIMIT ? OFFSET ?",
+                page_params + [limit + 1, offset if match else 0],
+            )
+            names = [d[0] for d in cur.description]
+            rows = [dict(zip(names, r)) for r in cur.fetchall()]
+            # Counting every match of a very common term costs more than the page itself
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {source} {filter_sql} LIMIT ?)",
+                params + [self.count_cap + 1],
+            ).fetchone()[0]
+            # Snippets only for the returned page (computing them in the ranked
+            # query would build one for every match)
+            for row in rows[:limit]:
+                row["snippet"] = None
+                if match:
+                    hit = self.conn.execute(
+                        f"SELECT snippet(calls_fts, -1, '{_HIT_START}', '{_HIT_END}', '…', 16) "
+                        "FROM calls_fts WHERE calls_fts MATCH ? AND rowid = ?",
+                        (match, row["id"]),
+                    ).fetchone()
+                    row["snippet"] = hit[0] if hit else None
+
+        calls = []
+        for row in rows[:limit]:
+            row["tags"] = json.loads(row["tags"] or "[]")
+            row["sentiment"] = (row["sentiment"] or "neutral").capitalize()
+            if row["email_sent"] is not None:
+                row["email_sent"] = bool(row["email_sent"])
+            if row["snippet"]:
+                row["snippet"] = (html.escape(row["snippet"])
+                                  .replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+            else:
+                del row["snippet"]
+            if row["score"] is None:
+                del row["score"]
+            else:
+                row["score"] = round(-row["score"], 4)  # bm25: lower is better
+            calls.append(row)
+        return {"calls": calls, "total": min(total, self.count_cap),
+                "total_is_estimate": total > self.count_cap, "has_more": len(rows) > limit}
+
+    def search_utterances(self, q: str, speaker: Optional[str] = None, call_id: Optional[int] = None,
+                          limit: int = 50, offset: int = 0, order: str = "recent") -> Dict[str, Any]:
+        """
+        Utterance-level hits: call, utterance index, start/end (ms), speaker
+        and a highlighted snippet. speaker is a case-insensitive substring of
+        the speaker label.
+
+        order="recent" (newest call first, later utterances first) streams
+        matches straight off the index, so its cost does not grow with the
+        number of matches; order="relevance" ranks every match with bm25.
+        """
+        match = phrase_query(q)
+        if not match:
+            return {"hits": [], "has_more": False}
+        where, params = ["utterances_fts MATCH ?"], [match]
+        if call_id is not None:
+            where.append("u.rowid BETWEEN ? AND ?")
+            params += [call_id * UTTERANCE_STRIDE, (call_id + 1) * UTTERANCE_STRIDE - 1]
+        if speaker:
+            where.append("u.speaker LIKE ?")
+            params.append(f"%{speaker}%")
+        # rowid order is the index's own order, so LIMIT stops after one page
+        order_by = "u.rank" if order == "relevance" else "u.rowid DESC"
+
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT u.rowid, u.speaker, u.start_ms, u.end_ms, u.rank, "
+                f"highlight(utterances_fts, 0, '{_HIT_START}', '{_HIT_END}'), m.filename "
+                "FROM utterances_fts u LEFT JOIN calls_meta m ON m.id = u.rowid / ? "
+                f"WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                [UTTERANCE_STRIDE] + params + [limit + 1, offset],
+            ).fetchall()
+
+        hits = []
+        for rowid, speaker_label, start_ms, end_ms, rank, text, filename in rows[:limit]:
+            hits.append({
+                "call_id": rowid // UTTERANCE_STRIDE,
+                "filename": filename,
+                "utterance_index": rowid % UTTERANCE_STRIDE,
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "speaker": speaker_label,
+                "snippet": html.escape(text).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"),
+                "score": round(-rank, 4),
+            })
+        return {"hits": hits, "has_more": len(rows) > limit}
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.available:
+            return {"available": False}
+        with self._lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM calls_meta").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"available": True, "ready": self.ready, "calls": count, "size_bytes": size}
+
+    def rebuild(self, fetch_after: Callable[[int, int], List[Dict[str, Any]]], page_size: int = 200) -> int:
+        """Drop everything and index every call again (e.g. after a bulk import)."""
+        if not self.available:
+            return 0
+        with self._lock:
+            for table in ("calls_meta", "call_tags", "calls_fts", "utterances_fts"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.commit()
+        indexed, after_id = 0, 0
+        while True:
+            rows = fetch_after(after_id, page_size)
+            self.upsert_many(rows)
+            indexed += len(rows)
+            if len(rows) < page_size:
+                break
+            after_id = rows[-1]["id"]
+        with self._lock:
+            self.conn.execute("INSERT INTO calls_fts(calls_fts) VALUES('optimize')")
+            self.conn.execute("INSERT INTO utterances_fts(utterances_fts) VALUES('optimize')")
+            self.conn.commit()
+        self.ready = True
+        return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local call search index")
+    parser.add_argument("--rebuild", action="store_true", help="re-index every call from Supabase")
+    parser.add_argument("--path", default=os.environ.get("SEARCH_INDEX_PATH", "search_index.db"))
+    args = parser.parse_args()
+
+    index = CallSearchIndex(args.path)
+    if args.rebuild:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+        def fetch_after(after_id, limit):
+            return (supabase.table('calls').select(SEARCH_COLUMNS + ", updated_at")
+                    .gt('id', after_id).order('id').limit(limit).execute().data or [])
+
+        t_start = time.time()
+        indexed = index.rebuild(fetch_after)
+        print(f"[SEARCH] Rebuilt index with {indexed} calls in {time.time() - t_start:.1f}s")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -20,22 +20,29 @@ let allCalls = [];
 let currentSearchTerm = '';
 let sentimentChart = null;
 let categoriesChart = null;
-let currentOffset = 0;
+let nextCursor = null; // Opaque keyset cursor from /api/calls
 const PAGE_SIZE = 20;
+// The table only needs a summary excerpt; the full summary is fetched when opened
+const CALL_LIST_FIELDS = 'id,filename,sentiment,tags,summary_excerpt,duration,created_at,speaker_count,email_sent';
 let hasMoreCalls = true;
 let totalCallsCount = 0;
 let globalStats = null;
+const DEFAULT_FILTER_SENTIMENTS = ['positive', 'neutral', 'negative'];
+const DEFAULT_FILTER_TAGS = ['Support', 'Billing', 'Technical Issue', 'Churn Risk', 'Sales', 'Feedback', 'Complaint'];
 let currentFilters = {
-    sentiments: ['positive', 'neutral', 'negative'],
+    sentiments: [...DEFAULT_FILTER_SENTIMENTS],
     dateFrom: null,
     dateTo: null,
-    tags: ['Support', 'Billing', 'Technical Issue', 'Churn Risk', 'Sales', 'Feedback', 'Complaint']
+    tags: [...DEFAULT_FILTER_TAGS]
 };
+let searchDebounceTimer = null;
 
 class NotificationService {
     constructor() {
         this.container = document.getElementById('vapi-notification-container');
         this.eventSource = null;
+        this.connected = false; // While true, call changes arrive as events and polling is paused
+        this.lostConnection = false;
         this.init();
     }
 
@@ -54,12 +61,45 @@ class NotificationService {
             }
         };
 
+        // Typed events carry call row deltas and fresh stats (see push_call_change in app.py)
+        ['call.created', 'call.updated', 'call.deleted', 'stats.changed'].forEach(type => {
+            this.eventSource.addEventListener(type, (event) => this.handleCallEvent(type, event));
+        });
+
+        this.eventSource.onopen = () => {
+            const reconnected = this.lostConnection;
+            this.connected = true;
+            this.lostConnection = false;
+            if (autoRefreshTimerObj.id) {
+                clearTimeout(autoRefreshTimerObj.id);
+                autoRefreshTimerObj.id = null;
+            }
+            // Changes older than the server's replay window may have been missed
+            if (reconnected && typeof fetchCalls === 'function') fetchCalls(false, true);
+        };
+
         this.eventSource.onerror = (err) => {
             console.warn('[NOTIFY] Connection lost. Retrying...', err);
-            // EventSource auto-reconnects, but we log it.
+            // EventSource auto-reconnects; poll until it does
+            this.connected = false;
+            this.lostConnection = true;
+            if (!autoRefreshTimerObj.id && typeof scheduleAutoRefresh === 'function') scheduleAutoRefresh();
         };
     }
 
+    handleCallEvent(type, event) {
+        try {
+            const data = JSON.parse(event.data);
+            if (type === 'stats.changed') {
+                applyStatsEvent(data.stats);
+            } else {
+                applyCallEvent(type, data.call);
+            }
+        } catch (e) {
+            console.error(`[NOTIFY] Error applying ${type} event:`, e);
+        }
+    }
+
     handleNotification(data) {
         console.log('[NOTIFY] Received:', data);
 
@@ -109,24 +149,8 @@ class NotificationService {
                 this.showToast(config.title, data.message, toastType, config.icon);
             }
 
-            // Auto-refresh dashboard when save completes (before 'done' step)
-            // This ensures faster UI update
-            if (data.step === 'save' && data.status === 'complete') {
-                console.log('[NOTIFY] Save complete. Triggering dashboard refresh...');
-                setTimeout(async () => {
-                    try {
-                        if (typeof fetchCalls === 'function') {
-                            await fetchCalls(false, true); // Force refresh
-                        }
-                        if (typeof initializeSentimentChart === 'function') {
-                            initializeSentimentChart();
-                        }
-                        console.log('[NOTIFY] Dashboard refreshed successfully!');
-                    } catch (error) {
-                        console.error('[NOTIFY] Error refreshing dashboard:', error);
-                    }
-                }, 500); // Small delay to ensure DB transaction is committed
-            }
+            // No refresh needed when the save completes: the new row arrives
+            // as a call.created event (see applyCallEvent)
 
             // Show final success message when completely done
             if (data.step === 'done' && data.status === 'success') {
@@ -307,13 +331,13 @@ function initializeFilterModal() {
     if (resetBtn) {
         resetBtn.addEventListener('click', () => {
             currentFilters = {
-                sentiments: ['positive', 'neutral', 'negative'],
+                sentiments: [...DEFAULT_FILTER_SENTIMENTS],
                 dateFrom: null,
                 dateTo: null,
-                tags: ['Support', 'Billing', 'Technical Issue', 'Churn Risk', 'Sales', 'Feedback', 'Complaint']
+                tags: [...DEFAULT_FILTER_TAGS]
             };
             syncFilterUI();
-            applyFilters();
+            fetchCalls(false, true);
             closeModal();
         });
     }
@@ -331,7 +355,8 @@ function initializeFilterModal() {
             currentFilters.dateFrom = document.getElementById('filter-date-from').value || null;
             currentFilters.dateTo = document.getElementById('filter-date-to').value || null;
 
-            applyFilters();
+            // Filters run server-side across all calls, not just the loaded page
+            fetchCalls(false, true);
             closeModal();
         });
     }
@@ -1201,7 +1226,7 @@ const MIN_FETCH_INTERVAL = 20000; // 20 seconds in milliseconds
 async function fetchStats() {
     try {
         console.log('[API CHECK] Fetching call statistics...');
-        const response = await fetch('/api/call-stats');
+        const response = await fetch('/api/call-stats', { cache: 'no-cache' });
 
         if (response.ok) {
             const result = await response.json();
@@ -1218,6 +1243,32 @@ async function fetchStats() {
     }
 }
 
+// Server-side filter/search parameters for /api/calls (only those that narrow the list)
+function appendCallFilterParams(params) {
+    if (currentSearchTerm) params.set('q', currentSearchTerm);
+
+    const sentiments = currentFilters.sentiments;
+    if (sentiments.length < DEFAULT_FILTER_SENTIMENTS.length) {
+        params.set('sentiment', sentiments.length ? sentiments.join(',') : 'none');
+    }
+
+    const tags = currentFilters.tags;
+    const allTags = DEFAULT_FILTER_TAGS.every(tag => tags.includes(tag));
+    if (tags.length > 0 && !allTags) params.set('tags', tags.join(','));
+
+    // Date inputs are local calendar days; send the local day bounds as UTC instants
+    if (currentFilters.dateFrom) {
+        const fromDate = new Date(currentFilters.dateFrom);
+        fromDate.setHours(0, 0, 0, 0);
+        params.set('date_from', fromDate.toISOString());
+    }
+    if (currentFilters.dateTo) {
+        const toDate = new Date(currentFilters.dateTo);
+        toDate.setHours(23, 59, 59, 999);
+        params.set('date_to', toDate.toISOString());
+    }
+}
+
 async function fetchCalls(append = false, force = false) {
     // Throttle API calls to prevent excessive requests
     const now = Date.now();
@@ -1234,7 +1285,7 @@ async function fetchCalls(append = false, force = false) {
     const loadMoreSpinner = document.getElementById('load-more-spinner');
 
     if (!append) {
-        currentOffset = 0;
+        nextCursor = null;
         hasMoreCalls = true;
         if (allCalls.length === 0 && loadingState) loadingState.style.display = 'flex';
 
@@ -1248,7 +1299,11 @@ async function fetchCalls(append = false, force = false) {
     if (emptyState) emptyState.style.display = 'none';
 
     try {
-        const response = await fetch(`/api/calls?offset=${currentOffset}&limit=${PAGE_SIZE}&_t=${Date.now()}`);
+        const params = new URLSearchParams({ limit: PAGE_SIZE, fields: CALL_LIST_FIELDS });
+        appendCallFilterParams(params);
+        if (append && nextCursor) params.set('cursor', nextCursor);
+        // Revalidate with the stored ETag: an unchanged page comes back as a bodiless 304
+        const response = await fetch(`/api/calls?${params}`, { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to fetch calls');
 
         // Update last fetch time on successful response
@@ -1267,7 +1322,8 @@ async function fetchCalls(append = false, force = false) {
             totalCallsCount = Math.max(totalCallsCount, result.length);
         } else if (result && typeof result === 'object') {
             calls = result.calls || [];
-            totalCallsCount = result.total || 0;
+            // Ranked search pages after the first may omit the total
+            if (result.total !== null && result.total !== undefined) totalCallsCount = result.total;
             // Note: Stats are now fetched separately via fetchStats()
         }
 
@@ -1277,12 +1333,13 @@ async function fetchCalls(append = false, force = false) {
             allCalls = Array.isArray(calls) ? calls : [];
         }
 
-        if (allCalls.length >= totalCallsCount) {
+        if (result && typeof result === 'object' && 'has_more' in result) {
+            hasMoreCalls = result.has_more;
+            nextCursor = result.next_cursor || null;
+        } else if (allCalls.length >= totalCallsCount) {
             hasMoreCalls = false;
         }
 
-        currentOffset = allCalls.length;
-
         if (loadingState) loadingState.style.display = 'none';
         if (loadMoreSpinner) loadMoreSpinner.style.display = 'none';
 
@@ -1301,16 +1358,7 @@ async function fetchCalls(append = false, force = false) {
             }
 
             // Handle Auto-Refresh (only on initial load or reset)
-            if (!append) {
-                if (autoRefreshTimerObj.id) clearTimeout(autoRefreshTimerObj.id);
-
-                const settings = loadSettings();
-                const refreshInterval = parseInt(settings.autoRefresh) || 60;
-
-                if (refreshInterval > 0) {
-                    autoRefreshTimerObj.id = setTimeout(() => fetchCalls(false), refreshInterval * 1000);
-                }
-            }
+            if (!append) scheduleAutoRefresh();
 
             applyFilters();
             initializeCategoriesChart(globalStats ? globalStats.tag_counts : allCalls);
@@ -1337,13 +1385,79 @@ async function fetchCalls(append = false, force = false) {
         if (loadMoreSpinner) loadMoreSpinner.style.display = 'none';
 
         // Retry auto-refresh even on error after delay
-        if (!append) {
-            if (autoRefreshTimerObj.id) clearTimeout(autoRefreshTimerObj.id);
-            autoRefreshTimerObj.id = setTimeout(() => fetchCalls(false), 60000);
-        }
+        if (!append) scheduleAutoRefresh(60000);
+    }
+}
+
+// Poll /api/calls only while the live update stream is down
+function scheduleAutoRefresh(delayMs) {
+    if (autoRefreshTimerObj.id) clearTimeout(autoRefreshTimerObj.id);
+    autoRefreshTimerObj.id = null;
+    if (window.notificationService && window.notificationService.connected) return;
+
+    const settings = loadSettings();
+    const refreshInterval = parseInt(settings.autoRefresh) || 60;
+    if (refreshInterval > 0) {
+        autoRefreshTimerObj.id = setTimeout(() => fetchCalls(false), delayMs || refreshInterval * 1000);
     }
 }
 
+function hasServerFilters() {
+    const params = new URLSearchParams();
+    appendCallFilterParams(params);
+    return [...params.keys()].length > 0;
+}
+
+function updateCallCountDisplay() {
+    const badge = document.getElementById('call-count-badge');
+    if (badge) badge.textContent = totalCallsCount;
+    const totalCardEl = document.getElementById('total-calls');
+    if (totalCardEl) totalCardEl.textContent = totalCallsCount;
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    if (loadMoreBtn && hasMoreCalls) {
+        loadMoreBtn.innerHTML = `<i class="fa-solid fa-chevron-down"></i> Load More (${allCalls.length}/${totalCallsCount})`;
+    }
+}
+
+// Apply a pushed call.created / call.updated / call.deleted delta to the loaded list
+function applyCallEvent(type, call) {
+    if (!call || call.id === undefined) return;
+    const index = allCalls.findIndex(c => c.id === call.id);
+    const filtered = hasServerFilters();
+
+    if (type === 'call.created') {
+        // A filtered or searched list can't tell locally whether the new call matches
+        if (index !== -1 || filtered) return;
+        allCalls = [call, ...allCalls];
+        totalCallsCount += 1;
+    } else if (type === 'call.updated') {
+        if (index === -1) return;
+        allCalls[index] = { ...allCalls[index], ...call };
+    } else if (type === 'call.deleted') {
+        if (index === -1) return;
+        allCalls.splice(index, 1);
+        totalCallsCount = Math.max(0, totalCallsCount - 1);
+    }
+
+    const emptyState = document.getElementById('empty-state');
+    const tableContainer = document.querySelector('.table-container');
+    if (emptyState) emptyState.style.display = allCalls.length === 0 ? 'flex' : 'none';
+    if (tableContainer) tableContainer.style.display = allCalls.length === 0 ? 'none' : 'block';
+    applyFilters();
+    updateCallCountDisplay();
+}
+
+function applyStatsEvent(stats) {
+    if (!stats) return;
+    globalStats = stats;
+    // The filtered total comes from /api/calls, not the all-time stats
+    if (!hasServerFilters() && typeof stats.total_calls === 'number') totalCallsCount = stats.total_calls;
+    updateStats(globalStats);
+    initializeCategoriesChart(globalStats.tag_counts);
+    initializeSentimentChart();
+    updateCallCountDisplay();
+}
+
 // ============================================
 // Render Table
 // ============================================
@@ -1439,6 +1553,7 @@ function renderTable(callsInput) {
                 <div style="display: flex; align-items: center; gap: 8px;">
                     <span class="filename-cell" title="${escapeHtml(call.filename || 'Unknown')}" onclick="showFilenamePopup('${escapeHtml(call.filename || 'Unknown').replace(/'/g, "\\'")}', event)">${escapeHtml(call.filename || 'Unknown')}</span>
                 </div>
+                ${call.snippet ? `<div class="search-snippet">${call.snippet}</div>` : ''}
             </td>
             <td>${dateStr}</td>
             <td>
@@ -2040,10 +2155,11 @@ function initializeSentimentChart() {
 // ============================================
 // Modal Functions
 // ============================================
+let currentModalCallId = null;
+
 window.openModal = async function (callId) {
     const modal = document.getElementById('transcript-modal');
     const modalFilename = document.getElementById('modal-filename');
-    const modalText = document.getElementById('modal-text');
     const modalDate = document.getElementById('modal-date');
     const modalSentiment = document.getElementById('modal-sentiment');
     const modalTags = document.getElementById('modal-tags');
@@ -2071,8 +2187,11 @@ window.openModal = async function (callId) {
         modalFilename.title = call.filename || 'Unknown';
     }
 
-    // Lazy Load: Check if we have transcript/diarization. If not, fetch it.
-    if (!call.transcript && !call.diarization_data) {
+    currentModalCallId = callId;
+
+    // Lazy Load: list rows are light; fetch the header + summary, the first
+    // diarization page and the audio reference in parallel, then stream the rest
+    if (call.diarization_data === undefined) {
         console.log(`[MODAL] Fetching details for call ${callId}...`);
 
         // Show Loading Overlay
@@ -2127,14 +2246,28 @@ window.openModal = async function (callId) {
         loader.style.display = 'flex';
 
         try {
-            const response = await fetch(`/api/calls/${callId}`);
-            if (response.ok) {
-                const fullData = await response.json();
-                // Merge full data into the existing call object (updates cache)
-                Object.assign(call, fullData);
+            const [headerRes, diarizationRes, audioRes] = await Promise.all([
+                fetch(`/api/calls/${callId}?include=summary`),
+                fetch(`/api/calls/${callId}/diarization?offset=0&limit=${DIARIZATION_PAGE_SIZE}`),
+                fetch(`/api/calls/${callId}/audio-ref`),
+            ]);
+            if (headerRes.ok && diarizationRes.ok) {
+                const { parts, ...header } = await headerRes.json();
+                const page = await diarizationRes.json();
+                // Merge into the existing call object (updates cache)
+                Object.assign(call, header);
+                call.diarization_data = page.utterances || [];
+                call.diarizationPending = Boolean(page.has_more);
+                call.diarizationNext = page.next;
+                if (audioRes.ok) call.audio_url = (await audioRes.json()).url;
+                if (call.diarization_data.length === 0) {
+                    // No diarization: the plain transcript is the only text there is
+                    const transcriptRes = await fetch(parts.transcript);
+                    if (transcriptRes.ok) call.transcript = (await transcriptRes.json()).transcript;
+                }
                 console.log('[MODAL] Details loaded successfully.');
             } else {
-                console.error('[MODAL] Failed to load details:', response.status);
+                console.error('[MODAL] Failed to load details:', headerRes.status, diarizationRes.status);
                 showToast('Failed to load call details', 'error');
             }
         } catch (e) {
@@ -2153,117 +2286,8 @@ window.openModal = async function (callId) {
     }
 
     // Populate transcript with diarization if available
-    if (modalText) {
-        const diarizationData = call.diarization_data || [];
-        const speakerCount = call.speaker_count || 0;
-
-        // Debug: Log what data we have
-        console.log('[DIARIZATION DEBUG] call.diarization_data:', call.diarization_data);
-        console.log('[DIARIZATION DEBUG] call.speaker_count:', call.speaker_count);
-        console.log('[DIARIZATION DEBUG] diarizationData length:', diarizationData.length);
-
-        // Try to get speaker identification from summary if available
-        let detectedSpeakers = {};
-        try {
-            const sData = typeof call.summary === 'string' ? JSON.parse(call.summary) : call.summary;
-            let speakersData = sData.detected_speakers || {};
-            if (sData.summary && sData.summary.detected_speakers) {
-                speakersData = sData.summary.detected_speakers;
-            }
-
-            // Handle both array and object formats
-            if (Array.isArray(speakersData)) {
-                // Convert array ['Paula Heberling', 'Agent'] to object {'Speaker 1': 'Paula Heberling', 'Speaker 2': 'Agent'}
-                speakersData.forEach((name, index) => {
-                    if (name && name.trim()) {
-                        detectedSpeakers[`Speaker ${index + 1}`] = name.trim();
-                    }
-                });
-            } else if (typeof speakersData === 'object') {
-                // Already in correct format
-                detectedSpeakers = speakersData;
-            }
-        } catch (e) {
-            console.error('[SPEAKER DETECTION] Error parsing speakers:', e);
-        }
-
-        // Show speaker count badge next to filename
-        const speakerBadge = document.getElementById('speaker-badge-display');
-        const speakerCountText = document.getElementById('speaker-count-text');
-
-        if (speakerBadge && speakerCount > 0) {
-            speakerCountText.textContent = `${speakerCount} Speaker${speakerCount > 1 ? 's' : ''}`;
-            speakerBadge.style.display = 'inline-flex';
-        } else if (speakerBadge) {
-            speakerBadge.style.display = 'none';
-        }
-
-        if (diarizationData.length > 0) {
-            // Build speaker-labeled transcript
-            let transcriptHtml = '';
-
-            transcriptHtml += '<div class="diarized-transcript">';
-
-            // Create a map to convert A, B, C... to Speaker 1, Speaker 2, Speaker 3...
-            const speakerMap = {};
-            let speakerIndex = 1;
-
-            diarizationData.forEach((utterance, idx) => {
-                const originalSpeaker = utterance.speaker || 'Unknown';
-
-                // Simple logic: Use display_name if manually edited, otherwise use detected name, otherwise use Speaker N
-                let displaySpeaker;
-                if (utterance.display_name) {
-                    // User has manually edited this speaker's name
-                    displaySpeaker = utterance.display_name;
-                } else {
-                    // First time seeing this speaker - assign Speaker N
-                    if (!speakerMap[originalSpeaker]) {
-                        speakerMap[originalSpeaker] = `Speaker ${speakerIndex}`;
-                        speakerIndex++;
-                    }
-                    const mappedSpeaker = speakerMap[originalSpeaker];
-
-                    // Check if LLM detected a name for this speaker
-                    const detectedName = detectedSpeakers[mappedSpeaker];
-                    if (detectedName && typeof detectedName === 'string') {
-                        // Extract only the name part (before any comma)
-                        displaySpeaker = detectedName.split(',')[0].trim();
-                    } else {
-                        // No detected name, use Speaker N
-                        displaySpeaker = mappedSpeaker;
-                    }
-                }
-
-                const timestamp = formatTimestamp(utterance.start);
-                const speakerClass = getSpeakerClass(originalSpeaker);
-                const startTimeMs = utterance.start || 0;
-
-                transcriptHtml += `
-                    <div class="utterance-line" data-index="${idx}">
-                        <span class="utterance-timestamp clickable-timestamp" data-time="${startTimeMs}" title="Click to jump to this point">[${timestamp}]</span>
-                        <span class="speaker-label ${speakerClass}" contenteditable="true" data-original="${escapeHtml(originalSpeaker)}">${escapeHtml(displaySpeaker)}</span>
-                        <span class="utterance-text" contenteditable="true" dir="auto">${escapeHtml(utterance.text)}</span>
-                    </div>
-                `;
-            });
-
-            transcriptHtml += '</div>';
-            modalText.innerHTML = transcriptHtml;
-
-            // Setup speaker name auto-update listeners with save functionality
-            setupSpeakerEditListeners(call.id, diarizationData);
-
-            // Setup transcript text edit listeners with save functionality
-            setupTranscriptTextEditListeners(call.id, diarizationData);
-
-            // Setup timestamp click listeners to seek audio
-            setupTimestampClickListeners();
-        } else {
-            // Fallback to plain transcript
-            modalText.innerHTML = `<p dir="auto">${escapeHtml(call.transcript || 'No transcript available')}</p>`;
-        }
-    }
+    renderModalTranscript(call, !call.diarizationPending);
+    if (call.diarizationPending) loadRemainingDiarization(call);
 
     // Populate summary
     if (modalSummary) {
@@ -2436,14 +2460,17 @@ window.openModal = async function (callId) {
     // Setup audio player
     if (modalAudio) {
         if (call.audio_url) {
+            modalAudio.preload = 'metadata';
             modalAudio.src = call.audio_url;
             modalAudio.style.display = 'block';
+            loadWaveform(callId);
             if (audioStatus) {
                 audioStatus.innerHTML = '<i class="fa-solid fa-headphones"></i> Listen to Call';
             }
         } else {
             modalAudio.src = '';
             modalAudio.style.display = 'none';
+            loadWaveform(null);
             if (audioStatus) {
                 audioStatus.innerHTML = '<i class="fa-solid fa-volume-xmark"></i> Audio not available';
                 audioStatus.style.color = 'var(--text-muted)';
@@ -2742,6 +2769,249 @@ window.openModal = async function (callId) {
     setupTranslationButton(call);
 };
 
+// Render the transcript tab of the call modal. `complete` is false while later
+// diarization pages are still loading (shown read-only until then).
+function renderModalTranscript(call, complete = true) {
+    const modalText = document.getElementById('modal-text');
+    if (modalText) {
+        const diarizationData = call.diarization_data || [];
+        const speakerCount = call.speaker_count || 0;
+
+        // Debug: Log what data we have
+        console.log('[DIARIZATION DEBUG] call.diarization_data:', call.diarization_data);
+        console.log('[DIARIZATION DEBUG] call.speaker_count:', call.speaker_count);
+        console.log('[DIARIZATION DEBUG] diarizationData length:', diarizationData.length);
+
+        // Try to get speaker identification from summary if available
+        let detectedSpeakers = {};
+        try {
+            const sData = typeof call.summary === 'string' ? JSON.parse(call.summary) : call.summary;
+            let speakersData = sData.detected_speakers || {};
+            if (sData.summary && sData.summary.detected_speakers) {
+                speakersData = sData.summary.detected_speakers;
+            }
+
+            // Handle both array and object formats
+            if (Array.isArray(speakersData)) {
+                // Convert array ['Paula Heberling', 'Agent'] to object {'Speaker 1': 'Paula Heberling', 'Speaker 2': 'Agent'}
+                speakersData.forEach((name, index) => {
+                    if (name && name.trim()) {
+                        detectedSpeakers[`Speaker ${index + 1}`] = name.trim();
+                    }
+                });
+            } else if (typeof speakersData === 'object') {
+                // Already in correct format
+                detectedSpeakers = speakersData;
+            }
+        } catch (e) {
+            console.error('[SPEAKER DETECTION] Error parsing speakers:', e);
+        }
+
+        // Show speaker count badge next to filename
+        const speakerBadge = document.getElementById('speaker-badge-display');
+        const speakerCountText = document.getElementById('speaker-count-text');
+
+        if (speakerBadge && speakerCount > 0) {
+            speakerCountText.textContent = `${speakerCount} Speaker${speakerCount > 1 ? 's' : ''}`;
+            speakerBadge.style.display = 'inline-flex';
+        } else if (speakerBadge) {
+            speakerBadge.style.display = 'none';
+        }
+
+        if (diarizationData.length > 0) {
+            const editable = complete ? 'true' : 'false';
+            // Build speaker-labeled transcript
+            let transcriptHtml = '';
+
+            transcriptHtml += '<div class="diarized-transcript">';
+
+            // Create a map to convert A, B, C... to Speaker 1, Speaker 2, Speaker 3...
+            const speakerMap = {};
+            let speakerIndex = 1;
+
+            diarizationData.forEach((utterance, idx) => {
+                const originalSpeaker = utterance.speaker || 'Unknown';
+
+                // Simple logic: Use display_name if manually edited, otherwise use detected name, otherwise use Speaker N
+                let displaySpeaker;
+                if (utterance.display_name) {
+                    // User has manually edited this speaker's name
+                    displaySpeaker = utterance.display_name;
+                } else {
+                    // First time seeing this speaker - assign Speaker N
+                    if (!speakerMap[originalSpeaker]) {
+                        speakerMap[originalSpeaker] = `Speaker ${speakerIndex}`;
+                        speakerIndex++;
+                    }
+                    const mappedSpeaker = speakerMap[originalSpeaker];
+
+                    // Check if LLM detected a name for this speaker
+                    const detectedName = detectedSpeakers[mappedSpeaker];
+                    if (detectedName && typeof detectedName === 'string') {
+                        // Extract only the name part (before any comma)
+                        displaySpeaker = detectedName.split(',')[0].trim();
+                    } else {
+                        // No detected name, use Speaker N
+                        displaySpeaker = mappedSpeaker;
+                    }
+                }
+
+                const timestamp = formatTimestamp(utterance.start);
+                const speakerClass = getSpeakerClass(originalSpeaker);
+                const startTimeMs = utterance.start || 0;
+
+                transcriptHtml += `
+                    <div class="utterance-line" data-index="${idx}">
+                        <span class="utterance-timestamp clickable-timestamp" data-time="${startTimeMs}" title="Click to jump to this point">[${timestamp}]</span>
+                        <span class="speaker-label ${speakerClass}" contenteditable="${editable}" data-original="${escapeHtml(originalSpeaker)}">${escapeHtml(displaySpeaker)}</span>
+                        <span class="utterance-text" contenteditable="${editable}" dir="auto">${escapeHtml(utterance.text)}</span>
+                    </div>
+                `;
+            });
+
+            transcriptHtml += '</div>';
+            if (!complete) {
+                transcriptHtml += '<p class="transcript-loading"><i class="fa-solid fa-spinner fa-spin"></i> Loading the rest of the transcript…</p>';
+            }
+            modalText.innerHTML = transcriptHtml;
+
+            // Edits save the whole utterance list, so wait until every page is loaded
+            if (!complete) return;
+
+            // Setup speaker name auto-update listeners with save functionality
+            setupSpeakerEditListeners(call.id, diarizationData);
+
+            // Setup transcript text edit listeners with save functionality
+            setupTranscriptTextEditListeners(call.id, diarizationData);
+
+            // Setup timestamp click listeners to seek audio
+            setupTimestampClickListeners();
+        } else {
+            // Fallback to plain transcript
+            modalText.innerHTML = `<p dir="auto">${escapeHtml(call.transcript || 'No transcript available')}</p>`;
+        }
+    }
+}
+
+const DIARIZATION_PAGE_SIZE = 200;
+
+// Fetch the remaining diarization pages of a call in the background, then
+// re-render its transcript (editable) if the modal still shows that call
+async function loadRemainingDiarization(call) {
+    const callId = call.id;
+    try {
+        let next = call.diarizationNext;
+        while (next) {
+            const response = await fetch(next);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const page = await response.json();
+            call.diarization_data = call.diarization_data.concat(page.utterances || []);
+            next = page.next;
+        }
+        call.diarizationPending = false;
+        delete call.diarizationNext;
+        const modal = document.getElementById('transcript-modal');
+        if (modal && modal.style.display !== 'none' && currentModalCallId === callId) {
+            renderModalTranscript(call, true);
+        }
+    } catch (e) {
+        console.error('[MODAL] Error loading transcript pages:', e);
+        showToast('Could not load the full transcript', 'error');
+    }
+}
+
+// Waveform peaks from /api/calls/{id}/waveform: a 16-byte little-endian header
+// (magic "VXPK", version, reserved, ms per peak, duration ms, count), then int8 peaks
+const WAVEFORM_HEADER_BYTES = 16;
+let modalWaveform = null;
+
+function parseWaveform(buffer) {
+    if (buffer.byteLength < WAVEFORM_HEADER_BYTES) return null;
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'VXPK') return null;
+    const view = new DataView(buffer);
+    const count = Math.min(view.getUint32(12, true), buffer.byteLength - WAVEFORM_HEADER_BYTES);
+    return {
+        msPerPeak: view.getUint16(6, true),
+        durationMs: view.getUint32(8, true),
+        peaks: new Int8Array(buffer, WAVEFORM_HEADER_BYTES, count),
+    };
+}
+
+function drawWaveform() {
+    const canvas = document.getElementById('modal-waveform');
+    if (!canvas || !modalWaveform) return;
+    const audio = document.getElementById('modal-audio');
+    const ratio = window.devicePixelRatio || 1;
+    const width = Math.round(canvas.clientWidth * ratio);
+    const height = Math.round(canvas.clientHeight * ratio);
+    if (!width || !height) return;
+    if (canvas.width !== width || canvas.height !== height) {
+        canvas.width = width;
+        canvas.height = height;
+    }
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, width, height);
+
+    const { peaks, durationMs } = modalWaveform;
+    const played = audio && durationMs ? (audio.currentTime * 1000) / durationMs : 0;
+    const step = 3 * ratio;
+    const bars = Math.max(1, Math.floor(width / step));
+    const perBar = peaks.length / bars;
+    for (let i = 0; i < bars; i++) {
+        let peak = 0;
+        const end = Math.max(Math.floor((i + 1) * perBar), Math.floor(i * perBar) + 1);
+        for (let j = Math.floor(i * perBar); j < end && j < peaks.length; j++) {
+            if (peaks[j] > peak) peak = peaks[j];
+        }
+        const barHeight = Math.max(ratio, (peak / 127) * height);
+        ctx.fillStyle = i / bars < played ? '#6366f1' : 'rgba(99, 102, 241, 0.3)';
+        ctx.fillRect(i * step, (height - barHeight) / 2, 2 * ratio, barHeight);
+    }
+}
+
+function setupWaveformListeners() {
+    const canvas = document.getElementById('modal-waveform');
+    const audio = document.getElementById('modal-audio');
+    if (!canvas || !audio || canvas.dataset.bound) return;
+    canvas.dataset.bound = 'true';
+
+    // Click to seek: the audio endpoint serves byte ranges, so only that part is fetched
+    canvas.addEventListener('click', (e) => {
+        if (!modalWaveform || !audio.src) return;
+        const rect = canvas.getBoundingClientRect();
+        const fraction = Math.min(1, Math.max(0, (e.clientX - rect.left) / rect.width));
+        audio.currentTime = (fraction * modalWaveform.durationMs) / 1000;
+        if (audio.paused) {
+            audio.play().catch(err => console.log('Audio playback failed:', err));
+        }
+        drawWaveform();
+    });
+    audio.addEventListener('timeupdate', drawWaveform);
+    audio.addEventListener('seeked', drawWaveform);
+    window.addEventListener('resize', drawWaveform);
+}
+
+async function loadWaveform(callId) {
+    const canvas = document.getElementById('modal-waveform');
+    modalWaveform = null;
+    if (!canvas) return;
+    canvas.style.display = 'none';
+    if (callId == null) return;
+    setupWaveformListeners();
+    try {
+        const response = await fetch(`/api/calls/${callId}/waveform`);
+        if (!response.ok || currentModalCallId !== callId) return;
+        const waveform = parseWaveform(await response.arrayBuffer());
+        if (!waveform || currentModalCallId !== callId) return;
+        modalWaveform = waveform;
+        canvas.style.display = 'block';
+        drawWaveform();
+    } catch (e) {
+        console.warn('[MODAL] Waveform unavailable:', e);
+    }
+}
+
 // Setup translation button handler
 function setupTranslationButton(call) {
     const translateBtn = document.getElementById('translate-btn');
@@ -3749,13 +4019,26 @@ window.addEventListener('load', () => {
 
 let currentSummaryCallId = null;
 
-function openSummaryModal(callId) {
+async function openSummaryModal(callId) {
     const call = allCalls.find(c => c.id === callId);
     if (!call) {
         showToast('Call not found', 'error');
         return;
     }
 
+    // List rows carry only summary_excerpt; load the full summary on first open
+    if (call.summary === undefined) {
+        try {
+            const response = await fetch(`/api/calls/${callId}/summary`);
+            if (response.ok) {
+                const details = await response.json();
+                call.summary = details.summary || null;
+            }
+        } catch (e) {
+            console.error('Failed to load call summary', e);
+        }
+    }
+
     currentSummaryCallId = callId;
 
     // Update modal content
@@ -4987,7 +5270,9 @@ function setupSearchListener() {
 
         searchInput.addEventListener('input', (e) => {
             currentSearchTerm = e.target.value.trim().toLowerCase();
-            applyFilters();
+            // Search runs server-side over every call; wait for typing to pause
+            if (searchDebounceTimer) clearTimeout(searchDebounceTimer);
+            searchDebounceTimer = setTimeout(() => fetchCalls(false, true), 300);
         });
     }
 }
@@ -4998,47 +5283,9 @@ function applyFilters() {
         allCalls = [];
     }
 
-    let filtered = allCalls.filter(call => {
-        // Search Filter
-        if (currentSearchTerm) {
-            const matchesSearch = (call.filename && call.filename.toLowerCase().includes(currentSearchTerm)) ||
-                (call.transcript && call.transcript.toLowerCase().includes(currentSearchTerm)) ||
-                (call.summary && call.summary.toLowerCase().includes(currentSearchTerm)) ||
-                (call.tags && Array.isArray(call.tags) && call.tags.some(t => t.toLowerCase().includes(currentSearchTerm)));
-
-            if (!matchesSearch) return false;
-        }
-
-        // Sentiment Filter
-        const sentiment = (call.sentiment || 'neutral').toLowerCase();
-        if (!currentFilters.sentiments.includes(sentiment)) return false;
-
-        // Tags Filter
-        if (currentFilters.tags.length > 0) {
-            const callTags = call.tags || [];
-            if (callTags.length > 0) {
-                const hasMatchingTag = callTags.some(tag => currentFilters.tags.includes(tag));
-                if (!hasMatchingTag) return false;
-            }
-        }
-
-        // Date Filter
-        if (call.created_at) {
-            const callDate = new Date(call.created_at);
-            if (currentFilters.dateFrom) {
-                const fromDate = new Date(currentFilters.dateFrom);
-                fromDate.setHours(0, 0, 0, 0);
-                if (callDate < fromDate) return false;
-            }
-            if (currentFilters.dateTo) {
-                const toDate = new Date(currentFilters.dateTo);
-                toDate.setHours(23, 59, 59, 999);
-                if (callDate > toDate) return false;
-            }
-        }
-
-        return true;
-    });
+    // Search and filters are applied by /api/calls (see appendCallFilterParams),
+    // so allCalls already holds only matching calls, in result order
+    const filtered = allCalls;
 
     renderTable(filtered);
 }
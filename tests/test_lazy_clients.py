@@ -0,0 +1,90 @@
+"""
+LazyClient truth tests and WarmClientsMiddleware against a factory that
+blocks until released, standing in for a slow Supabase / Groq import.
+"""
+import asyncio
+import threading
+import types
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from lazy_clients import LazyClient, WarmClientsMiddleware, warm_all
+
+
+def slow_client(name, configured=lambda: True, result=types.SimpleNamespace(value=42)):
+    """(client, release, entered): the factory blocks in `entered` until `release` is set."""
+    release, entered = threading.Event(), threading.Event()
+
+    def factory():
+        entered.set()
+        release.wait(5)
+        return result
+
+    return LazyClient(name, factory, configured), release, entered
+
+
+def build_app(client):
+    app = FastAPI()
+    app.add_middleware(WarmClientsMiddleware, exempt=("/healthz",))
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/value")
+    async def value():
+        if not client:
+            return JSONResponse(status_code=503, content={"error": "unavailable"})
+        return {"value": client.value}
+
+    return app
+
+
+def test_truth_test_does_not_wait_for_build():
+    client, release, entered = slow_client("truth")
+    warmer = threading.Thread(target=warm_all)
+    warmer.start()
+    try:
+        assert entered.wait(5)
+        assert client  # answered from configuration while the factory runs
+        assert not client.stats()["built"]
+    finally:
+        release.set()
+        warmer.join()
+    assert client.value == 42
+
+
+def test_unconfigured_and_failed_clients_are_falsy():
+    unconfigured = LazyClient("unconfigured", lambda: None, lambda: False)
+    assert not unconfigured
+    failed = LazyClient("failed", lambda: None)
+    assert failed  # configured: not known to fail until built
+    failed.warm()
+    assert not failed
+
+
+def test_healthz_answers_while_client_builds():
+    client, release, entered = slow_client("healthz")
+    app = build_app(client)
+    warmer = threading.Thread(target=warm_all)
+    warmer.start()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            assert await asyncio.to_thread(entered.wait, 5)
+            pending = asyncio.create_task(http.get("/value"))
+            health = await asyncio.wait_for(http.get("/healthz"), timeout=2)
+            assert health.status_code == 200
+            assert not pending.done()  # held until the client is built
+            release.set()
+            response = await asyncio.wait_for(pending, timeout=5)
+            assert response.json() == {"value": 42}
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        warmer.join()
@@ -0,0 +1,180 @@
+"""
+Sharded transcription (transcription.py) against a stubbed backend.
+
+The stub behaves like a real job over one shard: it only hears its own
+window, reports times relative to the shard start (with a little jitter),
+and names speakers by order of appearance, so labels disagree between
+shards. ffmpeg is replaced by in-memory decode / encode.
+"""
+import random
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import transcription
+from transcription import ShardedTranscriber, plan_shards, speaker_label, stitch_shards
+
+# Low rate keeps an hour of synthetic audio small; planning only looks at frame energy
+SAMPLE_RATE = 1000
+JITTER_MS = 40
+SHARD_SECONDS = 10 * 60
+OVERLAP_SECONDS = 20
+
+
+def synthetic_call(seconds, speakers, rng):
+    """(int16 samples, utterances in ms) for a call of `seconds` with `speakers` people."""
+    utterances, t, i = [], 1000.0, 0
+    while True:
+        duration = rng.uniform(1500, 12000)
+        if t + duration > seconds * 1000 - 1000:
+            break
+        speaker = rng.randrange(speakers) if rng.random() < 0.3 else i % speakers
+        utterances.append({"speaker": speaker, "text": f"utterance {i}", "start": int(t), "end": int(t + duration)})
+        t += duration + (rng.uniform(4000, 9000) if rng.random() < 0.05 else rng.uniform(300, 1500))
+        i += 1
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    signal = np_rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001
+    for u in utterances:
+        lo, hi = u["start"] * SAMPLE_RATE // 1000, u["end"] * SAMPLE_RATE // 1000
+        signal[lo:hi] = np_rng.standard_normal(hi - lo) * 0.2
+    return (signal * 32767).clip(-32768, 32767).astype(np.int16), utterances
+
+
+def stub_transcribe(start_ms, end_ms, truth, rng):
+    """What a transcription job over just [start_ms, end_ms) of the call would return."""
+    heard, labels = [], {}
+    for u in truth:
+        start, end = max(u["start"], start_ms), min(u["end"], end_ms)
+        if end - start < 200:
+            continue
+        local = labels.setdefault(u["speaker"], speaker_label(len(labels)))
+        heard.append({
+            "speaker": local, "text": u["text"],
+            "start": int(start - start_ms + rng.randint(-JITTER_MS, JITTER_MS)),
+            "end": int(end - start_ms + rng.randint(-JITTER_MS, JITTER_MS)),
+        })
+    text = " ".join(u["text"] for u in heard)
+    return text, (end_ms - start_ms) / 1000, heard, len(labels), "en"
+
+
+@pytest.fixture(params=range(4))
+def call(request):
+    samples, truth = synthetic_call(3600, 3, random.Random(request.param))
+    return request.param, samples, truth
+
+
+def stitched(samples, truth, seed):
+    shards = plan_shards(samples, SAMPLE_RATE, SHARD_SECONDS, OVERLAP_SECONDS)
+    results = [stub_transcribe(s.start_ms, s.end_ms, truth, random.Random(seed * 1000 + s.index)) for s in shards]
+    return shards, stitch_shards(shards, results)
+
+
+def test_plan_shards_cuts_in_silence(call):
+    _seed, samples, truth = call
+    shards = plan_shards(samples, SAMPLE_RATE, SHARD_SECONDS, OVERLAP_SECONDS)
+    assert len(shards) == 6
+    assert shards[0].own_start_ms == 0 and shards[-1].own_end_ms == len(samples) * 1000 / SAMPLE_RATE
+    for left, right in zip(shards, shards[1:]):
+        assert left.own_end_ms == right.own_start_ms
+        assert left.end_ms - left.own_end_ms == pytest.approx(OVERLAP_SECONDS * 1000)
+        cut = left.own_end_ms
+        assert not any(u["start"] < cut < u["end"] for u in truth), f"cut at {cut} ms splits an utterance"
+
+
+def test_single_shard_for_short_audio():
+    samples, _truth = synthetic_call(SHARD_SECONDS * 1.2, 2, random.Random(0))
+    assert len(plan_shards(samples, SAMPLE_RATE, SHARD_SECONDS, OVERLAP_SECONDS)) == 1
+
+
+def test_every_utterance_once_in_order(call):
+    seed, samples, truth = call
+    _shards, (text, _duration, utterances, _count, _language) = stitched(samples, truth, seed)
+    assert [u["text"] for u in utterances] == [u["text"] for u in truth]
+    assert text == " ".join(u["text"] for u in truth)
+    for got, want in zip(utterances, truth):
+        assert abs(got["start"] - want["start"]) <= JITTER_MS
+        assert abs(got["end"] - want["end"]) <= JITTER_MS
+
+
+def test_speaker_labels_reconciled(call):
+    seed, samples, truth = call
+    _shards, (_text, _duration, utterances, speaker_count, _language) = stitched(samples, truth, seed)
+    labels = {}
+    for got, want in zip(utterances, truth):
+        labels.setdefault(want["speaker"], set()).add(got["speaker"])
+    assert all(len(l) == 1 for l in labels.values()), f"speakers split across labels: {labels}"
+    assert len({l.pop() for l in labels.values()}) == len(labels) == speaker_count
+
+
+def sharded_run(monkeypatch, samples, truth, seed):
+    """ShardedTranscriber.transcribe over `samples`, shards finishing in a seed-dependent order."""
+    windows = {}
+    monkeypatch.setattr(transcription, "decode_pcm", lambda path, sample_rate: samples)
+    monkeypatch.setattr(transcription, "encode_pcm",
+                        lambda part, dst, sample_rate, bitrate: windows.__setitem__(dst, part))
+    delays = random.Random(seed)
+    order, lock = [], threading.Lock()
+
+    def transcribe(path, language_code=None, speakers_expected=None):
+        index = int(path.rsplit(".shard", 1)[1].split(".")[0])
+        shard = plan_shards(samples, SAMPLE_RATE, SHARD_SECONDS, OVERLAP_SECONDS)[index]
+        assert len(windows[path]) == pytest.approx((shard.end_ms - shard.start_ms) * SAMPLE_RATE / 1000, abs=1)
+        time.sleep(delays.uniform(0, 0.05))
+        with lock:
+            order.append(index)
+        return stub_transcribe(shard.start_ms, shard.end_ms, truth, random.Random(index))
+
+    transcriber = ShardedTranscriber(transcribe, SHARD_SECONDS, OVERLAP_SECONDS, max_workers=6,
+                                     sample_rate=SAMPLE_RATE)
+    return transcriber.transcribe("call.ogg"), order
+
+
+def test_result_independent_of_finish_order(monkeypatch):
+    samples, truth = synthetic_call(3600, 3, random.Random(7))
+    runs = [sharded_run(monkeypatch, samples, truth, seed) for seed in range(4)]
+    assert len({tuple(order) for _result, order in runs}) > 1, "shards always finished in the same order"
+    first = runs[0][0]
+    assert all(result == first for result, _order in runs)
+    assert [u["text"] for u in first[2]] == [u["text"] for u in truth]
+
+
+def test_failed_shard_falls_back_to_one_job(monkeypatch):
+    samples, _truth = synthetic_call(3600, 2, random.Random(1))
+    monkeypatch.setattr(transcription, "decode_pcm", lambda path, sample_rate: samples)
+    monkeypatch.setattr(transcription, "encode_pcm", lambda *args: None)
+    calls = []
+
+    def transcribe(path, language_code=None, speakers_expected=None):
+        calls.append(path)
+        if path.endswith(".shard2.ogg"):
+            return "Error: upload failed", 0, [], 0, "en"
+        return "whole call", 3600, [{"speaker": "A", "text": "whole call", "start": 0, "end": 1}], 1, "en"
+
+    transcriber = ShardedTranscriber(transcribe, SHARD_SECONDS, OVERLAP_SECONDS, sample_rate=SAMPLE_RATE)
+    assert transcriber.transcribe("call.ogg")[0] == "whole call"
+    assert calls[-1] == "call.ogg" and transcriber.fallbacks == 1
+
+
+@pytest.mark.parametrize("failing", ["decode_pcm", "encode_pcm"])
+@pytest.mark.parametrize("error", [subprocess.CalledProcessError(1, "ffmpeg"), OSError("No such file")])
+def test_split_error_falls_back_to_one_job(monkeypatch, failing, error):
+    samples, _truth = synthetic_call(3600, 2, random.Random(1))
+
+    def fail(*args):
+        raise error
+
+    monkeypatch.setattr(transcription, "decode_pcm", lambda path, sample_rate: samples)
+    monkeypatch.setattr(transcription, "encode_pcm", lambda *args: None)
+    monkeypatch.setattr(transcription, failing, fail)
+    calls = []
+
+    def transcribe(path, language_code=None, speakers_expected=None):
+        calls.append(path)
+        return "whole call", 3600, [], 1, "en"
+
+    transcriber = ShardedTranscriber(transcribe, SHARD_SECONDS, OVERLAP_SECONDS, sample_rate=SAMPLE_RATE)
+    assert transcriber.transcribe("call.ogg")[0] == "whole call"
+    assert calls == ["call.ogg"] and transcriber.fallbacks == 1
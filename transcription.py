@@ -0,0 +1,518 @@
+"""
+Transcription backends, and sharded transcription for very long recordings.
+
+Every backend has transcribe(path, language_code, speakers_expected)
+returning the tuple the pipelines store: (text, duration seconds,
+diarization utterances, speaker count, language code). Failures are
+reported in-band as an error text with zero duration (see is_failed).
+
+- AssemblyAITranscriber: the hosted API with speaker diarization (default).
+- FasterWhisperTranscriber: local CPU inference (faster-whisper /
+  CTranslate2, int8) for offline backfills and bulk runs. Whisper does not
+  diarize, so every utterance is labelled speaker "A".
+- FakeTranscriber: deterministic utterances derived from the file's
+  bytes, for benchmarks and load runs without network or cost.
+
+create_transcriber() picks one by name (TRANSCRIPTION_BACKEND). Backends
+that queue work report on_stage("transcribe_queue" | "transcribe_processing",
+seconds) when the caller sets an on_stage callback.
+
+One AssemblyAI job over a 2-hour call takes as long as the slowest part of
+it. ShardedTranscriber splits the (speech-encoded) recording into shards
+of about `shard_seconds`, cutting at the quietest point near each
+boundary, transcribes the shards concurrently and stitches the results:
+
+- Each shard extends `overlap_seconds` past its cuts on both sides, so the
+  speech around a cut is heard by both neighbouring shards.
+- Utterances are shifted by their shard's start. Each shard keeps only the
+  utterances whose midpoint falls between its own cuts, so the overlap is
+  not duplicated.
+- Speaker labels are per job ("A" in one shard may be "B" in the next).
+  They are reconciled by overlap-region matching: a shard's local speaker
+  takes the global label it shares the most overlap-region talk time
+  with. A speaker who was silent in the overlap takes the most recently
+  heard label not already claimed in that shard; a new label is only
+  created when a shard has more speakers than have been heard so far.
+  Calls with many speakers need a longer overlap for each of them to be
+  heard in it.
+
+plan_shards() and stitch_shards() are pure and deterministic: the output
+depends only on the audio and the per-shard results, never on which
+shard finished first.
+"""
+import argparse
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_processing import (
+    SPEECH_BITRATE, SPEECH_EXTENSION, SPEECH_SAMPLE_RATE, VAD_FRAME_MS,
+    decode_pcm, encode_pcm, frame_energy_db, probe_audio,
+)
+
+# (text, duration seconds, utterances, speaker count, language): what transcribe_audio returns
+TranscriptionResult = Tuple[str, float, List[Dict[str, Any]], int, str]
+
+SHARD_SECONDS = 15 * 60
+OVERLAP_SECONDS = 20
+ASSEMBLYAI_URL = "https://api.assemblyai.com/v2"
+WHISPER_MODEL = "small"
+# How far from an even split a cut may move to land in a quiet spot
+CUT_SEARCH_SECONDS = 60
+# Energies are smoothed over this window so a cut lands in a pause, not between two words
+CUT_SMOOTHING_SECONDS = 0.5
+
+
+@dataclass
+class Shard:
+    index: int
+    start_ms: float  # audio covered, including overlap
+    end_ms: float
+    own_start_ms: float  # the cuts: utterances centred in [own_start, own_end) are this shard's
+    own_end_ms: float
+    path: Optional[str] = None
+
+
+def speaker_label(i: int) -> str:
+    return chr(ord("A") + i) if i < 26 else f"S{i + 1}"
+
+
+def plan_shards(samples: np.ndarray, sample_rate: int = SPEECH_SAMPLE_RATE,
+                shard_seconds: float = SHARD_SECONDS, overlap_seconds: float = OVERLAP_SECONDS) -> List[Shard]:
+    """Shards of `samples`, cut at the quietest frame near each even split point."""
+    total_ms = len(samples) * 1000 / sample_rate
+    count = math.ceil(total_ms / (shard_seconds * 1000))
+    if count <= 1 or total_ms <= shard_seconds * 1000 * 1.25:
+        return [Shard(0, 0.0, total_ms, 0.0, total_ms)]
+
+    frame = sample_rate * VAD_FRAME_MS // 1000
+    energy = frame_energy_db(samples, frame)
+    width = max(1, int(CUT_SMOOTHING_SECONDS * 1000 / VAD_FRAME_MS))
+    smoothed = np.convolve(energy, np.ones(width) / width, mode="same")
+    search = int(min(CUT_SEARCH_SECONDS, shard_seconds / 4) * 1000 / VAD_FRAME_MS)
+
+    cuts = []
+    for k in range(1, count):
+        target = int(len(energy) * k / count)
+        lo, hi = max(0, target - search), min(len(energy), target + search + 1)
+        quietest = lo + int(np.argmin(smoothed[lo:hi]))
+        cuts.append((quietest * frame + frame // 2) * 1000 / sample_rate)
+
+    bounds = [0.0] + cuts + [total_ms]
+    overlap_ms = overlap_seconds * 1000
+    return [
+        Shard(i, max(0.0, bounds[i] - overlap_ms), min(total_ms, bounds[i + 1] + overlap_ms),
+              bounds[i], bounds[i + 1])
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def _intersection(a_start: float, a_end: float, b_start: float, b_end: float) -> float:
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+
+def _match_speakers(previous: List[Dict[str, Any]], current: List[Dict[str, Any]],
+                    window: Tuple[float, float]) -> Dict[str, str]:
+    """local label -> global label, by shared talk time inside the overlap window."""
+    scores: Dict[Tuple[str, str], float] = {}
+    for cur in current:
+        c_start, c_end = max(cur["start"], window[0]), min(cur["end"], window[1])
+        if c_end <= c_start:
+            continue
+        for prev in previous:
+            shared = _intersection(c_start, c_end, prev["start"], prev["end"])
+            if shared > 0:
+                key = (cur["speaker"], prev["speaker"])
+                scores[key] = scores.get(key, 0.0) + shared
+    mapping: Dict[str, str] = {}
+    taken = set()
+    for (local, global_label), _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])):
+        if local not in mapping and global_label not in taken:
+            mapping[local] = global_label
+            taken.add(global_label)
+    return mapping
+
+
+def stitch_shards(shards: List[Shard], results: List[TranscriptionResult]) -> TranscriptionResult:
+    """Merge per-shard results (in shard order) into one transcription of the whole recording."""
+    known: List[str] = []  # global labels in order of first appearance
+    last_heard: Dict[str, float] = {}
+    previous: List[Dict[str, Any]] = []  # the previous shard's utterances, shifted and relabelled
+    previous_end = 0.0
+    stitched: List[Dict[str, Any]] = []
+    texts, languages = [], []
+    all_diarized = True
+
+    for shard, (text, _duration, utterances, _count, language) in zip(shards, results):
+        languages.append(language)
+        texts.append(text or "")
+        all_diarized = all_diarized and bool(utterances)
+        shifted = sorted(
+            ({**u, "start": (u.get("start") or 0) + shard.start_ms, "end": (u.get("end") or 0) + shard.start_ms}
+             for u in utterances),
+            key=lambda u: (u["start"], u["end"]),
+        )
+        mapping = _match_speakers(previous, shifted, (shard.start_ms, previous_end)) if previous else {}
+        for u in shifted:
+            local = u.get("speaker", "Unknown")
+            if local in mapping:
+                continue
+            unused = [label for label in known if label not in mapping.values()]
+            if unused:
+                mapping[local] = max(unused, key=lambda label: (last_heard.get(label, 0.0), label))
+            else:
+                mapping[local] = speaker_label(len(known))
+                known.append(mapping[local])
+        previous = [{**u, "speaker": mapping[u.get("speaker", "Unknown")]} for u in shifted]
+        previous_end = shard.end_ms
+        for u in previous:
+            last_heard[u["speaker"]] = max(last_heard.get(u["speaker"], 0.0), u["end"])
+        for u in previous:
+            if shard.own_start_ms <= (u["start"] + u["end"]) / 2 < shard.own_end_ms:
+                stitched.append({**u, "start": int(round(u["start"])), "end": int(round(u["end"]))})
+
+    if all_diarized:
+        text = " ".join(u.get("text", "") for u in stitched if u.get("text"))
+    else:
+        # Without utterance timestamps the overlap cannot be de-duplicated
+        text = " ".join(t for t in texts if t)
+    language = Counter(languages).most_common(1)[0][0] if languages else "en"
+    duration = shards[-1].end_ms / 1000 if shards else 0
+    return text, duration, stitched, len({u["speaker"] for u in stitched}), language
+
+
+def is_failed(result: TranscriptionResult) -> bool:
+    """transcribe_audio reports failures in-band: an error string and no audio."""
+    text, duration, utterances = result[0], result[1], result[2]
+    return not duration and not utterances and isinstance(text, str) and (
+        text.startswith("Error") or text.startswith("Transcription"))
+
+
+class ShardedTranscriber:
+    """
+    Wraps a blocking transcribe(path, language_code, speakers_expected)
+    function (transcribe_audio) with shard / transcribe concurrently / stitch.
+    """
+
+    def __init__(self, transcribe: Callable[..., TranscriptionResult], shard_seconds: float = SHARD_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS, max_workers: int = 4,
+                 sample_rate: int = SPEECH_SAMPLE_RATE, bitrate: str = SPEECH_BITRATE):
+        self.transcribe_fn = transcribe
+        self.shard_seconds = shard_seconds
+        self.overlap_seconds = overlap_seconds
+        self.max_workers = max_workers
+        self.sample_rate = sample_rate
+        self.bitrate = bitrate
+        self.fallbacks = 0
+
+    def should_shard(self, duration_seconds: Optional[float]) -> bool:
+        return self.shard_seconds > 0 and bool(duration_seconds) and duration_seconds > self.shard_seconds * 1.25
+
+    def run_shards(self, shards: List[Shard], transcribe_shard: Callable[[Shard], TranscriptionResult]
+                   ) -> List[TranscriptionResult]:
+        """transcribe_shard over every shard concurrently; results in shard order."""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards)),
+                                thread_name_prefix="transcribe-shard") as pool:
+            return list(pool.map(transcribe_shard, shards))
+
+    @staticmethod
+    def _remove_shard_files(shards: List[Shard]):
+        for shard in shards:
+            if shard.path and os.path.exists(shard.path):
+                os.remove(shard.path)
+
+    def transcribe(self, path: str, language_code: Optional[str] = None,
+                   speakers_expected: Optional[int] = None) -> TranscriptionResult:
+        shards: List[Shard] = []
+        try:
+            samples = decode_pcm(path, self.sample_rate)
+            shards = plan_shards(samples, self.sample_rate, self.shard_seconds, self.overlap_seconds)
+            stem = path.rsplit(".", 1)[0]
+            for shard in shards if len(shards) > 1 else []:
+                shard.path = f"{stem}.shard{shard.index}.{SPEECH_EXTENSION}"
+                lo = int(shard.start_ms * self.sample_rate / 1000)
+                hi = int(shard.end_ms * self.sample_rate / 1000)
+                encode_pcm(samples[lo:hi], shard.path, self.sample_rate, self.bitrate)
+        except (subprocess.SubprocessError, OSError) as e:
+            # ffmpeg could not decode or split it; the backend may still take the whole file
+            self._remove_shard_files(shards)
+            print(f"[TRANSCRIBE] Could not split {os.path.basename(path)} ({e}); transcribing it as one job")
+            self.fallbacks += 1
+            return self.transcribe_fn(path, language_code, speakers_expected)
+        if len(shards) == 1:
+            return self.transcribe_fn(path, language_code, speakers_expected)
+
+        try:
+            print(f"[TRANSCRIBE] {os.path.basename(path)}: {len(shards)} shards of ~{self.shard_seconds / 60:.0f} min, "
+                  f"cuts at {', '.join(f'{s.own_end_ms / 1000:.0f}s' for s in shards[:-1])}")
+            results = self.run_shards(shards, lambda s: self.transcribe_fn(s.path, language_code, speakers_expected))
+        finally:
+            self._remove_shard_files(shards)
+
+        failed = [s.index for s, r in zip(shards, results) if is_failed(r)]
+        if failed:
+            print(f"[TRANSCRIBE] Shards {failed} failed; transcribing {os.path.basename(path)} as one job")
+            self.fallbacks += 1
+            return self.transcribe_fn(path, language_code, speakers_expected)
+        return stitch_shards(shards, results)
+
+
+def failed_result(message: str) -> TranscriptionResult:
+    return message, 0, [], 0, "en"
+
+
+def result_from_utterances(utterances: List[Dict[str, Any]], duration: float, language: str) -> TranscriptionResult:
+    text = " ".join(u["text"] for u in utterances if u.get("text"))
+    return text, duration, utterances, len({u["speaker"] for u in utterances}), language
+
+
+class AssemblyAITranscriber:
+    """Upload, request a diarized transcript, poll until it completes."""
+    name = "assemblyai"
+    on_stage: Optional[Callable[[str, float], None]] = None
+
+    def __init__(self, api_key: Optional[str] = None, poll_interval: float = 3.0):
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+
+    def transcribe(self, path: str, language_code: Optional[str] = None,
+                   speakers_expected: Optional[int] = None) -> TranscriptionResult:
+        api_key = self.api_key or os.environ.get("ASSEMBLYAI_API_KEY")
+        if not api_key:
+            return failed_result("Error: AssemblyAI API Key missing")
+
+        import requests
+
+        headers = {'authorization': api_key}
+
+        try:
+            print(f"Uploading {path} to AssemblyAI...")
+
+            def read_file(filename, chunk_size=5242880):
+                with open(filename, 'rb') as _file:
+                    while True:
+                        data = _file.read(chunk_size)
+                        if not data:
+                            break
+                        yield data
+
+            upload_response = requests.post(f'{ASSEMBLYAI_URL}/upload', headers=headers, data=read_file(path))
+            upload_response.raise_for_status()
+            upload_url = upload_response.json()['upload_url']
+
+            print("Requesting transcription...")
+            json_data = {
+                "audio_url": upload_url,
+                "speaker_labels": True
+            }
+
+            # If language is provided, use it, else use detection
+            if language_code and language_code != 'auto':
+                json_data["language_code"] = language_code
+            else:
+                json_data["language_detection"] = True
+
+            # Add speaker count hint if provided
+            if speakers_expected and int(speakers_expected) > 0:
+                json_data["speakers_expected"] = int(speakers_expected)
+
+            response = requests.post(f'{ASSEMBLYAI_URL}/transcript', json=json_data, headers=headers)
+            response.raise_for_status()
+            transcript_id = response.json()['id']
+
+            print(f"Polling for transcript {transcript_id}...")
+            submitted = started = time.perf_counter()
+            queued = True
+            while True:
+                polling_response = requests.get(f'{ASSEMBLYAI_URL}/transcript/{transcript_id}', headers=headers)
+                polling_response.raise_for_status()
+                result = polling_response.json()
+
+                if queued and result['status'] != 'queued':
+                    queued = False
+                    started = time.perf_counter()
+                    if self.on_stage:
+                        self.on_stage("transcribe_queue", started - submitted)
+                if result['status'] in ('completed', 'error') and self.on_stage:
+                    self.on_stage("transcribe_processing", time.perf_counter() - started)
+
+                if result['status'] == 'completed':
+                    text = result.get('text', '')
+                    duration = result.get('audio_duration', 0)
+                    language = result.get('language_code', 'en')
+                    diarization_data = [{
+                        "speaker": utt.get('speaker', 'Unknown'),
+                        "text": utt.get('text', ''),
+                        "start": utt.get('start'),
+                        "end": utt.get('end')
+                    } for utt in result.get('utterances') or []]
+                    speaker_count = len({u["speaker"] for u in diarization_data})
+                    print(f"[TRANSCRIBE] Duration: {duration}s, Speakers: {speaker_count}, Language: {language}")
+                    return text, duration, diarization_data, speaker_count, language
+
+                elif result['status'] == 'error':
+                    return failed_result(f"Transcription Failed: {result.get('error')}")
+
+                time.sleep(self.poll_interval)
+
+        except Exception as e:
+            print(f"Transcription Exception: {e}")
+            return failed_result(f"Transcription Exception: {e}")
+
+
+class FasterWhisperTranscriber:
+    """
+    Local CPU transcription with faster-whisper (int8 CTranslate2).
+
+    CTranslate2 runs inference on its own native threads, so `workers`
+    concurrent transcribe() calls (e.g. shards, or a bulk run's thread
+    pool) proceed in parallel without a process pool; calls beyond that
+    wait their turn. The model is loaded on first use.
+    """
+    name = "faster-whisper"
+    on_stage: Optional[Callable[[str, float], None]] = None
+
+    def __init__(self, model_name: str = WHISPER_MODEL, workers: int = 2, cpu_threads: int = 0,
+                 compute_type: str = "int8"):
+        import faster_whisper  # noqa: F401  (fail at startup, not on the first call, when missing)
+
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads
+        self.compute_type = compute_type
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def _get_model(self):
+        with self._load_lock:
+            if self._model is None:
+                from faster_whisper import WhisperModel
+
+                t0 = time.time()
+                self._model = WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type,
+                                           cpu_threads=self.cpu_threads, num_workers=self.workers)
+                print(f"[TRANSCRIBE] Loaded whisper model {self.model_name} ({self.compute_type}) "
+                      f"in {time.time() - t0:.1f}s")
+            return self._model
+
+    def transcribe(self, path: str, language_code: Optional[str] = None,
+                   speakers_expected: Optional[int] = None) -> TranscriptionResult:
+        try:
+            model = self._get_model()
+            waiting = time.perf_counter()
+            with self._slots:
+                started = time.perf_counter()
+                if self.on_stage:
+                    self.on_stage("transcribe_queue", started - waiting)
+                segments, info = model.transcribe(
+                    path, language=None if not language_code or language_code == "auto" else language_code)
+                utterances = [
+                    {"speaker": "A", "text": segment.text.strip(),
+                     "start": int(segment.start * 1000), "end": int(segment.end * 1000)}
+                    for segment in segments if segment.text.strip()
+                ]
+                if self.on_stage:
+                    self.on_stage("transcribe_processing", time.perf_counter() - started)
+            print(f"[TRANSCRIBE] {os.path.basename(path)}: {info.duration:.0f}s, language {info.language} (local)")
+            return result_from_utterances(utterances, info.duration, info.language)
+        except Exception as e:
+            print(f"Transcription Exception: {e}")
+            return failed_result(f"Transcription Exception: {e}")
+
+
+class FakeTranscriber:
+    """
+    Deterministic stand-in: the same file always yields the same
+    utterances (seeded by a checksum of its bytes), alternating between
+    `speakers` over the file's duration. `latency` seconds per audio
+    second emulate a real job's wait.
+    """
+    name = "fake"
+    on_stage: Optional[Callable[[str, float], None]] = None
+    WORDS = ("account billing refund router outage customer agent internet payment invoice cancel plan "
+             "upgrade technician tomorrow issue resolved connection speed contract price offer").split()
+
+    def __init__(self, speakers: int = 2, latency: float = 0.0):
+        self.speakers = speakers
+        self.latency = latency
+
+    def transcribe(self, path: str, language_code: Optional[str] = None,
+                   speakers_expected: Optional[int] = None) -> TranscriptionResult:
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            head = f.read(1 << 16)
+        info = probe_audio(path)
+        # Without ffprobe, assume speech Opus (~24 kbit/s)
+        duration = info.get("duration") or info["size"] / 3000
+        rng = random.Random(zlib.crc32(head) ^ info["size"])
+        speakers = int(speakers_expected or self.speakers)
+        utterances, t, i = [], 0.0, 0
+        while t < duration * 1000:
+            length = min(rng.uniform(2000, 8000), duration * 1000 - t)
+            words = " ".join(rng.choice(self.WORDS) for _ in range(max(1, int(length / 400))))
+            utterances.append({"speaker": speaker_label(i % speakers), "text": words.capitalize() + ".",
+                               "start": int(t), "end": int(t + length)})
+            t += length + rng.uniform(200, 1200)
+            i += 1
+        time.sleep(duration * self.latency)
+        if self.on_stage:
+            self.on_stage("transcribe_processing", time.perf_counter() - started)
+        language = language_code if language_code and language_code != "auto" else "en"
+        return result_from_utterances(utterances, duration, language)
+
+
+def create_transcriber(kind: str = "assemblyai", model_name: Optional[str] = None, workers: int = 2):
+    """
+    "assemblyai", "faster-whisper" (alias "local") or "fake". A local
+    backend that cannot be loaded falls back to AssemblyAI.
+    """
+    if kind == "fake":
+        print("[TRANSCRIBE] Using fake transcription backend")
+        return FakeTranscriber()
+    if kind in ("faster-whisper", "local"):
+        try:
+            transcriber = FasterWhisperTranscriber(model_name or WHISPER_MODEL, workers)
+            print(f"[TRANSCRIBE] Using local faster-whisper backend ({transcriber.model_name}, {workers} workers)")
+            return transcriber
+        except ImportError:
+            print("[TRANSCRIBE] Warning: 'faster-whisper' package not installed. Using AssemblyAI.")
+    return AssemblyAITranscriber()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe audio files with a configured backend (bulk / offline runs)")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--backend", default=os.environ.get("TRANSCRIPTION_BACKEND", "assemblyai"))
+    parser.add_argument("--model", default=os.environ.get("WHISPER_MODEL") or None)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TRANSCRIBE_WORKERS", "2")))
+    parser.add_argument("--language", default=None)
+    args = parser.parse_args()
+
+    transcriber = create_transcriber(args.backend, args.model, args.workers)
+    t_start = time.time()
+
+    def run(path):
+        t0 = time.time()
+        return path, transcriber.transcribe(path, args.language), time.time() - t0
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for path, result, seconds in pool.map(run, args.paths):
+            text, duration, utterances, speakers, language = result
+            status = "FAILED " + text if is_failed(result) else f"{len(utterances)} utterances, {speakers} speakers"
+            print(f"{path}: {duration:.0f}s audio in {seconds:.1f}s, {language}: {status}")
+    print(f"[TRANSCRIBE] {len(args.paths)} files in {time.time() - t_start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Vapi webhook event model, parser and dispatch.
+
+Both Vapi endpoints (/api/vapi-webhook and /api/vapi-call) parse each payload
+exactly once into a VapiEvent and hand it to a VapiEventRouter, so call-ID
+extraction, recording-URL lookup and the database handlers are shared.
+CallLaneDispatcher applies the routed events in order per call.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Vapi has used both names for the same event over time
+EVENT_TYPE_ALIASES = {
+    "call-status-update": "status-update",
+}
+
+# Payloads without a type that carry a recording URL (e.g. the dashboard's
+# own trigger from vapi_events.js) are routed under this type
+RECORDING_READY = "recording-ready"
+
+
+@dataclass
+class VapiEvent:
+    type: Optional[str]
+    call_id: Optional[str]
+    call: Dict[str, Any] = field(default_factory=dict)
+    message: Dict[str, Any] = field(default_factory=dict)
+    status: Optional[str] = None
+    role: Optional[str] = None
+    transcript: Optional[str] = None
+    transcript_type: Optional[str] = None
+    recording_url: Optional[str] = None
+    ended_reason: Optional[str] = None
+    summary: Optional[str] = None
+    duration: Optional[float] = None
+    cost: Optional[float] = None
+    customer_phone: Optional[str] = None
+    filename: Optional[str] = None
+
+    @property
+    def is_final_transcript(self) -> bool:
+        return self.type == "transcript" and self.transcript_type == "final" and bool(self.transcript)
+
+
+def _recording_url_from(obj: Any) -> Optional[str]:
+    if not isinstance(obj, dict):
+        return None
+    return obj.get("recordingUrl") or obj.get("recording_url")
+
+
+def _stereo_url_from(obj: Any) -> Optional[str]:
+    if not isinstance(obj, dict):
+        return None
+    return obj.get("stereoRecordingUrl") or obj.get("stereo_recording_url")
+
+
+def find_recording_url(message: Dict[str, Any], call: Dict[str, Any]) -> Optional[str]:
+    """
+    Look for the recording URL in every place Vapi has been seen to put it.
+    Mono recordings are preferred; the stereo recording is the fallback.
+    """
+    artifact = message.get("artifact")
+    call_artifact = call.get("artifact") if isinstance(call, dict) else None
+    for candidate in (message, artifact, call, call_artifact):
+        url = _recording_url_from(candidate)
+        if url:
+            return url
+    for candidate in (message, artifact, call, call_artifact):
+        url = _stereo_url_from(candidate)
+        if url:
+            return url
+    return None
+
+
+def parse_vapi_payload(payload: Dict[str, Any]) -> VapiEvent:
+    """Parse a raw Vapi webhook body (either envelope shape) into a VapiEvent."""
+    message = payload.get("message")
+    if not isinstance(message, dict):
+        # Flat payloads (no 'message' envelope) carry the fields at the top level
+        message = payload
+
+    call = payload.get("call") or message.get("call") or {}
+    if not isinstance(call, dict):
+        call = {}
+
+    call_id = (call.get("id") or message.get("call_id") or message.get("callId")
+               or payload.get("call_id"))
+    if call_id and not call.get("id"):
+        call = {**call, "id": call_id}
+
+    event_type = message.get("type")
+    event_type = EVENT_TYPE_ALIASES.get(event_type, event_type)
+    recording_url = find_recording_url(message, call)
+    if not event_type and recording_url:
+        event_type = RECORDING_READY
+
+    customer = call.get("customer") or {}
+
+    return VapiEvent(
+        type=event_type,
+        call_id=call_id,
+        call=call,
+        message=message,
+        status=message.get("status"),
+        role=message.get("role"),
+        transcript=message.get("transcript"),
+        transcript_type=message.get("transcriptType"),
+        recording_url=recording_url,
+        ended_reason=message.get("endedReason"),
+        summary=message.get("summary"),
+        duration=call.get("duration"),
+        cost=message.get("cost", call.get("cost")),
+        customer_phone=customer.get("number") if isinstance(customer, dict) else None,
+        filename=message.get("filename"),
+    )
+
+
+def idempotency_key(raw_body: bytes) -> str:
+    """Retried deliveries are byte-identical, so the body hash identifies them."""
+    return hashlib.sha256(raw_body).hexdigest()
+
+
+class VapiEventRouter:
+    """
+    Dispatch table from event type to handlers.
+
+    Handlers are coroutines taking a VapiEvent. Several handlers may be
+    registered for one type; they run in registration order. Handlers
+    registered with "*" run for every event before the type-specific ones.
+    A handler that raises does not stop the others; the first error is
+    re-raised once they have all run, so the caller sees the failure.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Callable]] = {}
+        self.counts: Dict[str, int] = {}
+        self.unhandled = 0
+
+    def on(self, *event_types: str):
+        def register(handler):
+            for event_type in event_types:
+                self.handlers.setdefault(event_type, []).append(handler)
+            return handler
+        return register
+
+    async def dispatch(self, event: VapiEvent):
+        key = event.type or "unknown"
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+        handlers = self.handlers.get("*", []) + self.handlers.get(event.type, [])
+        if not self.handlers.get(event.type):
+            self.unhandled += 1
+        errors = []
+        for handler in handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"events_by_type": dict(self.counts), "unhandled": self.unhandled}
+
+
+class CallLaneDispatcher:
+    """
+    Ordered, per-call event processing for webhook payloads.
+
+    Each call_id gets its own lane (an asyncio.Queue drained by one worker
+    task), so events for one call are applied strictly in arrival order while
+    different calls proceed in parallel. Lanes shut down after sitting idle.
+    Deliveries whose idempotency key was already accepted are dropped; the
+    key is forgotten again if its handler raises, so a later delivery of
+    the same payload is applied. Handlers report failures by raising (after
+    logging), which is also what the `failed` count measures.
+    """
+
+    def __init__(self, idle_timeout: float, dedupe_ttl: float, dedupe_max: int = 20000):
+        self.idle_timeout = idle_timeout
+        self.dedupe_ttl = dedupe_ttl
+        self.dedupe_max = dedupe_max
+        self.lanes: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._seen_keys: "OrderedDict[str, float]" = OrderedDict()
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+
+    def _is_duplicate(self, key: str) -> bool:
+        now = time.monotonic()
+        # Expire old keys (oldest first) and cap memory
+        while self._seen_keys:
+            oldest_key, seen_at = next(iter(self._seen_keys.items()))
+            if now - seen_at > self.dedupe_ttl or len(self._seen_keys) > self.dedupe_max:
+                self._seen_keys.popitem(last=False)
+            else:
+                break
+        if key in self._seen_keys:
+            return True
+        self._seen_keys[key] = now
+        return False
+
+    def submit(self, lane_key: Optional[str], key: Optional[str], handler, *args) -> bool:
+        """Queue handler(*args) on the lane for lane_key. Returns False for duplicates."""
+        self.received += 1
+        if key and self._is_duplicate(key):
+            self.duplicates += 1
+            return False
+
+        lane_key = lane_key or "__no_call_id__"
+        queue = self.lanes.get(lane_key)
+        if queue is None:
+            queue = asyncio.Queue()
+            self.lanes[lane_key] = queue
+            self._workers[lane_key] = asyncio.create_task(self._drain_lane(lane_key, queue))
+        queue.put_nowait((key, handler, args))
+        return True
+
+    async def _drain_lane(self, lane_key: str, queue: asyncio.Queue):
+        while True:
+            try:
+                key, handler, args = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    # No await between the check and removal, so nothing can slip in
+                    self.lanes.pop(lane_key, None)
+                    self._workers.pop(lane_key, None)
+                    return
+                continue
+
+            try:
+                await handler(*args)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                if key:
+                    self._seen_keys.pop(key, None)
+                print(f"[VAPI-QUEUE] Error applying event for call {lane_key}: {e}")
+            finally:
+                queue.task_done()
+
+    def backlog(self) -> int:
+        return sum(q.qsize() for q in self.lanes.values())
+
+    async def drain(self, timeout: float = 10):
+        """Wait (bounded) for queued events to be applied, e.g. on shutdown."""
+        queues = list(self.lanes.values())
+        if not queues:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in queues)), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"[VAPI-QUEUE] Shutdown with {self.backlog()} event(s) still queued")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "failed": self.failed,
+            "active_lanes": len(self.lanes),
+            "backlog": self.backlog(),
+        }
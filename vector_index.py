@@ -0,0 +1,633 @@
+"""
+Local vector index over call summaries ("calls similar to this one").
+
+Each call's summary and tags are embedded once, when the call is written,
+by a pluggable embedder: a small local sentence-transformers model when it
+is installed, or a deterministic feature-hashing embedder (no download,
+identical output on every machine) for tests and as the fallback.
+
+Vectors are L2-normalised and stored as int8 in a memory-mapped matrix
+(384 dims = 384 bytes per call), with a per-slot record (call id, version
+stamp, cluster). Once there are enough calls an IVF index is trained:
+k-means centroids plus one inverted list per centroid, so a query scores
+only the calls in the `nprobe` nearest clusters instead of the whole
+matrix. The index is kept current through the call-change hook and
+re-synced against the database at startup.
+
+    python vector_index.py --rebuild    # re-embed every call from Supabase
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from search_index import summary_text
+
+# Columns the index needs from a `calls` row
+VECTOR_COLUMNS = "id, summary, tags, updated_at"
+
+# Bump when the on-disk layout changes; older files are re-embedded from scratch
+FORMAT_VERSION = 1
+# One record per matrix row; id -1 marks a free slot, cluster -1 "not assigned"
+SLOT_DTYPE = np.dtype([("id", "<i8"), ("stamp", "<u4"), ("cluster", "<i4")])
+INITIAL_CAPACITY = 1024
+# int8 quantisation scale for unit vectors (components are within [-1, 1])
+QUANT_SCALE = 127.0
+# Output size of models whose dimension is known without loading them
+KNOWN_MODEL_DIMS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+    "sentence-transformers/all-MiniLM-L12-v2": 384,
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2": 384,
+    "sentence-transformers/all-mpnet-base-v2": 768,
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def embedding_text(row: Dict[str, Any]) -> str:
+    """The text a call is embedded from: its summary plus tags."""
+    tags = " ".join(str(t) for t in row.get("tags") or [])
+    return " ".join((summary_text(row.get("summary")) + " " + tags).split())
+
+
+def version_stamp(updated_at: Any) -> int:
+    """Compact fingerprint of a row's updated_at (re-embed when it changes)."""
+    return zlib.crc32(str(updated_at or "").encode())
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder: words and word pairs are hashed
+    into `dim` signed buckets with sublinear term weights. No model, no
+    download, stable across processes; similar wording gives similar vectors.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def warm(self):
+        pass
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            counts: Dict[str, int] = defaultdict(int)
+            for word in words:
+                counts[word] += 1
+            for pair in zip(words, words[1:]):
+                counts[" ".join(pair)] += 1
+            for feature, count in counts.items():
+                h = zlib.crc32(feature.encode())
+                sign = 1.0 if h & 0x80000000 else -1.0
+                out[row, h % self.dim] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Small CPU sentence-transformers model (optional `sentence-transformers`
+    package). Importing torch and loading the model takes seconds, so for
+    models in KNOWN_MODEL_DIMS it happens on the first embed() or warm()
+    instead of at construction.
+
+    If that deferred load fails (no network for the download, a bad model
+    name), the embedder switches to hashing for the rest of the process and
+    its `name` changes accordingly; VectorIndex notices and starts over.
+    """
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+        if importlib.util.find_spec("sentence_transformers") is None:
+            raise ImportError("sentence_transformers")
+        self.model_name = model_name
+        self.name = f"sentence-transformers:{model_name}"
+        self._model = None
+        self._fallback: Optional[HashingEmbedder] = None
+        self._load_lock = threading.Lock()
+        if model_name in KNOWN_MODEL_DIMS:
+            self.dim = KNOWN_MODEL_DIMS[model_name]
+        else:
+            # Unknown size: load now, so a failure still falls back in create_embedder
+            self._model = self._load()
+            self.dim = self._model.get_sentence_embedding_dimension()
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.model_name, device="cpu")
+
+    @property
+    def model(self):
+        """The loaded model, or None once it failed to load (embedding falls back to hashing)."""
+        with self._load_lock:
+            if self._model is None and self._fallback is None:
+                try:
+                    self._model = self._load()
+                except Exception as e:
+                    print(f"[VECTORS] Warning: could not load embedding model ({e}). Using hashing embedder.")
+                    self._fallback = HashingEmbedder(self.dim)
+                    self.name = self._fallback.name
+            return self._model
+
+    def warm(self):
+        self.model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        model = self.model
+        if model is None:
+            return self._fallback.embed(texts)
+        vectors = model.encode(texts, batch_size=32, normalize_embeddings=True,
+                               convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_embedder(kind: str = "auto", model_name: Optional[str] = None):
+    """
+    "hashing", "sentence-transformers" or "auto" (the model when installed,
+    hashing otherwise).
+    """
+    if kind in ("auto", "sentence-transformers"):
+        try:
+            embedder = SentenceTransformerEmbedder(model_name) if model_name else SentenceTransformerEmbedder()
+            print(f"[VECTORS] Using embedder {embedder.name}")
+            return embedder
+        except ImportError:
+            if kind == "sentence-transformers":
+                print("[VECTORS] Warning: 'sentence-transformers' package not installed. Using hashing embedder.")
+        except Exception as e:
+            print(f"[VECTORS] Warning: could not load embedding model ({e}). Using hashing embedder.")
+    return HashingEmbedder()
+
+
+def quantize(vectors: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(vectors * QUANT_SCALE), -127, 127).astype(np.int8)
+
+
+def nearest_centroid(data: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for each row (unit vectors, so dot = cosine)."""
+    out = np.empty(len(data), dtype=np.int32)
+    for i in range(0, len(data), batch):
+        out[i:i + batch] = np.argmax(data[i:i + batch] @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """k-means on unit vectors with cosine similarity. Returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(data)))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    assign = nearest_centroid(data, centroids)
+    for _ in range(iterations):
+        order = np.argsort(assign, kind="stable")
+        clusters, starts = np.unique(assign[order], return_index=True)
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[clusters] = sums
+        # Re-seed clusters that lost every member
+        empty = np.setdiff1d(np.arange(k), clusters)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        new_assign = nearest_centroid(data, centroids)
+        if np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+    return centroids, assign
+
+
+class VectorIndex:
+    """
+    int8 memory-mapped embedding matrix with an IVF index.
+
+    Below `train_threshold` calls every vector is scored (still a few
+    milliseconds); above it queries probe the `nprobe` nearest of about
+    sqrt(N) clusters. The clustering is retrained in the background when the
+    collection has doubled since the last training. One lock guards the
+    matrix and lists; writes come from threadpool workers as well as the
+    event loop.
+    """
+
+    def __init__(self, directory: str, embedder=None, nprobe: int = 8,
+                 train_threshold: int = 2048, max_train_sample: int = 50000):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.max_train_sample = max_train_sample
+        self._lock = threading.Lock()
+        self._training = False
+        self.ready = False
+        self.available = True
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._open()
+        except (OSError, ValueError) as e:
+            print(f"[VECTORS] Index unavailable: {e}")
+            self.available = False
+
+    # --- Storage ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        meta = {"format": FORMAT_VERSION, "embedder": self.embedder.name, "dim": self.dim,
+                "trained_on": self._trained_on}
+        with open(self._path("meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def _open(self, reset: bool = False):
+        meta = self._read_meta()
+        if reset or (meta.get("format"), meta.get("embedder"), meta.get("dim")) != (
+                FORMAT_VERSION, self.embedder.name, self.dim):
+            # Different model or layout: start empty and let the next sync re-embed
+            for name in ("vectors.i8", "slots.bin", "centroids.npy"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            meta = {}
+        self._opened_for = self.embedder.name
+        self._trained_on = meta.get("trained_on", 0)
+
+        slots_path = self._path("slots.bin")
+        capacity = os.path.getsize(slots_path) // SLOT_DTYPE.itemsize if os.path.exists(slots_path) else 0
+        if capacity == 0:
+            capacity = INITIAL_CAPACITY
+            self._resize_files(0, capacity)
+        self._map(capacity)
+
+        centroids_path = self._path("centroids.npy")
+        self._centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        ids = np.asarray(self._slots["id"])
+        live = np.flatnonzero(ids >= 0)
+        self._slot_of = {int(ids[s]): int(s) for s in live}
+        self._free = [int(s) for s in np.flatnonzero(ids < 0)[::-1]]
+        self._lists: Dict[int, List[int]] = defaultdict(list)
+        for s in live:
+            cluster = int(self._slots["cluster"][s])
+            if cluster >= 0:
+                self._lists[cluster].append(int(s))
+        self._write_meta()
+
+    def _resize_files(self, old_capacity: int, capacity: int):
+        for name, row_bytes in (("vectors.i8", self.dim), ("slots.bin", SLOT_DTYPE.itemsize)):
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        slots = np.memmap(self._path("slots.bin"), dtype=SLOT_DTYPE, mode="r+", shape=(capacity,))
+        slots["id"][old_capacity:] = -1
+        slots["cluster"][old_capacity:] = -1
+        slots.flush()
+
+    def _map(self, capacity: int):
+        self._vectors = np.memmap(self._path("vectors.i8"), dtype=np.int8, mode="r+", shape=(capacity, self.dim))
+        self._slots = np.memmap(self._path("slots.bin"), dtype=SLOT_DTYPE, mode="r+", shape=(capacity,))
+
+    def _grow(self):
+        old_capacity = len(self._slots)
+        self.flush_locked()
+        self._resize_files(old_capacity, old_capacity * 2)
+        self._map(old_capacity * 2)
+        self._free.extend(range(old_capacity * 2 - 1, old_capacity - 1, -1))
+
+    def flush_locked(self):
+        self._vectors.flush()
+        self._slots.flush()
+
+    def _check_embedder_locked(self):
+        """Start over if the embedder changed since the index was opened (model failed to load)."""
+        if self.embedder.name != self._opened_for:
+            print(f"[VECTORS] Embedder is now {self.embedder.name}; dropping vectors from {self._opened_for}")
+            self._open(reset=True)
+
+    def warm(self):
+        """Load the embedding model (slow: may download it); run before sync()."""
+        if not self.available:
+            return
+        self.embedder.warm()
+        with self._lock:
+            self._check_embedder_locked()
+
+    # --- Writes ---
+
+    def _put(self, call_id: int, vector: np.ndarray, stamp: int):
+        slot = self._slot_of.get(call_id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slot_of[call_id] = slot
+        old_cluster = int(self._slots["cluster"][slot])
+        cluster = -1
+        if self._centroids is not None:
+            cluster = int(np.argmax(self._centroids @ vector))
+        if old_cluster != cluster:
+            if old_cluster >= 0:
+                self._lists[old_cluster].remove(slot)
+            if cluster >= 0:
+                self._lists[cluster].append(slot)
+        self._vectors[slot] = quantize(vector)
+        self._slots[slot] = (call_id, stamp, cluster)
+
+    def _drop(self, call_id: int):
+        slot = self._slot_of.pop(call_id, None)
+        if slot is None:
+            return
+        cluster = int(self._slots["cluster"][slot])
+        if cluster >= 0:
+            self._lists[cluster].remove(slot)
+        self._slots[slot] = (-1, 0, -1)
+        self._free.append(slot)
+
+    def upsert_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Embed and store rows; rows without summary text are removed. Returns rows embedded."""
+        if not self.available:
+            return 0
+        rows = [r for r in rows if r.get("id") is not None]
+        texts = [embedding_text(r) for r in rows]
+        embedded = [(r, t) for r, t in zip(rows, texts) if t]
+        # Embedding is the slow part; keep it outside the lock
+        vectors = self.embedder.embed([t for _, t in embedded]) if embedded else None
+        with self._lock:
+            self._check_embedder_locked()
+            for row, text in zip(rows, texts):
+                if not text:
+                    self._drop(row["id"])
+            for i, (row, _) in enumerate(embedded):
+                self._put(row["id"], vectors[i], version_stamp(row.get("updated_at")))
+            self.flush_locked()
+        return len(embedded)
+
+    def delete_many(self, call_ids: Iterable[int]):
+        if not self.available:
+            return
+        with self._lock:
+            for call_id in call_ids:
+                self._drop(call_id)
+            self.flush_locked()
+
+    def apply_change(self, kind: str, new_row: Optional[Dict[str, Any]] = None,
+                     old_row: Optional[Dict[str, Any]] = None):
+        """Call-change listener: (re-)embed when the summary or tags change."""
+        if not self.available:
+            return
+        if kind == "delete" and old_row:
+            self.delete_many([old_row["id"]])
+        elif kind in ("insert", "update") and new_row and new_row.get("id") is not None:
+            if "summary" not in new_row and "tags" not in new_row:
+                return  # e.g. a diarization edit; the embedding is unchanged
+            self.upsert_many([{**(old_row or {}), **new_row}])
+            self._maybe_train()
+
+    # --- IVF training ---
+
+    def _needs_training(self) -> bool:
+        live = len(self._slot_of)
+        return live >= self.train_threshold and (self._centroids is None or live >= 2 * self._trained_on)
+
+    def _maybe_train(self):
+        with self._lock:
+            if self._training or not self._needs_training():
+                return
+        threading.Thread(target=self.train, name="vector-index-train", daemon=True).start()
+
+    def train(self) -> int:
+        """(Re)build the IVF clustering from the stored vectors. Returns the number of clusters."""
+        with self._lock:
+            if self._training or not self._slot_of:
+                return 0
+            self._training = True
+            slots = np.fromiter(self._slot_of.values(), dtype=np.int64)
+            ids = np.asarray(self._slots["id"][slots])
+            vectors = self._vectors
+        try:
+            t_start = time.time()
+            data = vectors[slots].astype(np.float32) / QUANT_SCALE
+            data /= np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+            rng = np.random.default_rng(0)
+            sample = data if len(data) <= self.max_train_sample else data[
+                rng.choice(len(data), self.max_train_sample, replace=False)]
+            nlist = max(8, int(np.sqrt(len(data))))
+            centroids, _ = spherical_kmeans(sample, nlist)
+            assign = nearest_centroid(data, centroids)
+
+            with self._lock:
+                self._slots["cluster"][:] = -1
+                unchanged = np.asarray(self._slots["id"][slots]) == ids
+                self._slots["cluster"][slots[unchanged]] = assign[unchanged]
+                self._centroids = centroids.astype(np.float32)
+                # Calls written while training get assigned now
+                for call_id, slot in self._slot_of.items():
+                    if self._slots["cluster"][slot] < 0:
+                        vector = self._vectors[slot].astype(np.float32)
+                        self._slots["cluster"][slot] = int(np.argmax(self._centroids @ vector))
+                self._lists = defaultdict(list)
+                for slot in self._slot_of.values():
+                    self._lists[int(self._slots["cluster"][slot])].append(slot)
+                self._trained_on = len(self._slot_of)
+                np.save(self._path("centroids.npy"), self._centroids)
+                self._write_meta()
+                self.flush_locked()
+            print(f"[VECTORS] Trained {len(centroids)} clusters over {len(data)} calls in {time.time() - t_start:.2f}s")
+            return len(centroids)
+        finally:
+            with self._lock:
+                self._training = False
+
+    # --- Sync ---
+
+    def sync(self, fetch_versions: Callable[[], Dict[int, Optional[str]]],
+             fetch_by_ids: Callable[[List[int]], List[Dict[str, Any]]],
+             page_size: int = 200) -> Tuple[int, int]:
+        """
+        Bring the index in line with the database.
+        fetch_versions(): {id: updated_at} for every call.
+        fetch_by_ids(ids): VECTOR_COLUMNS rows for calls that are new or changed.
+        Returns (rows embedded, rows removed).
+        """
+        if not self.available:
+            return 0, 0
+        # Snapshot the index first: a call embedded (via apply_change) while the
+        # ids are being paged is missing from versions but also from local
+        with self._lock:
+            local = {call_id: int(self._slots["stamp"][slot]) for call_id, slot in self._slot_of.items()}
+        versions = fetch_versions()
+        removed = [call_id for call_id in local if call_id not in versions]
+        self.delete_many(removed)
+
+        # Calls without summary text are never stored, so they are re-checked
+        # on each sync; fetching them is cheap (three short columns)
+        todo = [call_id for call_id, updated in versions.items()
+                if local.get(call_id) != version_stamp(updated)]
+        embedded = 0
+        for i in range(0, len(todo), page_size):
+            embedded += self.upsert_many(fetch_by_ids(todo[i:i + page_size]))
+        if self._needs_training():
+            self.train()
+        self.ready = True
+        return embedded, len(removed)
+
+    def rebuild(self, fetch_after: Callable[[int, int], List[Dict[str, Any]]], page_size: int = 500) -> int:
+        """Drop everything and embed every call again (e.g. after switching models)."""
+        if not self.available:
+            return 0
+        with self._lock:
+            self._open(reset=True)
+        embedded, after_id = 0, 0
+        while True:
+            rows = fetch_after(after_id, page_size)
+            embedded += self.upsert_many(rows)
+            if len(rows) < page_size:
+                break
+            after_id = rows[-1]["id"]
+        if len(self._slot_of) >= self.train_threshold:
+            self.train()
+        self.ready = True
+        return embedded
+
+    # --- Queries ---
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.fromiter(self._slot_of.values(), dtype=np.int64, count=len(self._slot_of))
+        probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        lists = [self._lists[int(c)] for c in probes if self._lists.get(int(c))]
+        return np.concatenate([np.asarray(lst, dtype=np.int64) for lst in lists]) if lists else np.empty(0, np.int64)
+
+    def _search(self, query: np.ndarray, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        with self._lock:
+            candidates = self._candidates(query)
+            if not len(candidates):
+                return []
+            scores = (self._vectors[candidates].astype(np.float32) @ query) / QUANT_SCALE
+            ids = np.asarray(self._slots["id"][candidates])
+        if exclude is not None:
+            scores[ids == exclude] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), round(float(scores[i]), 4)) for i in top if np.isfinite(scores[i])]
+
+    def vector(self, call_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            slot = self._slot_of.get(call_id)
+            if slot is None:
+                return None
+            vector = self._vectors[slot].astype(np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def similar(self, call_id: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """[(call_id, cosine similarity)] most similar first, or None if the call has no vector."""
+        if not self.available:
+            return None
+        query = self.vector(call_id)
+        if query is None:
+            return None
+        return self._search(query, k, exclude=call_id)
+
+    def search_text(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Calls whose summaries are closest in meaning to free text."""
+        if not self.available or not text.strip():
+            return []
+        query = self.embedder.embed([text])[0]
+        with self._lock:
+            self._check_embedder_locked()
+        return self._search(query, k)
+
+    def cluster(self, call_ids: Iterable[int], k: int = 8) -> List[Dict[str, Any]]:
+        """
+        Group calls by topic with k-means over their vectors. Each group lists
+        its call ids closest-to-centre first (so the first few are
+        representative) and its cohesion (mean similarity to the centre).
+        """
+        if not self.available:
+            return []
+        with self._lock:
+            pairs = [(c, self._slot_of[c]) for c in call_ids if c in self._slot_of]
+            if not pairs:
+                return []
+            ids = np.array([c for c, _ in pairs], dtype=np.int64)
+            data = self._vectors[[s for _, s in pairs]].astype(np.float32)
+        data /= np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+        centroids, assign = spherical_kmeans(data, k)
+        groups = []
+        for cluster in range(len(centroids)):
+            members = np.flatnonzero(assign == cluster)
+            if not len(members):
+                continue
+            scores = data[members] @ centroids[cluster]
+            order = np.argsort(-scores)
+            groups.append({
+                "size": int(len(members)),
+                "cohesion": round(float(scores.mean()), 4),
+                "call_ids": [int(ids[members[i]]) for i in order],
+            })
+        groups.sort(key=lambda g: g["size"], reverse=True)
+        return groups
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.available:
+            return {"available": False}
+        with self._lock:
+            size = sum(os.path.getsize(self._path(n)) for n in ("vectors.i8", "slots.bin", "centroids.npy")
+                       if os.path.exists(self._path(n)))
+            return {
+                "available": True,
+                "ready": self.ready,
+                "embedder": self.embedder.name,
+                "dim": self.dim,
+                "vectors": len(self._slot_of),
+                "capacity": len(self._slots),
+                "clusters": 0 if self._centroids is None else len(self._centroids),
+                "trained_on": self._trained_on,
+                "nprobe": self.nprobe,
+                "size_bytes": size,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local call vector index")
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every call from Supabase")
+    parser.add_argument("--dir", default=os.environ.get("VECTOR_INDEX_DIR", "vector_index"))
+    parser.add_argument("--embedder", default=os.environ.get("EMBEDDING_PROVIDER", "auto"))
+    parser.add_argument("--model", default=os.environ.get("EMBEDDING_MODEL") or None)
+    args = parser.parse_args()
+
+    index = VectorIndex(args.dir, create_embedder(args.embedder, args.model))
+    if args.rebuild:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+        def fetch_after(after_id, limit):
+            return (supabase.table('calls').select(VECTOR_COLUMNS)
+                    .gt('id', after_id).order('id').limit(limit).execute().data or [])
+
+        t_start = time.time()
+        embedded = index.rebuild(fetch_after)
+        print(f"[VECTORS] Rebuilt index with {embedded} calls in {time.time() - t_start:.1f}s")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()